@@ -1 +1,5 @@
-# This file makes the app directory a Python package
\ No newline at end of file
+# This file makes the app directory a Python package
+from .config import load_environment
+
+# Read .env before any module reads its tunables from the environment
+load_environment()
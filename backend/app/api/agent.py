@@ -1,37 +1,128 @@
-from fastapi import APIRouter, HTTPException
-from ..schemas.agent_spec import AgentSpecification
-from ..services.agent_service import generate_agent_specification
+from fastapi import APIRouter, Depends, Header, HTTPException
+from ..connections import manager
+from ..replay import ANONYMOUS_MATCH, recorder
+from .priority import read_arena_priority
+from ..schemas.agent_spec import AgentSpecification, SpawnPlan
+from ..metrics import GENERATIONS
+from ..services.agent_service import generate_fallback_agent
+from ..services.hedging import parse_deadline_ms, run_with_deadline
+from ..services.spawn_plan import SPAWN_PLAN_MAX_SIZE, SPAWN_PLAN_SIZE, generate_spawn_plan, spawn_queues
+from ..services.speculation import speculator
+from typing import Optional
 import logging
+import time
 from pydantic import BaseModel
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api", tags=["agent"])
+router = APIRouter(prefix="/api", tags=["agent"], dependencies=[Depends(read_arena_priority)])
+
+def validate_agent_request(request_data: dict) -> None:
+    """Reject agent requests missing a required field"""
+    required_fields = ["team_id", "strategy", "resources"]
+    for field in required_fields:
+        if field not in request_data:
+            raise HTTPException(
+                status_code=422, 
+                detail=f"Missing required field: {field}"
+            )
+
+def record_agent(client_id: Optional[str], request_data: dict, agent_spec: AgentSpecification, started: float) -> None:
+    recorder.record(client_id or ANONYMOUS_MATCH, "agent", {"request": request_data, "specification": agent_spec},
+                    latency_ms=(time.perf_counter() - started) * 1000.0)
 
 @router.post("/agent-specification", response_model=AgentSpecification)
-async def agent_specification(request_data: dict):
+async def agent_specification(
+    request_data: dict,
+    x_client_deadline_ms: Optional[float] = Header(None),
+    x_client_id: Optional[str] = Header(None)
+):
     """
     Generate specialized agent specification based on team needs
     
     This endpoint takes team strategy, resource availability, and current team
     composition to generate a specialized agent using AIQToolkit workflows.
+    
+    If X-Client-Deadline-Ms is set, the fallback agent is returned when the
+    deadline is reached and the workflow result is pushed later as an
+    "agent_recommendation" message to the WebSocket client named by X-Client-Id.
+    
+    Clients sending X-Client-Id on a regular interval get a result prepared
+    ahead of time (see services/speculation.py) when the state is close enough.
+    
+    Agents left over from a spawn plan for the same strategy are served first.
     """
     try:
-        # Validate required fields
-        required_fields = ["team_id", "strategy", "resources"]
-        for field in required_fields:
-            if field not in request_data:
-                raise HTTPException(
-                    status_code=422, 
-                    detail=f"Missing required field: {field}"
-                )
+        validate_agent_request(request_data)
         
-        logger.info(f"Received agent specification request for team {request_data['team_id']}")
-        agent_spec = await generate_agent_specification(request_data)
-        logger.info(f"Generated agent: {agent_spec.role} with priority {agent_spec.priority}")
+        logger.info("Received agent specification request for team %s", request_data['team_id'])
+        started = time.perf_counter()
+        
+        planned_agent = spawn_queues.pop(x_client_id, request_data["team_id"], request_data["strategy"])
+        if planned_agent is not None:
+            logger.info("Serving planned agent: %s with priority %s", planned_agent.role, planned_agent.priority)
+            GENERATIONS.labels("agent", "spawn_plan").inc()
+            record_agent(x_client_id, request_data, planned_agent, started)
+            return planned_agent
+        
+        async def push_upgrade(agent_spec: AgentSpecification, fallback: AgentSpecification):
+            await push_agent_upgrade(x_client_id, request_data["team_id"], agent_spec, fallback)
+        
+        agent_spec = await run_with_deadline(
+            speculator.serve("agent", x_client_id, request_data["team_id"], request_data),
+            parse_deadline_ms(x_client_deadline_ms),
+            lambda: generate_fallback_agent(request_data),
+            push_upgrade if x_client_id else None
+        )
+        logger.info("Generated agent: %s with priority %s", agent_spec.role, agent_spec.priority)
+        record_agent(x_client_id, request_data, agent_spec, started)
         return agent_spec
     except Exception as e:
-        logger.error(f"Error in agent specification endpoint: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Error in agent specification endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/spawn-plan", response_model=SpawnPlan)
+async def spawn_plan(request_data: dict, x_client_id: Optional[str] = Header(None)):
+    """
+    Generate an ordered queue of the next agents to spawn for a team
+    
+    Takes the same fields as /api/agent-specification plus an optional
+    "count" (default SPAWN_PLAN_SIZE), and generates all agents with one
+    workflow call. The first agent is for the spawn that triggered the
+    request; the rest are kept for the team (per X-Client-Id) and returned in
+    order by /api/agent-specification until the team's strategy changes.
+    Without X-Client-Id nothing can be kept, so only that first agent is planned.
+    """
+    validate_agent_request(request_data)
+    count = request_data.get("count", SPAWN_PLAN_SIZE)
+    if not isinstance(count, int) or not 1 <= count <= SPAWN_PLAN_MAX_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"count must be an integer between 1 and {SPAWN_PLAN_MAX_SIZE}"
+        )
+    if x_client_id is None:
+        count = 1
+    
+    try:
+        logger.info("Received spawn plan request for %s agents for team %s", count, request_data['team_id'])
+        agents = await generate_spawn_plan(request_data, count)
+        spawn_queues.replace(x_client_id, request_data["team_id"], request_data["strategy"], agents[1:])
+        return SpawnPlan(team_id=request_data["team_id"], agents=agents)
+    except Exception as e:
+        logger.error("Error in spawn plan endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def push_agent_upgrade(client_id: str, team_id: str, agent_spec: AgentSpecification, fallback: AgentSpecification):
+    """Push a late workflow agent to the client if it differs from the fallback it got"""
+    if agent_spec == fallback or not await manager.is_reachable(client_id):
+        return
+    try:
+        await manager.send_json(
+            "agent_recommendation",
+            {"team": team_id, "specification": agent_spec.model_dump(), "source": "upgrade"},
+            client_id
+        )
+        logger.info("Pushed upgraded agent for team %s to client %s", team_id, client_id)
+    except Exception as e:
+        logger.error("Error pushing upgraded agent to client %s: %s", client_id, e)
@@ -0,0 +1,65 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from typing import Union
+from ..schemas.compact import (
+    COMPACT_CONTENT_TYPES,
+    MSGPACK_CONTENT_TYPE,
+    CompactFormatError,
+    CompactGameState,
+    decode_compact,
+    media_type,
+    msgpack
+)
+from ..schemas.game_state import GameState
+from ..metrics import STAGE_DURATION
+
+# OpenAPI request body for endpoints that read the game state with read_game_state
+GAME_STATE_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"$ref": "#/components/schemas/GameState"}},
+            MSGPACK_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            "application/vnd.agentarena.packed": {"schema": {"type": "string", "format": "binary"}}
+        }
+    }
+}
+
+async def read_game_state(request: Request) -> Union[GameState, CompactGameState]:
+    """
+    Decode the request body as a game state, negotiated by Content-Type
+
+    JSON bodies are validated straight from bytes into a GameState. Compact
+    bodies are decoded into a CompactGameState with NumPy agent columns.
+    """
+    body = await request.body()
+    content_type = media_type(request.headers.get("content-type"))
+
+    if content_type in COMPACT_CONTENT_TYPES:
+        try:
+            with STAGE_DURATION.labels("decode_compact").time():
+                return decode_compact(body, content_type)
+        except CompactFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+    try:
+        with STAGE_DURATION.labels("validate_game_state").time():
+            return GameState.model_validate_json(body)
+    except ValidationError as e:
+        errors = e.errors()
+        if errors[0]["type"] == "json_invalid":
+            try:
+                body.decode("utf-8")
+            except UnicodeDecodeError:
+                # The error would echo raw bytes the JSON response cannot hold; answer as FastAPI does
+                raise HTTPException(status_code=400, detail="There was an error parsing the body")
+        raise RequestValidationError(errors)
+
+def negotiate_response(model: BaseModel, request: Request) -> Union[BaseModel, Response]:
+    """Return a MessagePack response if the client accepts it, otherwise the model for JSON"""
+    if msgpack is not None and MSGPACK_CONTENT_TYPE in request.headers.get("accept", ""):
+        return Response(content=msgpack.packb(model.model_dump(), use_bin_type=True), media_type=MSGPACK_CONTENT_TYPE)
+    return model
@@ -0,0 +1,7 @@
+from fastapi import Header
+from ..services.admission import set_arena_priority
+from typing import Optional
+
+async def read_arena_priority(x_arena_priority: Optional[str] = Header(None)) -> None:
+    """Admit the request's workflow runs at the priority named by X-Arena-Priority (interactive or background)"""
+    set_arena_priority(x_arena_priority)
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ..replay import ReplayReader, json_default
+from typing import List, Optional
+import json
+
+router = APIRouter(prefix="/replays", tags=["replay"])
+
+def open_reader() -> ReplayReader:
+    try:
+        return ReplayReader()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("")
+def list_replays():
+    """Recorded matches with their tick and time ranges"""
+    with open_reader() as reader:
+        return reader.matches()
+
+@router.get("/{match_id}")
+def replay_records(
+    match_id: str,
+    from_tick: int = 0,
+    to_tick: Optional[int] = None,
+    kind: Optional[List[str]] = Query(None)
+):
+    """
+    Stream a match's records as JSON lines, from from_tick up to to_tick
+
+    Records are written in chunks by a background thread, so the last second
+    or so of a running match may not be readable yet.
+    """
+    reader = open_reader()
+
+    def lines():
+        try:
+            for record in reader.records(match_id, from_tick, to_tick, kind):
+                yield json.dumps(record, default=json_default) + "\n"
+        finally:
+            reader.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -1,28 +1,152 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from ..connections import manager
+from ..replay import ANONYMOUS_MATCH, recorder
+from .encoding import GAME_STATE_REQUEST_BODY, negotiate_response, read_game_state
+from .priority import read_arena_priority
+from ..schemas.compact import CompactGameState
 from ..schemas.game_state import GameState
 from ..schemas.strategy import TeamStrategy
-from ..services.strategy_service import generate_team_strategy
+from ..services.hedging import parse_deadline_ms, run_with_deadline
+from ..services.spawn_plan import spawn_queues
+from ..services.speculation import speculator
+from ..services.strategy_service import (
+    generate_team_strategies,
+    generate_fallback_strategy,
+    stream_team_strategy
+)
+from typing import Any, Dict, List, Optional, Union
+import json
 import logging
+import os
+import time
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api", tags=["strategy"])
+# Upper bound on the number of game states accepted by the batch endpoint
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "256"))
 
-@router.post("/team-strategy", response_model=TeamStrategy)
-async def team_strategy(game_state: GameState):
+router = APIRouter(prefix="/api", tags=["strategy"], dependencies=[Depends(read_arena_priority)])
+
+@router.post("/team-strategy", response_model=TeamStrategy, openapi_extra=GAME_STATE_REQUEST_BODY)
+async def team_strategy(
+    request: Request,
+    game_state: Union[GameState, CompactGameState] = Depends(read_game_state),
+    x_client_deadline_ms: Optional[float] = Header(None),
+    x_client_id: Optional[str] = Header(None)
+):
     """
     Generate team strategy based on current game state
     
     This endpoint takes the current game state and generates a strategic
     plan for the specified team using AIQToolkit workflows.
+    
+    If X-Client-Deadline-Ms is set, the fallback strategy is returned when the
+    deadline is reached and the workflow result is pushed later as a
+    "directive" message to the WebSocket client named by X-Client-Id.
+    
+    Clients sending X-Client-Id on a regular interval get a result prepared
+    ahead of time (see services/speculation.py) when the state is close enough.
+    
+    Large states can be sent with Content-Type application/x-msgpack or
+    application/vnd.agentarena.packed (columnar agents, see schemas/compact.py),
+    and Accept: application/x-msgpack returns a MessagePack response.
     """
     try:
-        logger.info(f"Received team strategy request for team {game_state.team_id}")
-        strategy = await generate_team_strategy(game_state)
-        logger.info(f"Generated strategy: {strategy.strategy} with focus on {strategy.focus}")
-        return strategy
+        logger.info("Received team strategy request for team %s", game_state.team_id)
+        started = time.perf_counter()
+        
+        async def push_upgrade(strategy: TeamStrategy, fallback: TeamStrategy):
+            await push_strategy_upgrade(x_client_id, game_state.team_id, strategy, fallback)
+        
+        strategy = await run_with_deadline(
+            speculator.serve("strategy", x_client_id, game_state.team_id, game_state),
+            parse_deadline_ms(x_client_deadline_ms),
+            lambda: generate_fallback_strategy(game_state),
+            push_upgrade if x_client_id else None
+        )
+        logger.info("Generated strategy: %s with focus on %s", strategy.strategy, strategy.focus)
+        # The request body is recorded as received; decoding it is left to the reader
+        recorder.record(x_client_id or ANONYMOUS_MATCH, "strategy", {
+            "team_id": game_state.team_id,
+            "content_type": request.headers.get("content-type"),
+            "game_state": await request.body(),
+            "strategy": strategy
+        }, latency_ms=(time.perf_counter() - started) * 1000.0)
+        # Agents planned for a previous strategy no longer fit
+        spawn_queues.invalidate(x_client_id, game_state.team_id, strategy.model_dump())
+        return negotiate_response(strategy, request)
+    except Exception as e:
+        logger.error("Error in team strategy endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def push_strategy_upgrade(client_id: str, team_id: str, strategy: TeamStrategy, fallback: TeamStrategy):
+    """Push a late workflow strategy to the client if it differs from the fallback it got"""
+    if strategy == fallback or not await manager.is_reachable(client_id):
+        return
+    try:
+        await manager.send_json(
+            "directive",
+            {"team": team_id, "strategy": strategy.model_dump(), "source": "upgrade"},
+            client_id,
+            coalesce_key=f"directive:{team_id}"
+        )
+        logger.info("Pushed upgraded strategy for team %s to client %s", team_id, client_id)
+    except Exception as e:
+        logger.error("Error pushing upgraded strategy to client %s: %s", client_id, e)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/team-strategy/stream", openapi_extra=GAME_STATE_REQUEST_BODY)
+async def team_strategy_stream(
+    game_state: Union[GameState, CompactGameState] = Depends(read_game_state),
+    x_client_id: Optional[str] = Header(None)
+):
+    """
+    Generate team strategy as a stream of server-sent events
+    
+    Each strategy field is sent as a "field" event as soon as the workflow
+    has produced it (strategy and focus first), followed by a "strategy"
+    event with the complete strategy and its source. If the model output
+    turns out invalid or truncated, a "fallback" event is sent and the
+    fallback strategy's fields follow; the "strategy" event is authoritative.
+    """
+    logger.info("Received streaming team strategy request for team %s", game_state.team_id)
+
+    async def events():
+        async for event, data in stream_team_strategy(game_state):
+            if event == "strategy":
+                # Agents planned for a previous strategy no longer fit
+                spawn_queues.invalidate(x_client_id, game_state.team_id, data["strategy"])
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/team-strategy/batch", response_model=List[TeamStrategy])
+async def team_strategy_batch(game_states: List[GameState]):
+    """
+    Generate team strategies for many game states in one request
+    
+    Intended for hosts running several arenas against one backend. The list
+    is validated in a single pass and strategies are returned in the same
+    order as the submitted game states.
+    """
+    if len(game_states) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch size {len(game_states)} exceeds limit of {BATCH_MAX_SIZE}"
+        )
+    
+    try:
+        logger.info("Received batch team strategy request with %s game states", len(game_states))
+        return await generate_team_strategies(game_states)
     except Exception as e:
-        logger.error(f"Error in team strategy endpoint: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Error in batch team strategy endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,115 @@
+"""Application settings.
+
+The ``.env`` file is read once, when the ``app`` package is imported, so
+module-level tunables see it. The runtime switches (mock mode, caching, the
+LLM connection and startup behaviour) live in one ``Settings`` object created
+by ``init_settings`` in the FastAPI lifespan hook, which also configures
+logging. Code running outside the application (tests, scripts) gets settings
+built from the environment on first use of ``get_settings``.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from .logs import configure_logging, parse_sample_rates
+
+_environment_loaded = False
+
+def load_environment() -> None:
+    """Read the .env file into the process environment (only the first call has an effect)"""
+    global _environment_loaded
+    if not _environment_loaded:
+        load_dotenv()
+        _environment_loaded = True
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+@dataclass(frozen=True)
+class Settings:
+    """Process-wide settings read from the environment"""
+    environment: str = "development"
+    log_level: str = "info"
+    # "json" lines or "text", written by a background thread (see app/logs.py)
+    log_format: str = "json"
+    # Share of requests per route whose INFO/DEBUG lines are kept, e.g. {"/api/team-strategy": 0.1}
+    log_sample_rates: Dict[str, float] = field(default_factory=dict)
+    # Lines per second let through per message template (0 disables the limit)
+    log_rate_limit: float = 20.0
+    cors_origins: List[str] = field(default_factory=lambda: ["http://localhost:3000"])
+    use_mock_responses: bool = True
+    cache_enabled: bool = True
+    speculation_enabled: bool = True
+    # Load workflows and build the LLM client in the background at startup
+    prewarm: bool = True
+    llm_base_url: str = "https://api.openai.com/v1"
+    openai_api_key: str = ""
+    model_name: Optional[str] = None
+    llm_max_concurrency: int = 16
+    llm_timeout_seconds: float = 30.0
+    llm_max_retries: int = 2
+    llm_retry_backoff_seconds: float = 0.5
+    # Where workers share connection routing, pub/sub and cached results: "memory" or "sqlite"
+    shared_state_backend: str = "memory"
+    shared_state_path: Optional[str] = None
+    # Record game states, decisions and latencies to the replay log (see app/replay.py)
+    replay_enabled: bool = False
+    replay_dir: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        # CORS_ORIGINS takes precedence over the ALLOWED_ORIGINS name used in .env.example
+        origins = os.getenv("CORS_ORIGINS") or os.getenv("ALLOWED_ORIGINS") or "http://localhost:3000"
+        return cls(
+            environment=os.getenv("ENVIRONMENT", "development"),
+            log_level=os.getenv("LOG_LEVEL", "info"),
+            log_format=os.getenv("LOG_FORMAT", "json").lower(),
+            log_sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+            log_rate_limit=float(os.getenv("LOG_RATE_LIMIT", "20")),
+            cors_origins=[origin.strip() for origin in origins.split(",") if origin.strip()],
+            use_mock_responses=_flag("USE_MOCK_RESPONSES", "true"),
+            cache_enabled=_flag("CACHE_ENABLED", "true"),
+            speculation_enabled=_flag("SPECULATION_ENABLED", "true"),
+            prewarm=_flag("PREWARM", "true"),
+            llm_base_url=os.getenv("LLM_BASE_URL", "https://api.openai.com/v1"),
+            openai_api_key=os.getenv("OPENAI_API_KEY", ""),
+            model_name=os.getenv("MODEL_NAME") or None,
+            llm_max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+            llm_timeout_seconds=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+            llm_max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            llm_retry_backoff_seconds=float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.5")),
+            shared_state_backend=os.getenv("SHARED_STATE_BACKEND", "memory").lower(),
+            shared_state_path=os.getenv("SHARED_STATE_PATH") or None,
+            replay_enabled=_flag("REPLAY_ENABLED", "false"),
+            replay_dir=os.getenv("REPLAY_DIR") or None
+        )
+
+_settings: Optional[Settings] = None
+
+def init_settings(settings: Optional[Settings] = None) -> Settings:
+    """Create the application settings and configure logging; called once at startup"""
+    global _settings
+    load_environment()
+    _settings = settings or Settings.from_env()
+    configure_logging(
+        level=_settings.log_level,
+        json_format=_settings.log_format != "text",
+        sample_rates=_settings.log_sample_rates,
+        rate_limit=_settings.log_rate_limit
+    )
+    return _settings
+
+def get_settings() -> Settings:
+    """The application settings, built from the environment if startup has not run"""
+    global _settings
+    if _settings is None:
+        load_environment()
+        _settings = Settings.from_env()
+    return _settings
+
+def set_settings(settings: Optional[Settings]) -> None:
+    """Replace the application settings (used by tests)"""
+    global _settings
+    _settings = settings
@@ -0,0 +1,421 @@
+"""WebSocket connections, match rooms and routing between workers.
+
+Messages are never written to a socket by the code that produces them. Each
+client has a bounded outbound queue drained by a writer task, so a slow
+client delays only itself. Messages sent with a coalesce key (game state,
+directives, pings) supersede a queued message with the same key in place;
+when a queue is full the oldest such message is dropped, and a client whose
+queue holds nothing droppable is closed as too slow.
+
+A room (``match:<client_id>``) holds the spectators of one player's match. A
+broadcast is serialized once and the same string is queued for every member;
+with a distributed shared state it is also published so other workers fan
+it out to their own members, but only while one of them holds a member:
+each worker records its room sizes in the shared state. A heartbeat pings
+every client and closes the ones that have not sent anything for
+``WS_IDLE_TIMEOUT_SECONDS``.
+"""
+from fastapi import WebSocket
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from .metrics import (
+    RateMeter, ROUTED_MESSAGES, WEBSOCKET_CONNECTIONS, WEBSOCKET_MESSAGES, WEBSOCKET_MESSAGE_RATE,
+    WEBSOCKET_OUTBOUND, WEBSOCKET_SEND_QUEUE
+)
+from .shared_state import SharedState, get_shared_state, worker_channel
+
+logger = logging.getLogger(__name__)
+
+# Messages waiting for one client before stale ones are dropped
+WS_SEND_QUEUE_LIMIT = int(os.getenv("WS_SEND_QUEUE_LIMIT", "64"))
+# A single send taking longer than this closes the client as too slow (checked by the heartbeat)
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "15"))
+# Clients silent for longer than this (no messages, no pongs) are closed
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "45"))
+# How long a worker relies on its last lookup of a room's members on other workers
+ROOM_AUDIENCE_TTL_SECONDS = float(os.getenv("ROOM_AUDIENCE_TTL_SECONDS", "1"))
+
+# Channel carrying room broadcasts between workers
+ROOMS_CHANNEL = "rooms"
+PING = json.dumps({"type": "ping", "data": {}})
+# Close codes: "try again later" for slow clients, "going away" for idle ones
+SLOW_CLIENT_CLOSE_CODE = 1013
+IDLE_CLOSE_CODE = 1001
+
+# Queue keys for messages that are never coalesced
+_sequence = itertools.count()
+
+def match_room(match_id: str) -> str:
+    """The room spectators of a player's match join"""
+    return f"match:{match_id}"
+
+def envelope(message_type: str, data: dict) -> str:
+    """Serialize a message in the {type, data} envelope used by the frontend"""
+    return json.dumps({"type": message_type, "data": data})
+
+def coalesce_key(message_type: str, data: dict) -> Optional[str]:
+    """Key under which a newer message supersedes a queued one: a team's latest directive wins"""
+    if message_type == "directive":
+        return f"directive:{data.get('team')}"
+    return None
+
+class ClientConnection:
+    """A client's WebSocket and its bounded outbound queue"""
+
+    __slots__ = ("websocket", "client_id", "rooms", "queue", "last_seen", "sending_since", "closed",
+                 "_manager", "_writer", "_closer")
+
+    def __init__(self, websocket: WebSocket, client_id: str, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.rooms: Set[str] = set()
+        # Coalescable messages are keyed by their coalesce key, others by a sequence number
+        self.queue: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.last_seen = manager.clock()
+        # When the send in progress started; the heartbeat closes clients stuck in one
+        self.sending_since: Optional[float] = None
+        self.closed = False
+        self._manager = manager
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    def enqueue(self, text: str, coalesce_key: Optional[str] = None) -> bool:
+        """Queue a message for sending; False if the client is closed or was closed as too slow"""
+        if self.closed:
+            return False
+        if coalesce_key is not None and coalesce_key in self.queue:
+            # The queued message is stale; the new one takes its place in line
+            self.queue[coalesce_key] = text
+            WEBSOCKET_OUTBOUND.labels("coalesced").inc()
+            return True
+        if len(self.queue) >= self._manager.queue_limit and not self._drop_stale():
+            self.abort(SLOW_CLIENT_CLOSE_CODE, "slow_client")
+            return False
+        self.queue[coalesce_key if coalesce_key is not None else next(_sequence)] = text
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write())
+        return True
+
+    def _drop_stale(self) -> bool:
+        for key in self.queue:
+            if isinstance(key, str):
+                del self.queue[key]
+                WEBSOCKET_OUTBOUND.labels("dropped").inc()
+                return True
+        return False
+
+    async def _write(self) -> None:
+        try:
+            while self.queue:
+                _, text = self.queue.popitem(last=False)
+                self.sending_since = self._manager.clock()
+                await self.websocket.send_text(text)
+                self.sending_since = None
+                self._manager.record_sent()
+        except Exception as e:
+            logger.info("Send to client %s failed: %s", self.client_id, e)
+            self.abort(IDLE_CLOSE_CODE, "send_failed")
+        finally:
+            self.sending_since = None
+            self._writer = None
+
+    def discard(self) -> None:
+        """Stop sending: drop queued messages and the writer"""
+        self.closed = True
+        self.queue.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+
+    def abort(self, code: int, reason: str) -> None:
+        """Close the client from the server side and stop routing messages to it"""
+        if self.closed:
+            return
+        self.discard()
+        self._manager.forget(self)
+        WEBSOCKET_OUTBOUND.labels(reason).inc()
+        logger.info("Closing WebSocket client %s: %s", self.client_id, reason)
+        self._closer = asyncio.ensure_future(self._close(code))
+
+    async def _close(self, code: int) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code), self._manager.send_timeout)
+        except Exception:
+            # The receive loop sees the disconnect once the transport is gone
+            pass
+
+# WebSocket connection manager
+class ConnectionManager:
+    def __init__(
+        self,
+        shared_state: Optional[SharedState] = None,
+        queue_limit: int = WS_SEND_QUEUE_LIMIT,
+        send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+        heartbeat_seconds: float = WS_HEARTBEAT_SECONDS,
+        idle_timeout: float = WS_IDLE_TIMEOUT_SECONDS,
+        audience_ttl: float = ROOM_AUDIENCE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.active_connections: Dict[str, ClientConnection] = {}
+        self.rooms: Dict[str, Set[str]] = {}
+        self.queue_limit = queue_limit
+        self.send_timeout = send_timeout
+        self.heartbeat_seconds = heartbeat_seconds
+        self.idle_timeout = idle_timeout
+        self.audience_ttl = audience_ttl
+        self.clock = clock
+        # room -> (expires, whether another worker holds members)
+        self._remote_audience: Dict[str, Tuple[float, bool]] = {}
+        # Rooms whose member count is being written to the shared state
+        self._room_updates: Dict[str, asyncio.Task] = {}
+        self._shared_state = shared_state
+        self._listening = False
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._sent = WEBSOCKET_MESSAGES.labels("sent")
+        self._received = WEBSOCKET_MESSAGES.labels("received")
+        self.sent_rate = RateMeter()
+        self.received_rate = RateMeter()
+
+    @property
+    def shared_state(self) -> SharedState:
+        """Where connections are registered so other workers can route messages here"""
+        if self._shared_state is None:
+            self._shared_state = get_shared_state()
+        return self._shared_state
+
+    def listen(self) -> None:
+        """Deliver messages and room broadcasts other workers forward to clients connected to this one"""
+        if self._listening:
+            return
+        self._listening = True
+        self.shared_state.subscribe(worker_channel(self.shared_state.worker_id), self.deliver)
+        self.shared_state.subscribe(ROOMS_CHANNEL, self.deliver_broadcast)
+
+    def start_heartbeat(self) -> None:
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.ensure_future(self._heartbeat_loop())
+
+    async def stop_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+
+    async def connect(self, websocket: WebSocket, client_id: str, register: bool = True) -> ClientConnection:
+        """Accept a WebSocket; spectators pass register=False as nothing is ever routed to them"""
+        await websocket.accept()
+        connection = ClientConnection(websocket, client_id, self)
+        self.active_connections[client_id] = connection
+        if register:
+            await self.shared_state.register_connection(client_id)
+        return connection
+
+    async def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None, register: bool = True):
+        connection = self.active_connections.get(client_id)
+        # A client that already reconnected keeps its new connection
+        if connection is not None and (websocket is None or connection.websocket is websocket):
+            connection.discard()
+            self.forget(connection)
+        if register and client_id not in self.active_connections:
+            await self.shared_state.unregister_connection(client_id)
+
+    def forget(self, connection: ClientConnection) -> None:
+        """Remove a connection from the client and room maps"""
+        if self.active_connections.get(connection.client_id) is connection:
+            del self.active_connections[connection.client_id]
+        for room in connection.rooms:
+            members = self.rooms.get(room)
+            if members is not None:
+                members.discard(connection.client_id)
+                if not members:
+                    del self.rooms[room]
+            self._room_changed(room)
+        connection.rooms.clear()
+
+    def is_connected(self, client_id: str) -> bool:
+        """True if the client's WebSocket is held by this worker"""
+        return client_id in self.active_connections
+
+    async def is_reachable(self, client_id: str) -> bool:
+        """True if the client is connected to this or another worker"""
+        return self.is_connected(client_id) or await self.shared_state.connection_owner(client_id) is not None
+
+    def record_received(self, client_id: Optional[str] = None):
+        """Count a message received from a client and mark the client as alive"""
+        self._received.inc()
+        self.received_rate.mark()
+        connection = self.active_connections.get(client_id) if client_id is not None else None
+        if connection is not None:
+            connection.last_seen = self.clock()
+
+    def record_sent(self):
+        self._sent.inc()
+        self.sent_rate.mark()
+
+    async def send_personal_message(self, message: str, client_id: str, coalesce_key: Optional[str] = None):
+        connection = self.active_connections.get(client_id)
+        if connection is not None:
+            connection.enqueue(message, coalesce_key)
+            return
+
+        # Forward to the worker holding the client's WebSocket
+        owner = await self.shared_state.connection_owner(client_id)
+        if owner is None or owner == self.shared_state.worker_id:
+            ROUTED_MESSAGES.labels("unroutable").inc()
+            return
+        await self.shared_state.publish(
+            worker_channel(owner), {"client_id": client_id, "text": message, "coalesce_key": coalesce_key}
+        )
+        ROUTED_MESSAGES.labels("forwarded").inc()
+
+    async def send_json(self, message_type: str, data: dict, client_id: str, coalesce_key: Optional[str] = None):
+        """Send a typed message in the {type, data} envelope used by the frontend"""
+        await self.send_personal_message(envelope(message_type, data), client_id, coalesce_key)
+
+    async def deliver(self, message: Dict[str, Any]):
+        """Send a message forwarded by another worker, if the client is still connected here"""
+        connection = self.active_connections.get(message["client_id"])
+        if connection is not None:
+            connection.enqueue(message["text"], message.get("coalesce_key"))
+            ROUTED_MESSAGES.labels("delivered").inc()
+        else:
+            ROUTED_MESSAGES.labels("unroutable").inc()
+
+    def join(self, client_id: str, room: str) -> None:
+        connection = self.active_connections.get(client_id)
+        if connection is None:
+            return
+        self.rooms.setdefault(room, set()).add(client_id)
+        connection.rooms.add(room)
+        self._room_changed(room)
+
+    def leave(self, client_id: str, room: str) -> None:
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(client_id)
+            if not members:
+                del self.rooms[room]
+        connection = self.active_connections.get(client_id)
+        if connection is not None:
+            connection.rooms.discard(room)
+        self._room_changed(room)
+
+    def _room_changed(self, room: str) -> None:
+        """Record the room's member count in the shared state, in the background"""
+        if self.shared_state.distributed and room not in self._room_updates:
+            self._room_updates[room] = asyncio.ensure_future(self._update_room(room))
+
+    async def _update_room(self, room: str) -> None:
+        try:
+            recorded = None
+            # Members may join or leave while a count is being written
+            while recorded != len(self.rooms.get(room, ())):
+                recorded = len(self.rooms.get(room, ()))
+                await self.shared_state.set_room_members(room, recorded)
+        except Exception as e:
+            logger.error("Error recording the members of room %s: %s", room, e)
+        finally:
+            del self._room_updates[room]
+
+    async def has_audience(self, room: str) -> bool:
+        """True if a broadcast to the room reaches a member on this or another worker"""
+        return room in self.rooms or await self.has_remote_audience(room)
+
+    async def has_remote_audience(self, room: str) -> bool:
+        """True if another worker holds members of the room, looked up at most every audience_ttl"""
+        if not self.shared_state.distributed:
+            return False
+        now = self.clock()
+        cached = self._remote_audience.get(room)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        present = await self.shared_state.remote_room_members(room) > 0
+        self._remote_audience[room] = (now + self.audience_ttl, present)
+        return present
+
+    async def broadcast(self, room: str, message_type: str, data: dict, coalesce_key: Optional[str] = None) -> int:
+        """Send a message to every member of a room, serializing it once; returns the local recipients"""
+        text = envelope(message_type, data)
+        queued = self.fan_out(room, text, coalesce_key)
+        if await self.has_remote_audience(room):
+            await self.shared_state.publish(ROOMS_CHANNEL, {
+                "room": room, "text": text, "coalesce_key": coalesce_key, "origin": self.shared_state.worker_id
+            })
+        return queued
+
+    def fan_out(self, room: str, text: str, coalesce_key: Optional[str] = None) -> int:
+        """Queue an already serialized message for the room's members on this worker"""
+        members = self.rooms.get(room)
+        if not members:
+            return 0
+        queued = 0
+        # Enqueueing may close a slow member, which changes the set
+        for client_id in tuple(members):
+            connection = self.active_connections.get(client_id)
+            if connection is not None and connection.enqueue(text, coalesce_key):
+                queued += 1
+        return queued
+
+    async def deliver_broadcast(self, message: Dict[str, Any]):
+        """Fan out a room broadcast published by another worker"""
+        if message.get("origin") != self.shared_state.worker_id:
+            self.fan_out(message["room"], message["text"], message.get("coalesce_key"))
+
+    def heartbeat(self, ping: bool = True) -> None:
+        """Close clients stuck in a send or idle, and ping the others"""
+        now = self.clock()
+        for connection in tuple(self.active_connections.values()):
+            if connection.sending_since is not None and now - connection.sending_since > self.send_timeout:
+                connection.abort(SLOW_CLIENT_CLOSE_CODE, "slow_client")
+            elif now - connection.last_seen > self.idle_timeout:
+                connection.abort(IDLE_CLOSE_CODE, "idle")
+            elif ping:
+                connection.enqueue(PING, "ping")
+        # Lookups for rooms of matches that ended
+        for room, (expires, _) in tuple(self._remote_audience.items()):
+            if expires <= now:
+                del self._remote_audience[room]
+
+    async def _heartbeat_loop(self) -> None:
+        # Stuck sends are checked more often than clients are pinged
+        interval = min(self.heartbeat_seconds, self.send_timeout)
+        last_ping = self.clock()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                ping = self.clock() - last_ping >= self.heartbeat_seconds
+                if ping:
+                    last_ping = self.clock()
+                self.heartbeat(ping)
+            except Exception as e:
+                logger.error("Error in WebSocket heartbeat: %s", e)
+
+    def queued_messages(self) -> int:
+        return sum(len(connection.queue) for connection in self.active_connections.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.active_connections),
+            "rooms": len(self.rooms),
+            "room_members": sum(len(members) for members in self.rooms.values()),
+            "queued_messages": self.queued_messages(),
+            "queue_limit": self.queue_limit,
+            "heartbeat_seconds": self.heartbeat_seconds,
+            "idle_timeout_seconds": self.idle_timeout
+        }
+
+manager = ConnectionManager()
+WEBSOCKET_CONNECTIONS.set_function(lambda: len(manager.active_connections))
+WEBSOCKET_MESSAGE_RATE.set_function(manager.sent_rate.rate, "sent")
+WEBSOCKET_MESSAGE_RATE.set_function(manager.received_rate.rate, "received")
+WEBSOCKET_SEND_QUEUE.set_function(manager.queued_messages)
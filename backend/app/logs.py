@@ -0,0 +1,235 @@
+"""Non-blocking, structured logging.
+
+``configure_logging`` puts a ``QueueHandler`` on the root logger and starts a
+``QueueListener`` thread that writes the records, one JSON object per line,
+so request handlers never wait on log I/O. In the thread that logs, before a
+record is queued:
+
+- ``ContextFilter`` attaches the correlation ID and route of the current
+  request, set by ``RequestContextMiddleware`` from ``X-Request-ID`` (or
+  generated) and echoed in the response;
+- ``SamplingFilter`` keeps the INFO and DEBUG lines of a route for a share of
+  its requests (``LOG_SAMPLE_RATES``; decided per request ID, so a sampled
+  request keeps all its lines) and lets at most ``LOG_RATE_LIMIT`` lines per
+  second through per message template, counting what it suppressed on the
+  next line it lets through.
+
+Records are formatted in the listener thread only. Log calls on hot paths
+pass their values as arguments (``logger.info("Generated %s", role)``): an
+f-string is built even when the line is then dropped, and every distinct
+message would count as its own template for the rate limit.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+from .metrics import LOG_RECORDS
+
+# Records waiting for the writer thread before new ones are dropped
+LOG_QUEUE_LIMIT = int(os.getenv("LOG_QUEUE_LIMIT", "10000"))
+# Message templates tracked by the rate limit before its buckets are reset
+RATE_LIMIT_KEYS = 4096
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Incoming correlation IDs are echoed and logged, so only plain tokens are accepted
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_QUEUED, _DROPPED, _SAMPLED_OUT, _RATE_LIMITED = (
+    LOG_RECORDS.labels(outcome) for outcome in ("queued", "dropped", "sampled_out", "rate_limited")
+)
+
+@dataclass
+class RequestContext:
+    """The correlation ID and ASGI scope of the request being handled"""
+    request_id: str
+    scope: Dict[str, Any]
+
+    @property
+    def route(self) -> Optional[str]:
+        # The router stores the matched route in the scope once it has been resolved
+        return getattr(self.scope.get("route"), "path", None)
+
+request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+def current_request_id() -> Optional[str]:
+    context = request_context.get()
+    return context.request_id if context is not None else None
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware giving every request and WebSocket connection a correlation ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                request_id = candidate if VALID_REQUEST_ID.match(candidate) else None
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        header = (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=[*message.get("headers", ()), header])
+            await send(message)
+
+        token = request_context.set(RequestContext(request_id, scope))
+        try:
+            await self.app(scope, receive, send_wrapper if scope["type"] == "http" else send)
+        finally:
+            request_context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Attaches the current request's correlation ID and route to records"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = request_context.get()
+        record.request_id = context.request_id if context is not None else None
+        record.route = context.route if context is not None else None
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Per-route sampling of INFO and DEBUG lines and a per-template rate limit"""
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, rate_limit: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limit = rate_limit
+        self.clock = clock
+        # (logger, level, template) -> [tokens, last refill, suppressed since the last line let through]
+        self._buckets: Dict[Tuple[str, int, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.INFO and self.sample_rates:
+            rate = self.sample_rates.get(getattr(record, "route", None))
+            request_id = getattr(record, "request_id", None)
+            if rate is not None and request_id and zlib.crc32(request_id.encode()) >= rate * 0x100000000:
+                _SAMPLED_OUT.inc()
+                return False
+        if self.rate_limit <= 0:
+            return True
+
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= RATE_LIMIT_KEYS:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.rate_limit, now, 0]
+            tokens = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                bucket[2] += 1
+                _RATE_LIMITED.inc()
+                return False
+            bucket[0] = tokens - 1.0
+            if bucket[2]:
+                record.suppressed = int(bucket[2])
+                bucket[2] = 0
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records as they are, and drops them while the writer is LOG_QUEUE_LIMIT records behind"""
+
+    def __init__(self, log_queue: queue.Queue, limit: int = LOG_QUEUE_LIMIT):
+        super().__init__(log_queue)
+        self.limit = limit
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here, in the logging thread; the listener does it instead
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.limit:
+            _DROPPED.inc()
+            return
+        self.queue.put_nowait(record)
+        _QUEUED.inc()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in ("request_id", "route", "suppressed"):
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(
+    level: str = "info",
+    json_format: bool = True,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rate_limit: float = 0.0,
+    stream: Optional[TextIO] = None
+) -> DroppingQueueHandler:
+    """Send root logger records through a queue to a writer thread, replacing an earlier configuration"""
+    global _handler, _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    handler = DroppingQueueHandler(queue.Queue())
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(sample_rates, rate_limit))
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    root.addHandler(handler)
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    _handler = handler
+    return handler
+
+def stop_logging() -> None:
+    """Write out the queued records and detach the queue handler"""
+    global _handler, _listener
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse "/api/team-strategy=0.1,/ws/{client_id}=0.01" into route -> rate"""
+    rates = {}
+    for item in value.split(","):
+        route, _, rate = item.strip().rpartition("=")
+        if route:
+            rates[route] = float(rate)
+    return rates
@@ -1,69 +1,227 @@
+from app.startup import startup_profile
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi import WebSocket, WebSocketDisconnect
-import json
-import os
-from typing import Dict, List
-from dotenv import load_dotenv
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from app.config import get_settings, init_settings
+from app.logs import RequestContextMiddleware, stop_logging
+from app.metrics import MetricsMiddleware, render_metrics
+from app.services.cache import cache_stats
+from app.services.workflow_executor import close_executor, get_executor
+from app.connections import coalesce_key, manager, match_room
+from app.services.directive_service import sessions
+from app.services.spawn_plan import spawn_queues
+from app.services.speculation import speculator
+from app.services.admission import admission
+from app.shared_state import get_shared_state
+from app.replay import recorder
+from app.api import strategy, agent, replay
+import logging
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Territory Game Backend")
+startup_profile.mark("import")
+
+async def prewarm_workflows(connect: bool) -> None:
+    """Load the workflow definitions (and LLM client) off the event loop after startup"""
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(get_executor().prewarm, connect)
+    except Exception as e:
+        logger.warning("Workflow pre-warming failed, definitions will load on first use: %s", e)
+        return
+    startup_profile.record_background("prewarm_workflows_ms", (time.perf_counter() - start) * 1000.0)
+    logger.info("Pre-warmed workflows in %.0fms", (time.perf_counter() - start) * 1000.0)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_profile.phase("settings"):
+        settings = init_settings()
+    with startup_profile.phase("shared_state"):
+        shared_state = get_shared_state()
+        await shared_state.start()
+        manager.listen()
+        manager.start_heartbeat()
+    if settings.replay_enabled:
+        with startup_profile.phase("replay"):
+            recorder.start(settings.replay_dir)
+    speculator.enabled = settings.speculation_enabled
+    speculator.start()
+    prewarm_task = None
+    if settings.prewarm:
+        # Mock mode never calls the LLM, so only the definitions are loaded
+        prewarm_task = asyncio.create_task(prewarm_workflows(connect=not settings.use_mock_responses))
+    startup_profile.ready()
+    startup_profile.log()
+    yield
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    await speculator.stop()
+    await manager.stop_heartbeat()
+    await shared_state.stop()
+    # Write the records still queued
+    await asyncio.to_thread(recorder.stop)
+    # Release pooled LLM connections
+    await close_executor()
+    # Write out the queued log lines
+    stop_logging()
+
+class SettingsCORSMiddleware:
+    """CORS configured from the settings, which are only created when the app starts"""
+
+    def __init__(self, app):
+        self.app = app
+        self._cors = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        if self._cors is None:
+            self._cors = CORSMiddleware(
+                self.app,
+                allow_origins=get_settings().cors_origins,  # Frontend URLs
+                allow_credentials=True,
+                allow_methods=["*"],
+                allow_headers=["*"],
+            )
+        await self._cors(scope, receive, send)
+
+app = FastAPI(title="AI Territory Game Backend", lifespan=lifespan)
 
 # Configure CORS
-allowed_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,  # Frontend URLs
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, client_id: str):
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
-
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-
-    async def send_personal_message(self, message: str, client_id: str):
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_text(message)
-
-manager = ConnectionManager()
+app.add_middleware(SettingsCORSMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every log line of a request carries its correlation ID
+app.add_middleware(RequestContextMiddleware)
 
 @app.get("/")
 async def root():
-    return {"message": "AI Territory Game Backend is running", "mock_mode": os.getenv("USE_MOCK_RESPONSES", "true").lower() == "true"}
+    return {"message": "AI Territory Game Backend is running", "mock_mode": get_settings().use_mock_responses}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters for the strategy and agent result caches"""
+    return cache_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, generation, workflow and WebSocket metrics in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup/stats")
+async def get_startup_stats():
+    """Import, settings and pre-warm timings from the last startup"""
+    return startup_profile.report()
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Slots in use, queued requests per priority class and shed counts"""
+    return admission.stats()
+
+@app.get("/connections/stats")
+async def get_connection_stats():
+    """WebSocket connections, spectator rooms and queued outbound messages"""
+    return manager.stats()
+
+@app.get("/replay/stats")
+async def get_replay_stats():
+    """Records written and dropped by the replay recorder, and the compression achieved"""
+    return recorder.stats()
+
+@app.get("/speculation/stats")
+async def get_speculation_stats():
+    """Tracked clients and hit/drift counters for speculative pre-generation"""
+    return speculator.stats()
 
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     await manager.connect(websocket, client_id)
+    session = sessions.open(client_id)
+    room = match_room(client_id)
+
+    async def push_directives(replies):
+        # Directives whose generation outlasted the message that triggered them
+        for message_type, payload in replies:
+            recorder.record(client_id, message_type, payload, tick=session.seq)
+            await manager.send_json(message_type, payload, client_id, coalesce_key(message_type, payload))
+        if await manager.has_audience(room):
+            for message_type, payload in replies:
+                await manager.broadcast(room, message_type, payload, coalesce_key(message_type, payload))
+
+    session.push = push_directives
     try:
         while True:
-            data = await websocket.receive_text()
-            # Process game state and generate directives
-            game_state = json.loads(data)
-            # Using fallback directives since AIQToolkit is not available
-            directives = {"message": "Received game state", "status": "mock_mode"}
-            await manager.send_personal_message(json.dumps(directives), client_id)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            manager.record_received(client_id)
+            updates = session.updates
+            started = time.perf_counter()
+            # Apply the snapshot or delta and send any directives it triggers
+            try:
+                if message.get("bytes") is not None:
+                    replies = await session.handle_frame(message["bytes"])
+                else:
+                    replies = await session.handle_message(message["text"])
+            except Exception as e:
+                logger.error("Error processing message from client %s: %s", client_id, e)
+                replies = [("resync", {"reason": "state could not be applied"})]
+            latency_ms = (time.perf_counter() - started) * 1000.0
+            # The raw message is recorded: cheaper than the session state, and replaying it rebuilds the state
+            recorder.record(client_id, "client_message", message.get("bytes") or message.get("text"),
+                            tick=session.seq, latency_ms=latency_ms)
+            for message_type, payload in replies:
+                recorder.record(client_id, message_type, payload, tick=session.seq)
+            for message_type, payload in replies:
+                await manager.send_json(message_type, payload, client_id, coalesce_key(message_type, payload))
+            if session.updates != updates and await manager.has_audience(room):
+                await broadcast_to_spectators(room, session, replies)
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        await manager.disconnect(client_id, websocket)
+        # A client that already reconnected keeps its session, plan queue and replay
+        if not manager.is_connected(client_id):
+            sessions.close(client_id)
+            speculator.forget(client_id)
+            spawn_queues.forget(client_id)
+            recorder.forget(client_id)
+
+async def broadcast_to_spectators(room: str, session, replies) -> None:
+    """Send the match state, and any directives it triggered, to the match's spectators"""
+    # A newer state supersedes one a slow spectator has not received yet
+    await manager.broadcast(room, "state", session.spectator_view(), coalesce_key="state")
+    for message_type, payload in replies:
+        if message_type != "resync" and message_type != "error":
+            await manager.broadcast(room, message_type, payload, coalesce_key(message_type, payload))
 
-# Import and include API routers
-from app.api import strategy, agent
+@app.websocket("/ws/spectate/{match_id}")
+async def spectate_endpoint(websocket: WebSocket, match_id: str):
+    """Watch the match of the player connected as match_id"""
+    spectator_id = f"spectator-{uuid.uuid4().hex}"
+    # Nothing is routed to a spectator by ID, so it is not registered with the shared state
+    await manager.connect(websocket, spectator_id, register=False)
+    manager.join(spectator_id, match_room(match_id))
+    session = sessions.get(match_id)
+    if session is not None and session.has_state:
+        await manager.send_json("state", session.spectator_view(), spectator_id, coalesce_key="state")
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            # Spectators only send heartbeat replies
+            manager.record_received(spectator_id)
+    finally:
+        await manager.disconnect(spectator_id, websocket, register=False)
 
 # Include API routers
 app.include_router(strategy.router)
 app.include_router(agent.router)
+app.include_router(replay.router)
 
 if __name__ == "__main__":
     import uvicorn
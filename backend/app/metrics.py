@@ -0,0 +1,300 @@
+"""In-process metrics exposed in the Prometheus text format on /metrics.
+
+Counters, gauges and histograms are plain Python objects updated on the event
+loop, so recording a value is a dict lookup and an addition with no locking.
+Label combinations are resolved once with ``labels()`` and can be kept by the
+caller on hot paths. ``MetricsMiddleware`` records per-route request latency
+and in-flight requests for every HTTP request.
+"""
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+INF_LABEL = 'le="+Inf"'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    """Base class for a named metric family with a fixed set of label names"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child metric for one combination of label values"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    """Value that can go up and down, or is read from a function at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float], *values: str) -> None:
+        """Read the gauge for these label values from function when scraped"""
+        self.labels(*values)
+        self._functions[tuple(str(value) for value in values)] = function
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        function = self._functions.get(key)
+        if function is not None:
+            child.value = function()
+        return super()._render_child(key, child)
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.upper_bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(child.upper_bounds, child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(upper_bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, INF_LABEL)} {child.count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {child.count}")
+        return lines
+
+class RateMeter:
+    """Events per second over a sliding window of whole seconds"""
+
+    def __init__(self, window_seconds: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._seconds = [-1] * window_seconds
+        self._counts = [0] * window_seconds
+
+    def mark(self, count: int = 1) -> None:
+        second = int(self.clock())
+        slot = second % self.window_seconds
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += count
+
+    def rate(self) -> float:
+        # Only completed seconds, so the rate does not dip at the start of each second
+        now = int(self.clock())
+        oldest = now - self.window_seconds
+        total = sum(count for second, count in zip(self._seconds, self._counts) if oldest <= second < now)
+        return total / self.window_seconds
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# HTTP
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+HTTP_REQUEST_DURATION = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route", ("route", "method"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+# Generation: how each strategy/agent result was produced (workflow, cache, mock or fallback)
+GENERATIONS = REGISTRY.counter("generations_total", "Strategy and agent results by how they were produced", ("kind", "source"))
+STAGE_DURATION = REGISTRY.histogram("stage_duration_seconds", "Time spent in request processing stages", ("stage",))
+WORKFLOW_DURATION = REGISTRY.histogram("workflow_duration_seconds", "Workflow runs including retries, by workflow and outcome", ("workflow", "outcome"))
+WORKFLOW_ATTEMPT_FAILURES = REGISTRY.counter("workflow_attempt_failures_total", "Failed LLM attempts (retried or final) by workflow", ("workflow",))
+PROMPT_TOKENS = REGISTRY.counter("prompt_tokens_total", "Estimated prompt tokens sent to the LLM, by workflow and part (cacheable prefix or state)", ("workflow", "part"))
+PROMPT_DETAIL = REGISTRY.counter("prompt_detail_total", "Prompts by the detail level that fitted the token budget (0 is the most detailed)", ("workflow", "level"))
+DEADLINE_FALLBACKS = REGISTRY.counter("deadline_fallbacks_total", "Requests answered with the fallback at the client deadline")
+
+# Admission control: requests admitted or shed (by reason) per priority class
+ADMISSIONS = REGISTRY.counter("admissions_total", "Workflow runs admitted or shed, by priority class and outcome", ("priority", "outcome"))
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge("admission_queue_depth", "Requests waiting for an admission slot", ("priority",))
+ADMISSION_QUEUE_SECONDS = REGISTRY.histogram("admission_queue_seconds", "Time admitted requests waited for a slot", ("priority",))
+
+# WebSocket
+WEBSOCKET_CONNECTIONS = REGISTRY.gauge("websocket_connections", "Open WebSocket connections")
+WEBSOCKET_MESSAGES = REGISTRY.counter("websocket_messages_total", "WebSocket messages by direction", ("direction",))
+WEBSOCKET_MESSAGE_RATE = REGISTRY.gauge("websocket_message_rate", "WebSocket messages per second over the last 10 s", ("direction",))
+WEBSOCKET_OUTBOUND = REGISTRY.counter("websocket_outbound_total", "Outbound messages coalesced or dropped as stale, and clients closed as slow, idle or failed", ("outcome",))
+WEBSOCKET_SEND_QUEUE = REGISTRY.gauge("websocket_send_queue", "Messages waiting in client send queues")
+ROUTED_MESSAGES = REGISTRY.counter("routed_messages_total", "Messages for clients on other workers: forwarded, delivered or unroutable", ("outcome",))
+
+# Replay recording
+REPLAY_RECORDS = REGISTRY.counter("replay_records_total", "Replay records written or dropped", ("outcome",))
+REPLAY_BYTES = REGISTRY.counter("replay_bytes_total", "Replay record bytes before and after compression", ("stage",))
+REPLAY_QUEUE_DEPTH = REGISTRY.gauge("replay_queue_depth", "Replay records waiting for the writer thread")
+
+# Logging
+LOG_RECORDS = REGISTRY.counter("log_records_total", "Log records queued for the writer, or dropped by sampling, rate limiting or a full queue", ("outcome",))
+
+UNMATCHED_ROUTE = "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight counts per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels()
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            # The router stores the matched route in the (shared) scope; label by its
+            # path template so path parameters do not create new series
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(route, method).observe(elapsed)
+            HTTP_REQUESTS.labels(route, method, str(status[0])).inc()
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,493 @@
+"""Append-only replay log of game states, decisions and latencies.
+
+``recorder.record()`` only puts a tuple on a bounded queue. A background
+thread encodes the records with MessagePack, compresses them in chunks with
+zlib and appends the chunks to a segment file, so recording never blocks the
+request path; when the queue is full, records are dropped and counted.
+
+A segment (``replay-<time>-<pid>-<n>.log``) is a file header followed by
+chunks: ``CHUNK_HEADER`` (magic, compressed size, record count, CRC-32) and
+the compressed records. Each chunk gets a JSON line in the segment's index
+(``.idx``) with its offset and the tick range of every match it holds:
+
+    {"offset": 9, "length": 5321, "records": 256, "time": [t0, t1], "matches": {"client-1": [40, 97]}}
+
+``ReplayReader`` memory-maps the segments and uses the indexes to decompress
+only the chunks holding a match's ticks, one chunk at a time. Chunks written
+after the last index line (a writer that stopped between the two writes) are
+found by scanning the chunk headers.
+
+Before a segment is opened, the oldest segments in the directory are deleted
+so the replays stay within ``REPLAY_MAX_BYTES`` and ``REPLAY_MAX_AGE_SECONDS``.
+
+    python -m app.replay matches
+    python -m app.replay dump <match_id> --from-tick 100 --to-tick 200
+"""
+import base64
+import glob
+import heapq
+import json
+import logging
+import mmap
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; without it recording stays off
+    msgpack = None
+
+from .config import get_settings
+from .metrics import REPLAY_BYTES, REPLAY_QUEUE_DEPTH, REPLAY_RECORDS
+
+logger = logging.getLogger(__name__)
+
+# Records waiting for the writer before new ones are dropped
+REPLAY_QUEUE_LIMIT = int(os.getenv("REPLAY_QUEUE_LIMIT", "10000"))
+# A chunk is written when it has this many records or its first record is this old
+REPLAY_CHUNK_RECORDS = int(os.getenv("REPLAY_CHUNK_RECORDS", "256"))
+REPLAY_FLUSH_SECONDS = float(os.getenv("REPLAY_FLUSH_SECONDS", "1.0"))
+# Segments are closed and a new one started past this size
+REPLAY_SEGMENT_BYTES = int(os.getenv("REPLAY_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+REPLAY_COMPRESSION_LEVEL = int(os.getenv("REPLAY_COMPRESSION_LEVEL", "6"))
+# Retention of the segments in the replay directory (0 keeps them)
+REPLAY_MAX_BYTES = int(os.getenv("REPLAY_MAX_BYTES", str(1024 * 1024 * 1024)))
+REPLAY_MAX_AGE_SECONDS = float(os.getenv("REPLAY_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+DEFAULT_REPLAY_DIR = os.path.join(tempfile.gettempdir(), "agentarena-replays")
+# Match ID of HTTP requests sent without X-Client-Id
+ANONYMOUS_MATCH = "anonymous"
+
+FILE_MAGIC = b"AGREPLAY\x01"
+CHUNK_MAGIC = b"RPCK"
+CHUNK_HEADER = struct.Struct("<4sIII")
+SEGMENT_PATTERN = "replay-*.log"
+INDEX_SUFFIX = ".idx"
+
+# Records are stored as arrays in this order and read back as dicts
+RECORD_FIELDS = ("match", "tick", "kind", "time", "latency_ms", "data")
+
+_STOP = object()
+
+class ReplayFormatError(Exception):
+    """Raised when a segment holds a damaged chunk"""
+
+def replay_directory() -> str:
+    return get_settings().replay_dir or DEFAULT_REPLAY_DIR
+
+def _encode_default(value: Any) -> Any:
+    # Models are dumped on the writer thread, not when recorded
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot record a value of type {type(value).__name__}")
+
+def _tick_range(records: Iterable[tuple]) -> Dict[str, List[int]]:
+    matches: Dict[str, List[int]] = {}
+    for record in records:
+        match, tick = record[0], record[1]
+        ticks = matches.get(match)
+        if ticks is None:
+            matches[match] = [tick, tick]
+        elif tick < ticks[0]:
+            ticks[0] = tick
+        elif tick > ticks[1]:
+            ticks[1] = tick
+    return matches
+
+class ReplayRecorder:
+    """Queue records on the request path; encode, compress and write them on a background thread"""
+
+    def __init__(
+        self,
+        queue_limit: int = REPLAY_QUEUE_LIMIT,
+        chunk_records: int = REPLAY_CHUNK_RECORDS,
+        flush_seconds: float = REPLAY_FLUSH_SECONDS,
+        segment_bytes: int = REPLAY_SEGMENT_BYTES,
+        compression_level: int = REPLAY_COMPRESSION_LEVEL,
+        max_bytes: int = REPLAY_MAX_BYTES,
+        max_age_seconds: float = REPLAY_MAX_AGE_SECONDS
+    ):
+        self.chunk_records = chunk_records
+        self.flush_seconds = flush_seconds
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.directory: Optional[str] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_limit)
+        self._thread: Optional[threading.Thread] = None
+        # Latest tick of each WebSocket match, used for HTTP records that carry none
+        self._ticks: Dict[str, int] = {}
+        self._segment = None
+        self._index = None
+        self._segments = 0
+        self.written = 0
+        self.dropped = 0
+        self.chunks = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.pruned = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, directory: Optional[str] = None) -> bool:
+        """Start the writer thread; False if recording is unavailable"""
+        if self.running:
+            return True
+        if msgpack is None:
+            logger.warning("Replay recording requires the msgpack package; recording is off")
+            return False
+        self.directory = directory or DEFAULT_REPLAY_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="replay-writer", daemon=True)
+        self._thread.start()
+        logger.info("Recording replays to %s", self.directory)
+        return True
+
+    def stop(self) -> None:
+        """Write the queued records and close the segment (blocks; run it off the event loop)"""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def record(self, match_id: str, kind: str, data: Any, tick: Optional[int] = None,
+               latency_ms: Optional[float] = None) -> None:
+        """Queue one record; never blocks, and does nothing when recording is off"""
+        if self._thread is None:
+            return
+        if tick is None:
+            tick = self._ticks.get(match_id, 0)
+        else:
+            self._ticks[match_id] = tick
+        try:
+            self._queue.put_nowait((match_id, tick, kind, time.time(), latency_ms, data))
+        except queue.Full:
+            self.dropped += 1
+            REPLAY_RECORDS.labels("dropped").inc()
+
+    def forget(self, match_id: str) -> None:
+        """Drop the tick kept for a match whose WebSocket closed"""
+        self._ticks.pop(match_id, None)
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "directory": self.directory,
+            "queued": self.queued(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "chunks": self.chunks,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "pruned_segments": self.pruned,
+            "compression_ratio": round(self.raw_bytes / self.compressed_bytes, 2) if self.compressed_bytes else None
+        }
+
+    # The methods below run on the writer thread
+
+    def _run(self) -> None:
+        batch: List[tuple] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(batch)
+                self._close_segment()
+                return
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if len(batch) >= self.chunk_records or (deadline is not None and time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+        try:
+            self._write_chunk(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            REPLAY_RECORDS.labels("dropped").inc(len(batch))
+            logger.error("Error writing %d replay records: %s", len(batch), e)
+
+    def _write_chunk(self, batch: List[tuple]) -> None:
+        packer = msgpack.Packer(default=_encode_default, use_bin_type=True)
+        parts = []
+        records = []
+        for record in batch:
+            try:
+                parts.append(packer.pack(record))
+                records.append(record)
+            except (TypeError, ValueError) as e:
+                self.dropped += 1
+                REPLAY_RECORDS.labels("dropped").inc()
+                logger.warning("Skipping replay record %r for %s: %s", record[2], record[0], e)
+        if not records:
+            return
+        raw = b"".join(parts)
+        compressed = zlib.compress(raw, self.compression_level)
+
+        segment = self._open_segment()
+        offset = segment.tell()
+        segment.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(compressed), len(records), zlib.crc32(compressed)))
+        segment.write(compressed)
+        segment.flush()
+        self._index.write(json.dumps({
+            "offset": offset,
+            "length": CHUNK_HEADER.size + len(compressed),
+            "records": len(records),
+            "time": [records[0][3], records[-1][3]],
+            "matches": _tick_range(records)
+        }) + "\n")
+        self._index.flush()
+
+        self.written += len(records)
+        self.chunks += 1
+        self.raw_bytes += len(raw)
+        self.compressed_bytes += len(compressed)
+        REPLAY_RECORDS.labels("written").inc(len(records))
+        REPLAY_BYTES.labels("raw").inc(len(raw))
+        REPLAY_BYTES.labels("compressed").inc(len(compressed))
+        if segment.tell() >= self.segment_bytes:
+            self._close_segment()
+
+    def _open_segment(self):
+        if self._segment is None:
+            self._prune()
+            self._segments += 1
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+            path = os.path.join(self.directory, f"replay-{stamp}-{os.getpid()}-{self._segments:04d}.log")
+            self._segment = open(path, "wb")
+            self._segment.write(FILE_MAGIC)
+            self._index = open(path + INDEX_SUFFIX, "w")
+        return self._segment
+
+    def _prune(self) -> None:
+        """Delete the oldest segments past the age limit or the size left for a new segment"""
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)):
+            try:
+                stat = os.stat(path)
+                index_size = os.path.getsize(path + INDEX_SUFFIX) if os.path.exists(path + INDEX_SUFFIX) else 0
+            except OSError:
+                # Pruned by another worker sharing the directory
+                continue
+            segments.append((stat.st_mtime, path, stat.st_size + index_size))
+        segments.sort()
+        total = sum(size for _, _, size in segments)
+        oldest = time.time() - self.max_age_seconds
+        pruned = 0
+        for modified, path, size in segments:
+            too_old = self.max_age_seconds > 0 and modified < oldest
+            too_big = self.max_bytes > 0 and total + self.segment_bytes > self.max_bytes
+            if not too_old and not too_big:
+                break
+            for name in (path, path + INDEX_SUFFIX):
+                try:
+                    os.remove(name)
+                except OSError:
+                    # Already pruned by another worker, or never indexed
+                    pass
+            total -= size
+            pruned += 1
+        if pruned:
+            self.pruned += pruned
+            logger.info("Deleted %d old replay segments from %s", pruned, self.directory)
+
+    def _close_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = None
+            self._index = None
+
+class ReplaySegment:
+    """One memory-mapped segment file and its chunk index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # Chunks appended after this point are not seen; open a new reader to pick them up
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.size = size
+        if size and self._map[:len(FILE_MAGIC)] != FILE_MAGIC:
+            self.close()
+            raise ReplayFormatError(f"{path} is not a replay segment")
+        self.chunks = self._load_index()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _load_index(self) -> List[Dict[str, Any]]:
+        chunks: List[Dict[str, Any]] = []
+        end = len(FILE_MAGIC)
+        try:
+            with open(self.path + INDEX_SUFFIX) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; the chunk is recovered by the scan below
+                        break
+                    if entry["offset"] + entry["length"] > self.size:
+                        break
+                    chunks.append(entry)
+                    end = entry["offset"] + entry["length"]
+        except FileNotFoundError:
+            pass
+        chunks.extend(self._scan(end))
+        return chunks
+
+    def _scan(self, offset: int) -> Iterator[Dict[str, Any]]:
+        """Index entries for complete chunks from offset on, read from the chunk headers"""
+        while offset + CHUNK_HEADER.size <= self.size:
+            magic, length, count, _ = CHUNK_HEADER.unpack_from(self._map, offset)
+            end = offset + CHUNK_HEADER.size + length
+            if magic != CHUNK_MAGIC or end > self.size:
+                return
+            entry = {"offset": offset, "length": end - offset, "records": count}
+            try:
+                records = self.read_chunk(entry)
+            except ReplayFormatError:
+                return
+            entry["time"] = [records[0][3], records[-1][3]] if records else [0, 0]
+            entry["matches"] = _tick_range(records)
+            yield entry
+            offset = end
+
+    def read_chunk(self, entry: Dict[str, Any]) -> List[list]:
+        """Decompress and decode the records of one chunk"""
+        offset = entry["offset"]
+        magic, length, count, crc = CHUNK_HEADER.unpack_from(self._map, offset)
+        start = offset + CHUNK_HEADER.size
+        with memoryview(self._map)[start:start + length] as payload:
+            if magic != CHUNK_MAGIC or zlib.crc32(payload) != crc:
+                raise ReplayFormatError(f"Damaged chunk at offset {offset} of {self.path}")
+            raw = zlib.decompress(payload)
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(raw)
+        return list(unpacker)
+
+    def records(self, match_id: str, from_tick: int = 0, to_tick: Optional[int] = None,
+                kinds: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        for entry in self.chunks:
+            ticks = entry["matches"].get(match_id)
+            if ticks is None or ticks[1] < from_tick or (to_tick is not None and ticks[0] > to_tick):
+                continue
+            for record in self.read_chunk(entry):
+                tick = record[1]
+                if record[0] == match_id and tick >= from_tick and (to_tick is None or tick <= to_tick) \
+                        and (kinds is None or record[2] in kinds):
+                    yield dict(zip(RECORD_FIELDS, record))
+
+class ReplayReader:
+    """Indexed, memory-mapped access to the replay segments in a directory"""
+
+    def __init__(self, directory: Optional[str] = None):
+        if msgpack is None:
+            raise RuntimeError("Reading replays requires the msgpack package")
+        self.directory = directory or replay_directory()
+        self.segments: List[ReplaySegment] = []
+        for path in sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN))):
+            try:
+                self.segments.append(ReplaySegment(path))
+            except (OSError, ReplayFormatError) as e:
+                logger.warning("Skipping replay segment %s: %s", path, e)
+
+    def __enter__(self) -> "ReplayReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def matches(self) -> Dict[str, Dict[str, Any]]:
+        """Tick range, chunk count and time range of every recorded match, from the indexes alone"""
+        matches: Dict[str, Dict[str, Any]] = {}
+        for segment in self.segments:
+            for entry in segment.chunks:
+                for match, (first, last) in entry["matches"].items():
+                    summary = matches.get(match)
+                    if summary is None:
+                        matches[match] = {"first_tick": first, "last_tick": last, "chunks": 1,
+                                          "first_time": entry["time"][0], "last_time": entry["time"][1]}
+                    else:
+                        summary["first_tick"] = min(summary["first_tick"], first)
+                        summary["last_tick"] = max(summary["last_tick"], last)
+                        summary["chunks"] += 1
+                        summary["first_time"] = min(summary["first_time"], entry["time"][0])
+                        summary["last_time"] = max(summary["last_time"], entry["time"][1])
+        return matches
+
+    def records(self, match_id: str, from_tick: int = 0, to_tick: Optional[int] = None,
+                kinds: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Stream a match's records in time order, decompressing only the chunks that hold its ticks"""
+        kinds = set(kinds) if kinds else None
+        # Records of one match may be in several workers' segments
+        return heapq.merge(
+            *(segment.records(match_id, from_tick, to_tick, kinds) for segment in self.segments),
+            key=lambda record: record["time"]
+        )
+
+def json_default(value: Any) -> Any:
+    """Show recorded bytes (request bodies, binary frames) in JSON output"""
+    if isinstance(value, bytes):
+        try:
+            return value.decode()
+        except UnicodeDecodeError:
+            return base64.b64encode(value).decode()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+recorder = ReplayRecorder()
+REPLAY_QUEUE_DEPTH.set_function(recorder.queued)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List recorded matches or dump a match's records as JSON lines")
+    parser.add_argument("command", choices=["matches", "dump"])
+    parser.add_argument("match_id", nargs="?")
+    parser.add_argument("--dir", default=None)
+    parser.add_argument("--from-tick", type=int, default=0)
+    parser.add_argument("--to-tick", type=int, default=None)
+    parser.add_argument("--kind", action="append", default=None)
+    args = parser.parse_args()
+
+    with ReplayReader(args.dir) as reader:
+        if args.command == "matches":
+            print(json.dumps(reader.matches(), indent=2))
+        else:
+            if not args.match_id:
+                parser.error("dump needs a match_id")
+            for record in reader.records(args.match_id, args.from_tick, args.to_tick, args.kind):
+                print(json.dumps(record, default=json_default))
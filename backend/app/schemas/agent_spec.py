@@ -1,5 +1,8 @@
-from pydantic import BaseModel, Field
-from typing import Dict, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional
+
+# Upper bound on the sum of an agent's attributes, for balance
+MAX_ATTRIBUTE_SUM = 3.0
 
 class AgentAttributes(BaseModel):
     """Agent attributes with constraints"""
@@ -9,9 +12,26 @@ class AgentAttributes(BaseModel):
     defense: float = Field(..., ge=0.0, le=1.0)
     carryCapacity: float = Field(..., ge=0.0, le=1.0)
 
+    def total(self) -> float:
+        return self.speed + self.health + self.attack + self.defense + self.carryCapacity
+
 class AgentSpecification(BaseModel):
     """Agent specification model returned to the frontend"""
     role: str  # e.g., "collector", "explorer", "defender", "attacker"
     attributes: AgentAttributes
     priority: str  # e.g., "energy", "materials", "data", "territory"
-    description: str  # Human-readable description of the agent
\ No newline at end of file
+    description: str  # Human-readable description of the agent
+
+class SpawnPlan(BaseModel):
+    """Ordered queue of the next agents to spawn for a team"""
+    team_id: str
+    agents: List[AgentSpecification]
+
+    @field_validator("agents")
+    @classmethod
+    def check_attribute_sums(cls, agents: List[AgentSpecification]) -> List[AgentSpecification]:
+        for agent in agents:
+            # Small tolerance for float rounding in sums like 0.8 + 0.6 + 0.5 + 0.5 + 0.6
+            if agent.attributes.total() > MAX_ATTRIBUTE_SUM + 1e-6:
+                raise ValueError(f"attribute sum of {agent.role} exceeds {MAX_ATTRIBUTE_SUM}")
+        return agents
@@ -0,0 +1,355 @@
+"""Compact wire formats for large game states.
+
+Agents are sent as columnar arrays (ids, types, health, x, y) instead of one
+JSON object per agent, and decoded straight into NumPy arrays without
+building a pydantic model per agent. Two encodings are supported, selected
+by content type:
+
+- ``application/x-msgpack``: a MessagePack map. Agent columns may be lists,
+  or raw little-endian bytes for zero-copy decoding (ids int32, type_codes
+  uint8, health/x/y float32).
+- ``application/vnd.agentarena.packed``: a fixed binary layout, see
+  ``encode_packed``.
+"""
+import json
+import struct
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .game_state import Agent, GameState, Position, Resource
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; only the packed format is available without it
+    msgpack = None
+
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+PACKED_CONTENT_TYPE = "application/vnd.agentarena.packed"
+COMPACT_CONTENT_TYPES = (MSGPACK_CONTENT_TYPE, PACKED_CONTENT_TYPE)
+
+PACKED_MAGIC = b"AAGS"
+PACKED_VERSION = 1
+# magic, version, header length
+PACKED_PREFIX = struct.Struct("<4sBI")
+
+ID_DTYPE = np.dtype("<i4")
+CODE_DTYPE = np.dtype("u1")
+FLOAT_DTYPE = np.dtype("<f4")
+# Distinct agent types per team that uint8 type codes can tell apart on the wire
+MAX_CODED_TYPES = 256
+
+class CompactFormatError(ValueError):
+    """Raised when a compact payload cannot be decoded"""
+
+def _column(value: Any, dtype: np.dtype) -> np.ndarray:
+    """Decode a column given either as raw bytes or as a list of numbers"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return np.frombuffer(value, dtype=dtype)
+    if dtype.kind in "iu":
+        # Converting straight to the dtype would wrap or overflow on out-of-range numbers
+        values = np.asarray(value)
+        limits = np.iinfo(dtype)
+        if values.size and (values.min() < limits.min or values.max() > limits.max):
+            raise CompactFormatError(f"Column values outside the {dtype.name} range")
+        return values.astype(dtype)
+    return np.asarray(value, dtype=dtype)
+
+@dataclass
+class ColumnarAgents:
+    """Agents of one team stored as parallel NumPy arrays"""
+    ids: np.ndarray
+    type_codes: np.ndarray
+    type_names: List[str]
+    health: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+
+    def __post_init__(self):
+        count = len(self.ids)
+        for column in (self.type_codes, self.health, self.x, self.y):
+            if len(column) != count:
+                raise CompactFormatError("Agent columns have different lengths")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def empty(cls) -> "ColumnarAgents":
+        return cls(
+            ids=np.empty(0, ID_DTYPE),
+            type_codes=np.empty(0, CODE_DTYPE),
+            type_names=[],
+            health=np.empty(0, FLOAT_DTYPE),
+            x=np.empty(0, FLOAT_DTYPE),
+            y=np.empty(0, FLOAT_DTYPE)
+        )
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any], type_names: Optional[List[str]] = None) -> "ColumnarAgents":
+        """Build from a column map with either "types" (strings) or "type_codes" plus a type table"""
+        if "type_codes" in columns:
+            type_codes = _column(columns["type_codes"], CODE_DTYPE)
+            type_names = list(columns.get("type_table", type_names or []))
+        else:
+            type_names, codes = np.unique(np.asarray(columns.get("types", []), dtype=object).astype(str),
+                                          return_inverse=True)
+            type_names = type_names.tolist()
+            # Beyond uint8 range the codes stay wide in memory; the binary encoders reject such teams
+            type_codes = codes.astype(CODE_DTYPE) if len(type_names) <= MAX_CODED_TYPES else codes
+        if len(type_codes) and int(type_codes.max()) >= len(type_names):
+            raise CompactFormatError("Agent type code outside the type table")
+
+        return cls(
+            ids=_column(columns.get("ids", []), ID_DTYPE),
+            type_codes=type_codes,
+            type_names=type_names,
+            health=_column(columns.get("health", []), FLOAT_DTYPE),
+            x=_column(columns.get("x", []), FLOAT_DTYPE),
+            y=_column(columns.get("y", []), FLOAT_DTYPE)
+        )
+
+    @classmethod
+    def from_agents(cls, agents: Iterable[Union[Agent, Dict[str, Any]]]) -> "ColumnarAgents":
+        agents = list(agents)
+        # Read fields directly rather than dumping each model to a dict first
+        get = dict.__getitem__ if agents and isinstance(agents[0], dict) else getattr
+        return cls.from_columns({
+            "ids": [get(agent, "id") for agent in agents],
+            "types": [get(agent, "type") for agent in agents],
+            "health": [get(agent, "health") for agent in agents],
+            "x": [get(agent, "x") for agent in agents],
+            "y": [get(agent, "y") for agent in agents]
+        })
+
+    def types(self) -> np.ndarray:
+        """Per-agent type names"""
+        return np.asarray(self.type_names, dtype=object)[self.type_codes]
+
+    def type_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.type_codes, minlength=len(self.type_names))
+        return {name: int(count) for name, count in zip(self.type_names, counts) if count}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Expand into one dict per agent (only for slow paths such as prompts)"""
+        return [
+            {"id": agent_id, "type": agent_type, "health": health, "x": x, "y": y}
+            for agent_id, agent_type, health, x, y in zip(
+                self.ids.tolist(), self.types().tolist(), self.health.tolist(), self.x.tolist(), self.y.tolist()
+            )
+        ]
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Column lists, used when a workflow input containing agents is serialized"""
+        return {
+            "ids": self.ids.tolist(),
+            "types": self.types().tolist(),
+            "health": self.health.tolist(),
+            "x": self.x.tolist(),
+            "y": self.y.tolist()
+        }
+
+@dataclass
+class CompactGameState:
+    """Game state decoded from a compact payload; mirrors the GameState fields"""
+    team_id: str
+    territory_control: Dict[str, float]
+    resources: Dict[str, Resource]
+    agents: Dict[str, ColumnarAgents]
+    resource_distribution: Dict[str, int] = field(default_factory=dict)
+    bases: Dict[str, Position] = field(default_factory=dict)
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "CompactGameState":
+        """Validate the small fields and wrap the agent columns"""
+        try:
+            return cls(
+                team_id=str(payload["team_id"]),
+                territory_control={str(team): float(value) for team, value in payload["territory_control"].items()},
+                resources={str(team): Resource(**values) for team, values in payload["resources"].items()},
+                agents={str(team): ColumnarAgents.from_columns(columns)
+                        for team, columns in payload.get("agents", {}).items()},
+                resource_distribution={str(key): int(value)
+                                       for key, value in payload.get("resource_distribution", {}).items()},
+                bases={str(team): Position(**position) for team, position in (payload.get("bases") or {}).items()}
+            )
+        except (KeyError, TypeError, ValueError, AttributeError, OverflowError) as e:
+            raise CompactFormatError(f"Invalid compact game state: {e}") from e
+
+    @classmethod
+    def from_game_state(cls, game_state: GameState) -> "CompactGameState":
+        return cls(
+            team_id=game_state.team_id,
+            territory_control=dict(game_state.territory_control),
+            resources=dict(game_state.resources),
+            agents={team: ColumnarAgents.from_agents(agents) for team, agents in game_state.agents.items()},
+            resource_distribution=dict(game_state.resource_distribution),
+            bases=dict(game_state.bases)
+        )
+
+    def to_game_state(self) -> GameState:
+        return GameState(
+            team_id=self.team_id,
+            territory_control=self.territory_control,
+            resources=self.resources,
+            agents={team: agents.to_records() for team, agents in self.agents.items()},
+            resource_distribution=self.resource_distribution,
+            bases=self.bases
+        )
+
+    def header(self) -> Dict[str, Any]:
+        """The non-agent fields as plain data"""
+        return {
+            "team_id": self.team_id,
+            "territory_control": self.territory_control,
+            "resources": {team: resource.model_dump() for team, resource in self.resources.items()},
+            "resource_distribution": self.resource_distribution,
+            "bases": {team: position.model_dump() for team, position in self.bases.items()}
+        }
+
+def _require_msgpack():
+    if msgpack is None:
+        raise CompactFormatError("MessagePack support requires the msgpack package")
+
+def _check_coded_types(state: CompactGameState) -> None:
+    for team, agents in state.agents.items():
+        if len(agents.type_names) > MAX_CODED_TYPES:
+            raise CompactFormatError(f"Team {team} has more than {MAX_CODED_TYPES} agent types")
+
+def encode_msgpack(state: CompactGameState) -> bytes:
+    """Encode with agent columns as raw little-endian bytes"""
+    _require_msgpack()
+    _check_coded_types(state)
+    payload = state.header()
+    payload["agents"] = {
+        team: {
+            "ids": agents.ids.astype(ID_DTYPE).tobytes(),
+            "type_codes": agents.type_codes.astype(CODE_DTYPE).tobytes(),
+            "type_table": agents.type_names,
+            "health": agents.health.astype(FLOAT_DTYPE).tobytes(),
+            "x": agents.x.astype(FLOAT_DTYPE).tobytes(),
+            "y": agents.y.astype(FLOAT_DTYPE).tobytes()
+        }
+        for team, agents in state.agents.items()
+    }
+    return msgpack.packb(payload, use_bin_type=True)
+
+def decode_msgpack_payload(body: bytes) -> Any:
+    _require_msgpack()
+    try:
+        return msgpack.unpackb(body, raw=False)
+    except (ValueError, msgpack.UnpackException) as e:
+        raise CompactFormatError(f"Invalid MessagePack payload: {e}") from e
+
+def decode_msgpack(body: bytes) -> CompactGameState:
+    payload = decode_msgpack_payload(body)
+    if not isinstance(payload, dict):
+        raise CompactFormatError("MessagePack game state must be a map")
+    return CompactGameState.from_payload(payload)
+
+def _pad4(length: int) -> int:
+    return (4 - length % 4) % 4
+
+def encode_packed(state: CompactGameState) -> bytes:
+    """
+    Encode in the packed layout:
+
+        "AAGS" | version u8 | header length u32 | header JSON | padding to 4 bytes
+        per team, in header "teams" order:
+            ids int32[n] | health float32[n] | x float32[n] | y float32[n] | type_codes uint8[n] | padding
+
+    The header JSON holds the non-agent fields plus "teams" ([[team, n], ...])
+    and "type_tables" ({team: [type names]}).
+    """
+    _check_coded_types(state)
+    header = state.header()
+    header["teams"] = [[team, len(agents)] for team, agents in state.agents.items()]
+    header["type_tables"] = {team: agents.type_names for team, agents in state.agents.items()}
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    parts = [PACKED_PREFIX.pack(PACKED_MAGIC, PACKED_VERSION, len(header_bytes)), header_bytes]
+    parts.append(b"\0" * _pad4(PACKED_PREFIX.size + len(header_bytes)))
+    for agents in state.agents.values():
+        parts.append(agents.ids.astype(ID_DTYPE).tobytes())
+        for column in (agents.health, agents.x, agents.y):
+            parts.append(column.astype(FLOAT_DTYPE).tobytes())
+        parts.append(agents.type_codes.astype(CODE_DTYPE).tobytes())
+        parts.append(b"\0" * _pad4(len(agents)))
+    return b"".join(parts)
+
+def _packed_layout(header: Any) -> Tuple[List[Tuple[str, int]], Dict[str, List[str]]]:
+    """The [team, agent count] pairs and type tables of a packed header, validated"""
+    if not isinstance(header, dict):
+        raise CompactFormatError("Packed header must be a JSON object")
+    teams = header.get("teams", [])
+    type_tables = header.get("type_tables", {})
+    if not isinstance(teams, list) or not isinstance(type_tables, dict):
+        raise CompactFormatError("Packed header has malformed teams or type_tables")
+    layout = []
+    for entry in teams:
+        if (not isinstance(entry, list) or len(entry) != 2 or not isinstance(entry[0], str)
+                or not isinstance(entry[1], int) or isinstance(entry[1], bool) or entry[1] < 0):
+            raise CompactFormatError(f"Packed header teams entry must be [team, agent count]: {entry!r}")
+        layout.append((entry[0], entry[1]))
+    for team, table in type_tables.items():
+        if not isinstance(table, list) or not all(isinstance(name, str) for name in table):
+            raise CompactFormatError(f"Packed type table of team {team} must be a list of names")
+    return layout, type_tables
+
+def decode_packed(body: bytes) -> CompactGameState:
+    """Decode the packed layout; agent columns are zero-copy views of body"""
+    if len(body) < PACKED_PREFIX.size:
+        raise CompactFormatError("Packed payload is truncated")
+    magic, version, header_length = PACKED_PREFIX.unpack_from(body)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise CompactFormatError("Not a packed game state (bad magic or version)")
+
+    offset = PACKED_PREFIX.size
+    try:
+        header = json.loads(bytes(body[offset:offset + header_length]))
+    except ValueError as e:
+        raise CompactFormatError(f"Invalid packed header: {e}") from e
+    offset += header_length
+    offset += _pad4(offset)
+    teams, type_tables = _packed_layout(header)
+
+    buffer = memoryview(body)
+    agents: Dict[str, ColumnarAgents] = {}
+    for team, count in teams:
+        end = offset + count * (ID_DTYPE.itemsize + 3 * FLOAT_DTYPE.itemsize + CODE_DTYPE.itemsize)
+        if end > len(body):
+            raise CompactFormatError(f"Packed payload is truncated in team {team}")
+        ids = np.frombuffer(buffer, ID_DTYPE, count, offset)
+        offset += count * ID_DTYPE.itemsize
+        floats = []
+        for _ in range(3):
+            floats.append(np.frombuffer(buffer, FLOAT_DTYPE, count, offset))
+            offset += count * FLOAT_DTYPE.itemsize
+        type_codes = np.frombuffer(buffer, CODE_DTYPE, count, offset)
+        offset += count + _pad4(count)
+        agents[team] = ColumnarAgents.from_columns({
+            "ids": ids,
+            "health": floats[0],
+            "x": floats[1],
+            "y": floats[2],
+            "type_codes": type_codes,
+            "type_table": type_tables.get(team, [])
+        })
+
+    header["agents"] = {}
+    state = CompactGameState.from_payload(header)
+    state.agents = agents
+    return state
+
+def decode_compact(body: bytes, content_type: str) -> CompactGameState:
+    """Decode a request body according to its content type"""
+    if content_type == PACKED_CONTENT_TYPE:
+        return decode_packed(body)
+    if content_type == MSGPACK_CONTENT_TYPE:
+        return decode_msgpack(body)
+    raise CompactFormatError(f"Unsupported content type: {content_type}")
+
+def media_type(content_type: Optional[str]) -> str:
+    """Strip parameters (e.g. charset) from a Content-Type header value"""
+    return (content_type or "").split(";", 1)[0].strip().lower()
@@ -16,10 +16,16 @@ class Agent(BaseModel):
     y: float
     # Add other relevant attributes as needed
 
+class Position(BaseModel):
+    """Map position in pixels"""
+    x: float
+    y: float
+
 class GameState(BaseModel):
     """Game state model sent from the frontend"""
     team_id: str
     territory_control: Dict[str, float]
     resources: Dict[str, Resource]
     agents: Dict[str, List[Agent]]
-    resource_distribution: Dict[str, int]
\ No newline at end of file
+    resource_distribution: Dict[str, int]
+    bases: Dict[str, Position] = {}  # Optional base positions, keyed by team
\ No newline at end of file
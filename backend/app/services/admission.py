@@ -0,0 +1,234 @@
+"""Admission control for LLM-backed work.
+
+Workflow runs are admitted into a fixed number of slots (the LLM
+concurrency). When every slot is busy, callers wait in a priority queue:
+interactive arenas before background ones (speculative pre-generation and
+hosts that send ``X-Arena-Priority: background``), and within each, strategy
+refreshes before agent specifications.
+
+Each priority class has a bounded queue and a queue-time budget. A request
+is shed - the caller answers with its deterministic fallback instead - when
+its class queue is full, when the predicted wait (queue ahead of it times the
+average run time, spread over the slots) exceeds its budget, or when it has
+waited out its budget. Overload then costs answer quality, not timeouts.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from ..config import get_settings
+from ..metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_SECONDS, ADMISSIONS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+ARENA_PRIORITIES = (INTERACTIVE, BACKGROUND)
+# Work kinds in priority order within an arena priority
+WORK_KINDS = ("strategy", "agent")
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Concurrent workflow runs admitted; defaults to LLM_MAX_CONCURRENCY
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "0"))
+# Waiting requests allowed per priority class before new ones are shed
+ADMISSION_QUEUE_LIMIT = int(os.getenv("ADMISSION_QUEUE_LIMIT", "32"))
+# Longest an interactive or background request may wait for a slot
+ADMISSION_INTERACTIVE_BUDGET_SECONDS = float(os.getenv("ADMISSION_INTERACTIVE_BUDGET_SECONDS", "2.0"))
+ADMISSION_BACKGROUND_BUDGET_SECONDS = float(os.getenv("ADMISSION_BACKGROUND_BUDGET_SECONDS", "5.0"))
+
+# Weight of the newest sample in the average run time
+EWMA_ALPHA = 0.2
+
+# Arena priority of the current request; set from X-Arena-Priority by the API
+arena_priority: ContextVar[str] = ContextVar("arena_priority", default=INTERACTIVE)
+
+def set_arena_priority(value: Optional[str]) -> None:
+    """Set the arena priority for the current request (unknown values count as interactive)"""
+    value = (value or INTERACTIVE).lower()
+    arena_priority.set(value if value in ARENA_PRIORITIES else INTERACTIVE)
+
+def priority_class(kind: str, arena: str) -> str:
+    return f"{arena}.{kind}"
+
+PRIORITY_CLASSES = [priority_class(kind, arena) for arena in ARENA_PRIORITIES for kind in WORK_KINDS]
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of waiting for a slot"""
+
+    def __init__(self, priority: str, reason: str):
+        super().__init__(f"{priority} request shed: {reason}")
+        self.priority = priority
+        self.reason = reason
+
+@dataclass(order=True)
+class Waiter:
+    rank: int
+    sequence: int
+    priority: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+class AdmissionController:
+    """Priority admission of workflow runs into a fixed number of slots"""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        queue_limit: int = ADMISSION_QUEUE_LIMIT,
+        budgets: Optional[Dict[str, float]] = None,
+        enabled: bool = ADMISSION_ENABLED,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.budgets = budgets if budgets is not None else {
+            INTERACTIVE: ADMISSION_INTERACTIVE_BUDGET_SECONDS,
+            BACKGROUND: ADMISSION_BACKGROUND_BUDGET_SECONDS
+        }
+        self.enabled = enabled
+        self.clock = clock
+        self.in_flight = 0
+        # Average run time of admitted work, used to predict queue waits
+        self.run_seconds: Optional[float] = None
+        self._queue: List[Waiter] = []
+        self._queued: Dict[str, int] = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+
+    @property
+    def concurrency(self) -> int:
+        if self._concurrency is None:
+            self._concurrency = ADMISSION_CONCURRENCY or get_settings().llm_max_concurrency
+        return self._concurrency
+
+    def _has_free_slot(self) -> bool:
+        # Waiters that timed out stay in the heap until popped, so count the live ones
+        return self.in_flight < self.concurrency and not any(self._queued.values())
+
+    def queued_ahead(self, priority: str) -> int:
+        """Waiting requests that will be admitted before a new request of this class"""
+        rank = PRIORITY_CLASSES.index(priority)
+        return sum(self._queued[other] for other in PRIORITY_CLASSES[:rank + 1])
+
+    def predicted_wait(self, priority: str) -> float:
+        """Expected time until a new request of this class gets a slot"""
+        if self._has_free_slot():
+            return 0.0
+        if self.run_seconds is None:
+            return 0.0
+        return (self.queued_ahead(priority) + 1) * self.run_seconds / self.concurrency
+
+    def check(self, kind: str, arena: Optional[str] = None) -> Optional[str]:
+        """The reason a new request would be shed right now, or None if it would be queued"""
+        arena = arena or arena_priority.get()
+        priority = priority_class(kind, arena)
+        if self._has_free_slot():
+            return None
+        if self._queued[priority] >= self.queue_limit:
+            return "queue_full"
+        if self.predicted_wait(priority) > self.budgets[arena]:
+            return "predicted_wait"
+        return None
+
+    async def acquire(self, kind: str, arena: Optional[str] = None) -> None:
+        """Wait for a slot, or raise AdmissionRejected if the request should be shed"""
+        arena = arena or arena_priority.get()
+        priority = priority_class(kind, arena)
+        if self._has_free_slot():
+            self._admit(priority, 0.0)
+            return
+
+        reason = self.check(kind, arena)
+        if reason is not None:
+            self._shed(priority, reason)
+
+        waiter = Waiter(PRIORITY_CLASSES.index(priority), next(self._sequence), priority,
+                        asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self._enqueue(priority, 1)
+        queued_at = self.clock()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.budgets[arena])
+        except asyncio.TimeoutError:
+            self._enqueue(priority, -1)
+            self._shed(priority, "queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was handed over as the caller went away
+                self.release()
+            else:
+                self._enqueue(priority, -1)
+            raise
+        # release() handed this waiter the slot and already took it off the queue
+        self._admit(priority, self.clock() - queued_at, handed_over=True)
+
+    def release(self, run_seconds: Optional[float] = None) -> None:
+        """Free a slot, handing it to the highest priority waiter"""
+        if run_seconds is not None:
+            self.run_seconds = run_seconds if self.run_seconds is None else \
+                EWMA_ALPHA * run_seconds + (1 - EWMA_ALPHA) * self.run_seconds
+        while self._queue:
+            waiter = heapq.heappop(self._queue)
+            if not waiter.future.done():
+                self._enqueue(waiter.priority, -1)
+                waiter.future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, kind: str, arena: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block"""
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(kind, arena)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.release(self.clock() - started)
+
+    async def run(self, kind: str, work: Callable[[], Awaitable[T]], arena: Optional[str] = None) -> T:
+        """Run work once admitted"""
+        async with self.slot(kind, arena):
+            return await work()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": dict(self._queued),
+            "run_seconds": self.run_seconds,
+            "admitted": self.admitted,
+            "shed": dict(self.shed)
+        }
+
+    def _admit(self, priority: str, waited: float, handed_over: bool = False) -> None:
+        if not handed_over:
+            self.in_flight += 1
+        self.admitted += 1
+        ADMISSION_QUEUE_SECONDS.labels(priority).observe(waited)
+        ADMISSIONS.labels(priority, "admitted").inc()
+
+    def _enqueue(self, priority: str, delta: int) -> None:
+        self._queued[priority] += delta
+        ADMISSION_QUEUE_DEPTH.labels(priority).inc(delta)
+
+    def _shed(self, priority: str, reason: str) -> None:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        ADMISSIONS.labels(priority, reason).inc()
+        logger.warning("Shedding %s request (%s): %d in flight, %d queued",
+                       priority, reason, self.in_flight, sum(self._queued.values()))
+        raise AdmissionRejected(priority, reason)
+
+admission = AdmissionController()
@@ -2,22 +2,21 @@
 # import aiq  # Commented out since aiqtoolkit is not available
 from ..schemas.agent_spec import AgentSpecification, AgentAttributes
 from ..schemas.strategy import TeamStrategy
+from ..metrics import GENERATIONS, STAGE_DURATION
+from ..config import get_settings
+from .admission import AdmissionRejected, admission
+from .cache import quantization, agent_cache, agent_cache_key
+from .prompts import agent_inputs, fit
+from .single_flight import workflow_flight, workflow_key
+from .strategy_service import normalize_team_id
+from .workflow_executor import get_executor
 import json
-import os
 import logging
 from typing import Dict, List
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Check if we should use mock responses
-USE_MOCK_RESPONSES = os.getenv("USE_MOCK_RESPONSES", "true").lower() == "true"
-
 class AgentRequest:
     """Request structure for agent creation"""
     def __init__(self, team_id: str, strategy: TeamStrategy, resources: Dict, current_agents: List[Dict]):
@@ -30,40 +29,57 @@ async def generate_agent_specification(request_data: dict) -> AgentSpecification
     """Generate specialized agent specification based on team needs using AIQToolkit"""
     try:
         # If mock responses are enabled or aiqtoolkit is not available, use fallback
-        if USE_MOCK_RESPONSES:
+        if get_settings().use_mock_responses:
             logger.info("Using fallback agent (mock mode enabled)")
+            GENERATIONS.labels("agent", "mock").inc()
             return generate_fallback_agent(request_data)
             
-        # Extract and validate request data
-        team_id = request_data.get("team_id")
-        strategy = request_data.get("strategy")
-        resources = request_data.get("resources")
-        current_agents = request_data.get("current_agents", [])
-        
         # Convert team_id to match format expected in workflow
-        team_id_map = {"team1": "red", "team2": "blue", "1": "red", "2": "blue"}
-        normalized_team_id = team_id_map.get(team_id, team_id)
+        normalized_team_id = normalize_team_id(request_data.get("team_id"))
         
-        logger.info(f"Generating agent specification for team {normalized_team_id}")
+        # Reuse specifications generated for an equivalent team situation
+        cache_key = agent_cache_key(request_data, normalized_team_id, quantization)
+        if get_settings().cache_enabled:
+            cached_agent = await agent_cache.get(cache_key)
+            if cached_agent is not None:
+                logger.info("Using cached agent specification for team %s", normalized_team_id)
+                GENERATIONS.labels("agent", "cache").inc()
+                return cached_agent
         
-        # Prepare input for workflow
-        workflow_input = {
-            "team_id": normalized_team_id,
-            "strategy": strategy,
-            "resources": resources,
-            "current_agents": current_agents
-        }
+        logger.info("Generating agent specification for team %s", normalized_team_id)
         
-        # This code would load and run the AIQToolkit workflow, but we'll skip it
-        # and use the fallback agent instead
-        logger.warning("AIQToolkit not available, using fallback agent")
-        return generate_fallback_agent(request_data)
+        # Prepare input for workflow, compacted to the prompt token budget
+        with STAGE_DURATION.labels("build_prompt").time():
+            workflow_input = fit("agent_creation", agent_inputs(request_data, normalized_team_id))
+        
+        # Concurrent requests with the same input share a single workflow run
+        agent_spec = await workflow_flight.do(
+            workflow_key("agent_creation", workflow_input),
+            lambda: admission.run("agent", lambda: run_agent_workflow(workflow_input))
+        )
+        
+        if get_settings().cache_enabled:
+            await agent_cache.set(cache_key, agent_spec)
+        GENERATIONS.labels("agent", "workflow").inc()
+        return agent_spec
     
+    except AdmissionRejected as e:
+        # Overloaded: answer with the deterministic agent rather than queue past the budget
+        logger.info("Using fallback agent for team %s: %s", request_data.get('team_id'), e)
+        GENERATIONS.labels("agent", "shed").inc()
+        return generate_fallback_agent(request_data)
     except Exception as e:
-        logger.error(f"Error generating agent specification: {e}")
+        logger.error("Error generating agent specification: %s", e)
+        GENERATIONS.labels("agent", "fallback").inc()
         # Provide a fallback agent if AIQToolkit fails
         return generate_fallback_agent(request_data)
 
+async def run_agent_workflow(workflow_input: Dict) -> AgentSpecification:
+    """Run the agent creation workflow for a prepared workflow input"""
+    result = await get_executor().run("agent_creation", workflow_input)
+    with STAGE_DURATION.labels("validate_agent").time():
+        return AgentSpecification(**result)
+
 def generate_fallback_agent(request_data: dict) -> AgentSpecification:
     """Generate a fallback agent when AIQToolkit fails"""
     # Extract basic information from request
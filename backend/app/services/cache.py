@@ -0,0 +1,278 @@
+"""In-process result cache keyed on a quantized view of the game state.
+
+Successive game states sent by the frontend differ only slightly from one
+another, so strategies and agent specifications are cached under a key in
+which territory percentages, resource counts and agent counts are bucketed.
+Strategy keys also hold the spatial features the fallback rules and prompts
+read: enemies near each base and the bucketed frontline distance. Two states
+that fall into the same buckets share one cached result.
+
+When the shared state is shared between worker processes, a local miss is
+looked up there too, so a result generated by one worker is reused by all.
+"""
+import json
+import os
+import sys
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from ..schemas.agent_spec import AgentSpecification
+from ..schemas.strategy import TeamStrategy
+from ..shared_state import get_shared_state
+from .features import StateFeatures, extract_features
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (OrderedDict node, key tuple, timestamps)
+ENTRY_OVERHEAD_BYTES = 256
+# How often the frontend asks for a strategy and for an agent
+STRATEGY_INTERVAL_SECONDS = float(os.getenv("STRATEGY_INTERVAL_SECONDS", "30"))
+AGENT_INTERVAL_SECONDS = float(os.getenv("AGENT_INTERVAL_SECONDS", "15"))
+# Results outlive the next request of their cadence, with slack for jitter, but not the one after
+CADENCE_TTL_FACTOR = 1.5
+
+@dataclass(frozen=True)
+class QuantizationConfig:
+    """Bucket widths used when building cache keys"""
+    territory_bucket: float = 5.0  # percentage points
+    resource_bucket: int = 25      # units of energy/materials/data
+    agent_bucket: int = 2          # agents per team or per type
+    threat_bucket: int = 1         # enemies near a base
+    frontline_bucket: float = 5.0  # hexes between the fronts
+
+    @classmethod
+    def from_env(cls) -> "QuantizationConfig":
+        return cls(
+            territory_bucket=float(os.getenv("CACHE_TERRITORY_BUCKET", "5")),
+            resource_bucket=int(os.getenv("CACHE_RESOURCE_BUCKET", "25")),
+            agent_bucket=int(os.getenv("CACHE_AGENT_BUCKET", "2")),
+            threat_bucket=int(os.getenv("CACHE_THREAT_BUCKET", "1")),
+            frontline_bucket=float(os.getenv("CACHE_FRONTLINE_BUCKET", "5"))
+        )
+
+def quantize(value: float, bucket: float) -> int:
+    """Map a value to its bucket index (bucket widths <= 0 disable quantization)"""
+    if bucket <= 0:
+        return value
+    return int(value // bucket)
+
+def _field(obj: Any, name: str, default: Any = 0) -> Any:
+    """Read a field from either a pydantic model or a plain dict"""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+def _quantize_resources(resources: Any, bucket: int) -> Tuple[int, int, int]:
+    return tuple(
+        quantize(_field(resources, name) or 0, bucket)
+        for name in ("energy", "materials", "data")
+    )
+
+def _quantize_optional(value: Optional[float], bucket: float) -> Optional[int]:
+    return None if value is None else quantize(value, bucket)
+
+def strategy_cache_key(game_state: Any, team_id: str, config: QuantizationConfig,
+                       features: Optional[StateFeatures] = None) -> Tuple:
+    """Build the cache key for a team strategy request (features are extracted unless given)"""
+    territory = tuple(sorted(
+        (team, quantize(value, config.territory_bucket))
+        for team, value in game_state.territory_control.items()
+    ))
+    resources = tuple(sorted(
+        (team, _quantize_resources(team_resources, config.resource_bucket))
+        for team, team_resources in game_state.resources.items()
+    ))
+    agents = tuple(sorted(
+        (team, quantize(len(team_agents), config.agent_bucket))
+        for team, team_agents in game_state.agents.items()
+    ))
+    if features is None:
+        features = extract_features(game_state, team_id)
+    spatial = (
+        _quantize_optional(features.own.enemies_near_base, config.threat_bucket),
+        _quantize_optional(features.opponent.enemies_near_base, config.threat_bucket),
+        _quantize_optional(features.frontline_distance, config.frontline_bucket)
+    )
+    return ("strategy", team_id, territory, resources, agents, spatial)
+
+def agent_cache_key(request_data: dict, team_id: str, config: QuantizationConfig) -> Tuple:
+    """Build the cache key for an agent specification request"""
+    strategy = request_data.get("strategy") or {}
+    priorities = tuple(strategy.get("priorities") or ())
+    resources = _quantize_resources(request_data.get("resources") or {}, config.resource_bucket)
+    composition = tuple(sorted(
+        (str(entry.get("type")), quantize(entry.get("count", 1) or 0, config.agent_bucket))
+        for entry in request_data.get("current_agents") or []
+        if isinstance(entry, dict)
+    ))
+    return (
+        "agent",
+        team_id,
+        strategy.get("strategy"),
+        strategy.get("focus"),
+        priorities,
+        resources,
+        composition
+    )
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory held by a cached value"""
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json()) + ENTRY_OVERHEAD_BYTES
+    return sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+
+class QuantizedCache:
+    """LRU cache with a TTL, bounded by entry count and approximate bytes"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 4 * 1024 * 1024,
+        ttl_seconds: float = 20.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> (expires_at, size, value); ordered from least to most recently used
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss or expiry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, value = entry
+        if expires_at <= self._clock():
+            self._remove(key, size)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting least recently used entries if needed"""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        existing = self._entries.get(key)
+        if existing is not None:
+            self._remove(key, existing[1])
+
+        self._entries[key] = (self._clock() + self.ttl_seconds, size, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key, (_, oldest_size, _) = next(iter(self._entries.items()))
+            self._remove(oldest_key, oldest_size)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache effectiveness counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _remove(self, key: Hashable, size: int) -> None:
+        del self._entries[key]
+        self._bytes -= size
+
+class SharedResultCache:
+    """A worker's QuantizedCache in front of the cache in the shared state"""
+
+    def __init__(self, name: str, local: QuantizedCache, model: Type[BaseModel]):
+        self.name = name
+        self.local = local
+        self.model = model
+        self.shared_hits = 0
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def shared_key(self, key: Hashable) -> str:
+        return f"{self.name}:{json.dumps(key, default=str)}"
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value from this worker, or from the shared state on a local miss"""
+        value = self.local.get(key)
+        shared_state = get_shared_state()
+        if value is not None or not shared_state.distributed:
+            return value
+        try:
+            raw = await shared_state.cache_get(self.shared_key(key))
+        except Exception as e:
+            logger.warning("Shared %s cache lookup failed: %s", self.name, e)
+            return None
+        if raw is None:
+            return None
+        value = self.model.model_validate_json(raw)
+        self.local.set(key, value)
+        self.shared_hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: BaseModel) -> None:
+        """Store value in this worker and in the shared state"""
+        self.local.set(key, value)
+        shared_state = get_shared_state()
+        if not shared_state.distributed:
+            return
+        try:
+            await shared_state.cache_set(self.shared_key(key), value.model_dump_json(), self.local.ttl_seconds)
+        except Exception as e:
+            logger.warning("Shared %s cache store failed: %s", self.name, e)
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.local.stats(), shared_hits=self.shared_hits)
+
+def cadence_ttl(interval_seconds: float) -> float:
+    """TTL for results requested every interval_seconds, unless CACHE_TTL_SECONDS overrides it"""
+    return float(os.getenv("CACHE_TTL_SECONDS", interval_seconds * CADENCE_TTL_FACTOR))
+
+def _cache_from_env(interval_seconds: float) -> QuantizedCache:
+    return QuantizedCache(
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(4 * 1024 * 1024))),
+        ttl_seconds=cadence_ttl(interval_seconds)
+    )
+
+quantization = QuantizationConfig.from_env()
+strategy_cache = SharedResultCache("strategy", _cache_from_env(STRATEGY_INTERVAL_SECONDS), TeamStrategy)
+agent_cache = SharedResultCache("agent", _cache_from_env(AGENT_INTERVAL_SECONDS), AgentSpecification)
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every result cache, keyed by cache name"""
+    return {"strategy": strategy_cache.stats(), "agent": agent_cache.stats()}
@@ -0,0 +1,330 @@
+"""Per-client game state tracking and directive generation for the WebSocket.
+
+Each connected client has a ``GameSession`` holding the authoritative game
+state as last reported by that client. A full snapshot is sent on connect (or
+when the server asks for a resync), after which the client only sends deltas:
+changed or removed agents and updated territory/resource figures. After every
+update the session checks the strategy and spawn thresholds and emits
+directives only when a threshold changes.
+
+Directives are generated in background tasks so the receive loop keeps
+applying the client's messages while the LLM works. Those done within
+``DIRECTIVE_INLINE_SECONDS`` (fallbacks, cache hits) go out with the reply;
+the rest are handed to the session's ``push`` callback when ready. A newer
+threshold change for the same team supersedes a generation still running.
+
+Client -> server messages:
+    {"type": "snapshot", "seq": 0, "data": {<game state>}}
+    {"type": "delta", "seq": 1, "data": {"agents": {"red": {"upsert": [...], "remove": [3]}},
+                                         "territory_control": {...}, "resources": {...}}}
+
+Binary frames carry the same messages in MessagePack (with agents optionally
+as columns, see schemas/compact.py) or a snapshot in the packed binary layout.
+
+Server -> client messages:
+    {"type": "directive", "data": {"team": "red", "strategy": {...}}}
+    {"type": "agent_recommendation", "data": {"team": "red", "specification": {...}}}
+    {"type": "resync", "data": {"reason": "...", "expected_seq": 2}}
+"""
+import asyncio
+import functools
+import json
+import os
+import logging
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Set, Tuple
+
+from ..schemas.compact import (
+    PACKED_MAGIC,
+    ColumnarAgents,
+    CompactFormatError,
+    decode_msgpack_payload,
+    decode_packed
+)
+from ..schemas.game_state import GameState
+from .agent_service import generate_agent_specification
+from .strategy_service import classify_territory, generate_team_strategy
+
+logger = logging.getLogger(__name__)
+
+TEAMS = ("red", "blue")
+
+# Total team resources needed before a spawn is recommended (mirrors SpawnerSystem)
+SPAWN_RESOURCE_THRESHOLD = int(os.getenv("SPAWN_RESOURCE_THRESHOLD", "50"))
+# Minimum of each resource needed for the cheapest agent (80% of the base cost of 10)
+SPAWN_MIN_RESOURCE = int(os.getenv("SPAWN_MIN_RESOURCE", "8"))
+# Directives generated within this time are sent with the reply, slower ones are pushed when ready
+DIRECTIVE_INLINE_SECONDS = float(os.getenv("DIRECTIVE_INLINE_SECONDS", "0.05"))
+
+# Frontend (camelCase) field names accepted in place of the backend ones
+FIELD_ALIASES = {
+    "territoryControl": "territory_control",
+    "resourcesOnMap": "resource_distribution",
+    "teamId": "team_id"
+}
+
+AGENT_FIELDS = ("id", "type", "health", "x", "y")
+AGENT_DEFAULTS = {"type": "unknown", "health": 0, "x": 0, "y": 0}
+
+Message = Tuple[str, Dict[str, Any]]
+
+def _normalize_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {FIELD_ALIASES.get(key, key): value for key, value in data.items()}
+
+def _agent_record(agent: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the agent fields the backend uses"""
+    record = {field: agent[field] for field in AGENT_FIELDS if field in agent}
+    if "type" not in record and "role" in agent:
+        record["type"] = agent["role"]
+    return record
+
+class GameSession:
+    """Authoritative game state for one WebSocket client"""
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.seq: Optional[int] = None
+        # Snapshots and deltas applied, so callers can tell whether a message changed the state
+        self.updates = 0
+        self.territory_control: Dict[str, float] = {}
+        self.resources: Dict[str, Dict[str, int]] = {}
+        self.resource_distribution: Dict[str, int] = {}
+        self.agents: Dict[str, Dict[int, Dict[str, Any]]] = {team: {} for team in TEAMS}
+        self.strategies: Dict[str, Dict[str, Any]] = {}
+        self._territory_situation: Dict[str, str] = {}
+        self._spawn_ready: Dict[str, bool] = {}
+        # Delivers directives that outlast DIRECTIVE_INLINE_SECONDS; without it they are awaited inline
+        self.push: Optional[Callable[[List[Message]], Awaitable[None]]] = None
+        # (message type, team) -> running generation
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._pushes: Set[asyncio.Task] = set()
+
+    @property
+    def has_state(self) -> bool:
+        return self.seq is not None
+
+    async def handle_message(self, raw: str) -> List[Message]:
+        """Apply one client message and return the messages to send back"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return [("error", {"reason": "invalid JSON"})]
+        return await self.handle(message)
+
+    async def handle_frame(self, frame: bytes) -> List[Message]:
+        """Apply one binary (packed or MessagePack) client message"""
+        try:
+            if frame[:len(PACKED_MAGIC)] == PACKED_MAGIC:
+                state = decode_packed(frame)
+                message = {"type": "snapshot", "data": {
+                    **state.header(),
+                    "agents": {team: agents.to_records() for team, agents in state.agents.items()}
+                }}
+            else:
+                message = decode_msgpack_payload(frame)
+                if not isinstance(message, dict):
+                    raise CompactFormatError("MessagePack message must be a map")
+                data = message.get("data", {})
+                # Columnar agents in a snapshot: {"red": {"ids": [...], "types": [...], ...}}
+                if message.get("type", "snapshot") in ("snapshot", "gameState") and isinstance(data.get("agents"), dict):
+                    data["agents"] = {
+                        team: ColumnarAgents.from_columns(columns).to_records() if isinstance(columns, dict) else columns
+                        for team, columns in data["agents"].items()
+                    }
+        except CompactFormatError as e:
+            return [("error", {"reason": str(e)})]
+        return await self.handle(message)
+
+    async def handle(self, message: Dict[str, Any]) -> List[Message]:
+        message_type = message.get("type", "snapshot")
+        data = message.get("data", {})
+        seq = message.get("seq")
+
+        # Heartbeat replies only mark the client as alive
+        if message_type == "pong":
+            return []
+        # "gameState" is the full-state message sent by older frontends
+        if message_type in ("snapshot", "gameState"):
+            self.apply_snapshot(data, seq)
+        elif message_type == "delta":
+            if not self.has_state:
+                return [("resync", {"reason": "no snapshot received"})]
+            if seq is not None and seq != self.seq + 1:
+                logger.info("Client %s sent delta %s, expected %d", self.client_id, seq, self.seq + 1)
+                return [("resync", {"reason": "sequence gap", "expected_seq": self.seq + 1})]
+            self.apply_delta(data, seq)
+        else:
+            return [("error", {"reason": f"unknown message type: {message_type}"})]
+
+        return await self.directives()
+
+    def apply_snapshot(self, data: Dict[str, Any], seq: Optional[int] = None) -> None:
+        data = _normalize_fields(data)
+        self.updates += 1
+        self.seq = seq if seq is not None else 0
+        self.territory_control = dict(data.get("territory_control", {}))
+        self.resources = {team: dict(values) for team, values in data.get("resources", {}).items()}
+        self.resource_distribution = dict(data.get("resource_distribution", {}))
+        self.agents = {team: {} for team in TEAMS}
+        for team, team_agents in data.get("agents", {}).items():
+            self.agents[team] = {agent["id"]: _agent_record(agent) for agent in team_agents}
+
+    def apply_delta(self, data: Dict[str, Any], seq: Optional[int] = None) -> None:
+        data = _normalize_fields(data)
+        self.updates += 1
+        self.seq = seq if seq is not None else self.seq + 1
+        self.territory_control.update(data.get("territory_control", {}))
+        for team, values in data.get("resources", {}).items():
+            self.resources.setdefault(team, {}).update(values)
+        self.resource_distribution.update(data.get("resource_distribution", {}))
+
+        for team, changes in data.get("agents", {}).items():
+            team_agents = self.agents.setdefault(team, {})
+            for agent_id in changes.get("remove", []):
+                team_agents.pop(agent_id, None)
+            for agent in changes.get("upsert", []):
+                # Upserts may carry only the fields that changed
+                team_agents.setdefault(agent["id"], {}).update(_agent_record(agent))
+
+    def game_state(self, team_id: str) -> GameState:
+        """Build a validated GameState from the session for one team"""
+        return GameState(
+            team_id=team_id,
+            territory_control=self.territory_control,
+            resources={team: {"energy": 0, "materials": 0, "data": 0, **values}
+                       for team, values in self.resources.items()},
+            agents={team: [{**AGENT_DEFAULTS, **agent} for agent in agents.values()]
+                    for team, agents in self.agents.items()},
+            resource_distribution={key: value for key, value in self.resource_distribution.items()
+                                   if isinstance(value, (int, float))}
+        )
+
+    def spectator_view(self) -> Dict[str, Any]:
+        """The session state sent to spectators of this client's match"""
+        return {
+            "seq": self.seq,
+            "territory_control": self.territory_control,
+            "resources": self.resources,
+            "agents": {team: list(agents.values()) for team, agents in self.agents.items()}
+        }
+
+    async def directives(self) -> List[Message]:
+        """Emit strategy and spawn directives for teams whose thresholds changed"""
+        started: List[Tuple[Tuple[str, str], asyncio.Task]] = []
+        for team in TEAMS:
+            opponent = "blue" if team == "red" else "red"
+            situation = classify_territory(
+                self.territory_control.get(team, 0),
+                self.territory_control.get(opponent, 0)
+            )
+            if self._territory_situation.get(team) != situation:
+                self._territory_situation[team] = situation
+                started.append(self._start(("directive", team), self._strategy_directive(team, self.game_state(team))))
+
+            spawn_ready = self._is_spawn_ready(team)
+            if spawn_ready and not self._spawn_ready.get(team, False):
+                started.append(self._start(("agent_recommendation", team), self._agent_recommendation(team)))
+            self._spawn_ready[team] = spawn_ready
+        if not started:
+            return []
+
+        await asyncio.wait([task for _, task in started],
+                           timeout=DIRECTIVE_INLINE_SECONDS if self.push is not None else None)
+        messages: List[Message] = []
+        for key, task in started:
+            if not task.done():
+                task.add_done_callback(functools.partial(self._push_when_ready, key))
+            elif not task.cancelled() and task.exception() is None:
+                messages.append(task.result())
+            else:
+                self._log_failure(key, task)
+        return messages
+
+    def close(self) -> None:
+        """Cancel the directive generations still running"""
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+
+    def _start(self, key: Tuple[str, str],
+               coroutine: Coroutine[Any, Any, Message]) -> Tuple[Tuple[str, str], asyncio.Task]:
+        previous = self._pending.get(key)
+        if previous is not None:
+            # The state that started it is out of date
+            previous.cancel()
+        task = asyncio.ensure_future(coroutine)
+        self._pending[key] = task
+        task.add_done_callback(functools.partial(self._forget, key))
+        return key, task
+
+    def _forget(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+
+    def _push_when_ready(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is not None:
+            self._log_failure(key, task)
+            return
+        push = asyncio.ensure_future(self.push([task.result()]))
+        self._pushes.add(push)
+        push.add_done_callback(self._pushes.discard)
+
+    def _log_failure(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        if not task.cancelled():
+            logger.error("Generating %s for client %s failed: %s", key[0], self.client_id, task.exception())
+
+    async def _strategy_directive(self, team: str, game_state: GameState) -> Message:
+        strategy = await generate_team_strategy(game_state)
+        self.strategies[team] = strategy.model_dump()
+        return ("directive", {"team": team, "strategy": self.strategies[team]})
+
+    async def _agent_recommendation(self, team: str) -> Message:
+        # The recommendation follows the team's new strategy when one is being generated
+        strategy = self._pending.get(("directive", team))
+        if strategy is not None:
+            await asyncio.wait([strategy])
+        specification = await generate_agent_specification(self.agent_request(team))
+        return ("agent_recommendation", {"team": team, "specification": specification.model_dump()})
+
+    def agent_request(self, team: str) -> Dict[str, Any]:
+        """Build an agent specification request for a team from the session state"""
+        composition: Dict[str, int] = {}
+        for agent in self.agents.get(team, {}).values():
+            agent_type = agent.get("type", "unknown")
+            composition[agent_type] = composition.get(agent_type, 0) + 1
+        return {
+            "team_id": team,
+            "strategy": self.strategies.get(team, {}),
+            "resources": self.resources.get(team, {}),
+            "current_agents": [{"type": agent_type, "count": count} for agent_type, count in composition.items()]
+        }
+
+    def _is_spawn_ready(self, team: str) -> bool:
+        resources = self.resources.get(team)
+        if not resources:
+            return False
+        amounts = [resources.get(name, 0) for name in ("energy", "materials", "data")]
+        return min(amounts) >= SPAWN_MIN_RESOURCE and sum(amounts) > SPAWN_RESOURCE_THRESHOLD
+
+class SessionRegistry:
+    """Game sessions keyed by WebSocket client ID"""
+
+    def __init__(self):
+        self._sessions: Dict[str, GameSession] = {}
+
+    def open(self, client_id: str) -> GameSession:
+        session = GameSession(client_id)
+        self._sessions[client_id] = session
+        return session
+
+    def get(self, client_id: str) -> Optional[GameSession]:
+        return self._sessions.get(client_id)
+
+    def close(self, client_id: str) -> None:
+        session = self._sessions.pop(client_id, None)
+        if session is not None:
+            session.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+sessions = SessionRegistry()
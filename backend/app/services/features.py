@@ -0,0 +1,201 @@
+"""Vectorized spatial features derived from agent positions.
+
+Raw game states only carry per-team agent lists and territory percentages.
+This module derives the features the fallback logic and the prompts need:
+per-type counts, team centroids and spread, the frontline gap between the
+teams, enemies within N hexes of each base, and how clustered each team is.
+Everything is computed with NumPy over agent columns; radius queries and
+clustering use a uniform grid spatial index.
+"""
+import math
+import os
+from operator import attrgetter, itemgetter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..schemas.compact import FLOAT_DTYPE, ColumnarAgents
+
+# Hex radius used by the frontend HexGrid, and the centre-to-centre distance of neighbouring hexes
+HEX_SIZE = float(os.getenv("HEX_SIZE", "40"))
+HEX_SPACING = math.sqrt(3) * HEX_SIZE
+
+# Enemies within this many hexes of a base count as a threat to it
+BASE_THREAT_RADIUS_HEXES = float(os.getenv("BASE_THREAT_RADIUS_HEXES", "3"))
+# Width of the grid cells used to measure clustering, in hexes
+CLUSTER_CELL_HEXES = float(os.getenv("CLUSTER_CELL_HEXES", "3"))
+
+# Below this many points a radius query scans every point instead of using the cells
+BRUTE_FORCE_LIMIT = 256
+
+# Offset that keeps cell coordinates positive when packed into one int64 key
+_KEY_OFFSET = 1 << 20
+_KEY_STRIDE = 1 << 21
+
+class UniformGrid:
+    """Spatial index bucketing points into square cells of a fixed size"""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, cell_size: float):
+        self.x = x
+        self.y = y
+        self.cell_size = cell_size
+        keys = self._keys(np.floor(x / cell_size), np.floor(y / cell_size))
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    @staticmethod
+    def _keys(cell_x: np.ndarray, cell_y: np.ndarray) -> np.ndarray:
+        return (cell_x.astype(np.int64) + _KEY_OFFSET) * _KEY_STRIDE + (cell_y.astype(np.int64) + _KEY_OFFSET)
+
+    def cell_counts(self) -> np.ndarray:
+        """Number of points in each occupied cell"""
+        if not len(self.sorted_keys):
+            return np.empty(0, dtype=np.int64)
+        boundaries = np.flatnonzero(np.diff(self.sorted_keys)) + 1
+        return np.diff(np.concatenate(([0], boundaries, [len(self.sorted_keys)])))
+
+    def query_radius(self, px: float, py: float, radius: float) -> np.ndarray:
+        """Indices of points within radius of (px, py)"""
+        if not len(self.sorted_keys):
+            return np.empty(0, dtype=np.int64)
+        if len(self.sorted_keys) <= BRUTE_FORCE_LIMIT:
+            # Scanning a few hundred points beats the cell lookups
+            return np.flatnonzero((self.x - px) ** 2 + (self.y - py) ** 2 <= radius * radius)
+        # Cells sharing an x coordinate have consecutive keys, so each column of
+        # the bounding box is one contiguous slice of the sorted keys
+        x_cells = np.arange(math.floor((px - radius) / self.cell_size), math.floor((px + radius) / self.cell_size) + 1)
+        y_low = math.floor((py - radius) / self.cell_size)
+        y_high = math.floor((py + radius) / self.cell_size)
+        starts = np.searchsorted(self.sorted_keys, self._keys(x_cells, np.full_like(x_cells, y_low)), side="left")
+        ends = np.searchsorted(self.sorted_keys, self._keys(x_cells, np.full_like(x_cells, y_high)), side="right")
+        candidates = np.concatenate([self.order[start:end] for start, end in zip(starts.tolist(), ends.tolist())])
+        distance_sq = (self.x[candidates] - px) ** 2 + (self.y[candidates] - py) ** 2
+        return candidates[distance_sq <= radius * radius]
+
+@dataclass
+class TeamFeatures:
+    """Derived features for one team"""
+    count: int = 0
+    type_counts: Dict[str, int] = field(default_factory=dict)
+    mean_health: float = 0.0
+    centroid: Optional[Tuple[float, float]] = None
+    spread: float = 0.0            # mean distance to the centroid, in hexes
+    cluster_count: int = 0         # occupied clustering cells
+    concentration: float = 0.0     # share of agents in the densest cell
+    enemies_near_base: Optional[int] = None
+
+@dataclass
+class StateFeatures:
+    """Derived features for a game state, from the perspective of team_id"""
+    team_id: str
+    opponent_id: str
+    teams: Dict[str, TeamFeatures]
+    frontline_distance: Optional[float] = None  # hexes between the fronts; negative when they overlap
+
+    @property
+    def own(self) -> TeamFeatures:
+        return self.teams.get(self.team_id, TeamFeatures())
+
+    @property
+    def opponent(self) -> TeamFeatures:
+        return self.teams.get(self.opponent_id, TeamFeatures())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def _columns(agents: Any) -> ColumnarAgents:
+    if isinstance(agents, ColumnarAgents):
+        return agents
+    if not agents:
+        return ColumnarAgents.empty()
+    return ColumnarAgents.from_agents(agents)
+
+def _position(base: Any) -> Optional[Tuple[float, float]]:
+    if base is None:
+        return None
+    if isinstance(base, dict):
+        return float(base["x"]), float(base["y"])
+    return float(base.x), float(base.y)
+
+def _coordinates(agents: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """x and y columns of an agent list, read without building the other columns"""
+    if isinstance(agents, ColumnarAgents):
+        return agents.x, agents.y
+    agents = list(agents)
+    get = itemgetter if agents and isinstance(agents[0], dict) else attrgetter
+    return tuple(np.fromiter(map(get(name), agents), FLOAT_DTYPE, len(agents)) for name in ("x", "y"))
+
+def enemies_near_base(game_state: Any, team_id: str) -> Optional[int]:
+    """Enemy agents within BASE_THREAT_RADIUS_HEXES of team_id's base, None when its base is unknown"""
+    base = _position((getattr(game_state, "bases", None) or {}).get(team_id))
+    if base is None:
+        return None
+    enemy = game_state.agents.get("blue" if team_id == "red" else "red")
+    if enemy is None or not len(enemy):
+        return 0
+    x, y = _coordinates(enemy)
+    radius = BASE_THREAT_RADIUS_HEXES * HEX_SPACING
+    # Same arithmetic as UniformGrid.query_radius, so both agree on agents at the edge
+    return int(np.count_nonzero((x - base[0]) ** 2 + (y - base[1]) ** 2 <= radius * radius))
+
+def _team_features(agents: ColumnarAgents, cell_size: float) -> Tuple[TeamFeatures, Optional[UniformGrid]]:
+    count = len(agents)
+    if not count:
+        return TeamFeatures(), None
+
+    x, y = agents.x, agents.y
+    cx, cy = float(x.sum(dtype=np.float64)) / count, float(y.sum(dtype=np.float64)) / count
+    grid = UniformGrid(x, y, cell_size)
+    cell_counts = grid.cell_counts()
+
+    return TeamFeatures(
+        count=count,
+        type_counts=agents.type_counts(),
+        mean_health=float(agents.health.sum(dtype=np.float64)) / count,
+        centroid=(cx, cy),
+        spread=float(np.hypot(x - cx, y - cy).sum(dtype=np.float64)) / count / HEX_SPACING,
+        cluster_count=int(len(cell_counts)),
+        concentration=float(cell_counts.max()) / count
+    ), grid
+
+def _frontline_distance(own: ColumnarAgents, own_centroid, enemy: ColumnarAgents, enemy_centroid) -> Optional[float]:
+    """Gap between the teams' fronts along the axis joining their centroids"""
+    ax = enemy_centroid[0] - own_centroid[0]
+    ay = enemy_centroid[1] - own_centroid[1]
+    length = math.hypot(ax, ay)
+    if length == 0.0:
+        return 0.0
+    ax, ay = ax / length, ay / length
+    own_front = float((own.x * ax + own.y * ay).max())
+    enemy_front = float((enemy.x * ax + enemy.y * ay).min())
+    return (enemy_front - own_front) / HEX_SPACING
+
+def extract_features(game_state: Any, team_id: str) -> StateFeatures:
+    """Compute spatial features for a GameState or CompactGameState from the view of team_id ('red'/'blue')"""
+    opponent_id = "blue" if team_id == "red" else "red"
+    cell_size = CLUSTER_CELL_HEXES * HEX_SPACING
+    threat_radius = BASE_THREAT_RADIUS_HEXES * HEX_SPACING
+    bases = getattr(game_state, "bases", None) or {}
+
+    columns = {team: _columns(agents) for team, agents in game_state.agents.items()}
+    teams: Dict[str, TeamFeatures] = {}
+    grids: Dict[str, Optional[UniformGrid]] = {}
+    for team, agents in columns.items():
+        teams[team], grids[team] = _team_features(agents, cell_size)
+
+    for team in teams:
+        base = _position(bases.get(team))
+        enemy = "blue" if team == "red" else "red"
+        if base is not None:
+            enemy_grid = grids.get(enemy)
+            teams[team].enemies_near_base = (
+                int(len(enemy_grid.query_radius(base[0], base[1], threat_radius))) if enemy_grid else 0
+            )
+
+    frontline = None
+    own, enemy = teams.get(team_id), teams.get(opponent_id)
+    if own and enemy and own.count and enemy.count:
+        frontline = _frontline_distance(columns[team_id], own.centroid, columns[opponent_id], enemy.centroid)
+
+    return StateFeatures(team_id=team_id, opponent_id=opponent_id, teams=teams, frontline_distance=frontline)
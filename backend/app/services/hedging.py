@@ -0,0 +1,71 @@
+"""Deadline-aware execution of workflow-backed requests.
+
+The frontend abandons backend calls after a fixed timeout. When a request
+carries a client deadline, the caller gets the deterministic fallback as soon
+as the deadline is reached while the workflow keeps running in the background.
+Once it finishes, the upgraded result is handed to a callback (normally a
+WebSocket push to the requesting client).
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Optional, Set, TypeVar
+
+from ..metrics import DEADLINE_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Time reserved for serializing the response and getting it back to the client
+DEADLINE_MARGIN_MS = float(os.getenv("DEADLINE_MARGIN_MS", "250"))
+
+# Background workflow runs that outlived their request, kept alive until done
+_background_tasks: Set[asyncio.Future] = set()
+
+def parse_deadline_ms(value: Optional[float]) -> Optional[float]:
+    """Convert a client deadline in milliseconds to the server-side budget in seconds"""
+    if value is None or value <= 0:
+        return None
+    return max(0.0, value - DEADLINE_MARGIN_MS) / 1000.0
+
+def _track(task: asyncio.Future) -> None:
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def run_with_deadline(
+    work: Awaitable[T],
+    deadline_seconds: Optional[float],
+    fallback: Callable[[], T],
+    on_late_result: Optional[Callable[[T, T], Awaitable[None]]] = None
+) -> T:
+    """
+    Await work, returning fallback() if it is not done within deadline_seconds
+
+    When the deadline is hit, work keeps running and on_late_result is called
+    with (late_result, fallback_result) once it completes successfully.
+    """
+    if deadline_seconds is None:
+        return await work
+
+    task = asyncio.ensure_future(work)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=deadline_seconds)
+    except asyncio.TimeoutError:
+        pass
+
+    fallback_result = fallback()
+    DEADLINE_FALLBACKS.inc()
+    logger.info("Deadline of %.3fs reached, returning fallback and continuing in background", deadline_seconds)
+    _track(task)
+
+    def deliver(done: asyncio.Future) -> None:
+        if done.cancelled() or done.exception() is not None or on_late_result is None:
+            return
+        _track(asyncio.ensure_future(on_late_result(done.result(), fallback_result)))
+
+    task.add_done_callback(deliver)
+    return fallback_result
+
+def pending_background_tasks() -> int:
+    return len(_background_tasks)
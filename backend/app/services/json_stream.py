@@ -0,0 +1,142 @@
+"""Incremental parsing of a JSON object streamed by an LLM.
+
+``IncrementalObjectParser`` is fed the completion text as it arrives and
+returns each top-level field as soon as its value is complete, so a caller
+can act on ``"strategy"`` long before ``"description"`` has been generated.
+Output that cannot be a JSON object raises ``ValueError`` at the first
+offending character rather than when the completion ends.
+"""
+import json
+from typing import Any, List, Tuple
+
+# Characters a JSON value can start with
+VALUE_START = set('"{[-0123456789tfn')
+WHITESPACE = set(" \t\r\n")
+
+# Parser states
+PREAMBLE, KEY, IN_KEY, COLON, VALUE, AFTER_VALUE, DONE = range(7)
+
+class IncrementalObjectParser:
+    """Parse a streamed JSON object, returning each top-level field once its value is complete"""
+
+    def __init__(self, max_preamble: int = 64):
+        # Models sometimes open with a code fence or a few words; anything longer is not JSON
+        self.max_preamble = max_preamble
+        self._state = PREAMBLE
+        self._preamble = 0
+        self._key: List[str] = []
+        self._value: List[str] = []
+        self._current_key = ""
+        self._fields = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        """True once the closing brace of the object has been read"""
+        return self._state == DONE
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Consume the next chunk and return the fields it completed"""
+        fields: List[Tuple[str, Any]] = []
+        for char in text:
+            if self._state == DONE:
+                break
+            self._step(char, fields)
+        return fields
+
+    def close(self) -> None:
+        """Check the completion ended with a complete object"""
+        if self._state != DONE:
+            raise ValueError("Completion ended before the JSON object was complete")
+
+    def _step(self, char: str, fields: List[Tuple[str, Any]]) -> None:
+        state = self._state
+        if state == VALUE:
+            self._value_char(char, fields)
+        elif state == IN_KEY:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._current_key = json.loads('"' + "".join(self._key) + '"')
+                self._key = []
+                self._state = COLON
+                return
+            self._key.append(char)
+        elif char in WHITESPACE:
+            return
+        elif state == PREAMBLE:
+            if char == "{":
+                self._state = KEY
+            else:
+                self._preamble += 1
+                if self._preamble > self.max_preamble:
+                    raise ValueError("Completion does not start with a JSON object")
+        elif state == KEY:
+            if char == '"':
+                self._state = IN_KEY
+            elif char == "}" and self._fields == 0:
+                self._state = DONE
+            else:
+                raise ValueError(f"Expected a field name, got {char!r}")
+        elif state == COLON:
+            if char != ":":
+                raise ValueError(f"Expected ':' after field {self._current_key!r}, got {char!r}")
+            self._state = VALUE
+        elif state == AFTER_VALUE:
+            self._after_value(char)
+
+    def _after_value(self, char: str) -> None:
+        if char == ",":
+            self._state = KEY
+        elif char == "}":
+            self._state = DONE
+        elif char not in WHITESPACE:
+            raise ValueError(f"Expected ',' or '}}' after field {self._current_key!r}, got {char!r}")
+
+    def _value_char(self, char: str, fields: List[Tuple[str, Any]]) -> None:
+        if not self._value:
+            if char in WHITESPACE:
+                return
+            if char not in VALUE_START:
+                raise ValueError(f"Field {self._current_key!r} has no valid value, got {char!r}")
+
+        first = self._value[0] if self._value else char
+        # Numbers and literals have no closing delimiter; they end at the next separator
+        if first not in '"{[' and (char in ",}" or char in WHITESPACE):
+            self._complete_value(fields)
+            self._after_value(char)
+            return
+
+        self._value.append(char)
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._complete_value(fields)
+        elif char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._complete_value(fields)
+
+    def _complete_value(self, fields: List[Tuple[str, Any]]) -> None:
+        raw = "".join(self._value)
+        self._value = []
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Field {self._current_key!r} is not valid JSON: {e}") from e
+        fields.append((self._current_key, value))
+        self._fields += 1
+        self._state = AFTER_VALUE
@@ -0,0 +1,123 @@
+"""Compact, token-budgeted workflow inputs for the LLM prompts.
+
+The prompts need the shape of a game, not its raw fields: agent lists become
+per-type histograms, positions become a few spatial summary lines derived by
+``features.py``, and territory and resource figures are rounded. Each builder
+yields inputs from the most to the least detailed - fewer histogram entries,
+fewer summary lines, coarser rounding - and ``fit`` keeps the first one whose
+rendered prompt stays within ``PROMPT_TOKEN_BUDGET`` estimated tokens.
+"""
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from ..metrics import PROMPT_DETAIL
+from ..schemas.game_state import GameState
+from .features import StateFeatures, TeamFeatures, extract_features
+from .workflow_executor import estimate_tokens, get_executor
+
+# Estimated tokens a whole prompt (instructions included) may take; 0 disables the budget
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "512"))
+# Histogram entries kept below the most detailed level; the rest are summed up as "other"
+HISTOGRAM_TOP_TYPES = 4
+
+RESOURCE_NAMES = ("energy", "materials", "data")
+
+def round_figure(value: Any, step: int = 1) -> Any:
+    """Round a figure to a multiple of step, leaving anything that is not a number as it is"""
+    try:
+        return int(round(float(value) / step) * step)
+    except (TypeError, ValueError):
+        return value
+
+def histogram(counts: Dict[str, int], limit: Optional[int] = None) -> str:
+    """Counts as "collector 5, explorer 3", the largest first"""
+    ordered = sorted(((name, count) for name, count in counts.items() if count), key=lambda item: (-item[1], item[0]))
+    if limit is not None and len(ordered) > limit:
+        ordered = ordered[:limit] + [("other", sum(count for _, count in ordered[limit:]))]
+    return ", ".join(f"{name} {count}" for name, count in ordered)
+
+def situation_lines(features: StateFeatures) -> List[str]:
+    """Spatial summary of a game state, the most decisive lines first"""
+    own, opponent = features.own, features.opponent
+    lines = []
+    if own.enemies_near_base is not None:
+        lines.append(f"Enemy agents near your base: {own.enemies_near_base}")
+    if opponent.enemies_near_base is not None:
+        lines.append(f"Your agents near the enemy base: {opponent.enemies_near_base}")
+    if features.frontline_distance is not None:
+        gap = round(features.frontline_distance)
+        lines.append(f"The fronts overlap by {-gap} hexes" if gap < 0 else f"The fronts are {gap} hexes apart")
+    if own.count and opponent.count:
+        lines.append(f"Agents spread {round(own.spread)} hexes around their centre (opponent {round(opponent.spread)})")
+        lines.append(f"Mean agent health {round(own.mean_health)} (opponent {round(opponent.mean_health)})")
+    return lines
+
+def strategy_inputs(game_state: GameState, team_id: str,
+                    features: Optional[StateFeatures] = None) -> Iterator[Dict[str, Any]]:
+    """Team strategy workflow inputs for a game state (team_id normalized), from most to least detailed"""
+    if features is None:
+        features = extract_features(game_state, team_id)
+    opponent_id = features.opponent_id
+    situation = situation_lines(features)
+    teams = (team_id, opponent_id)
+    # (histogram entries, situation lines, rounding step) per level
+    for types_limit, lines, step in ((None, len(situation), 1), (HISTOGRAM_TOP_TYPES, 2, 1), (0, 0, 5)):
+        agents = {}
+        for team in teams:
+            team_features = features.teams.get(team, TeamFeatures())
+            types = histogram(team_features.type_counts, types_limit) if types_limit != 0 else ""
+            agents[team] = {"count": team_features.count, "types": types}
+        resources = {}
+        for team in teams:
+            team_resources = game_state.resources.get(team)
+            values = team_resources.model_dump() if team_resources is not None else {}
+            resources[team] = {name: round_figure(values.get(name, 0), step) for name in RESOURCE_NAMES}
+        yield {
+            "team_id": team_id,
+            "opponent_id": opponent_id,
+            "territory_control": {team: round_figure(game_state.territory_control.get(team, 0), step) for team in teams},
+            "agents": agents,
+            "resources": resources,
+            "resource_distribution": histogram({
+                name: round_figure(amount, step) for name, amount in game_state.resource_distribution.items()
+            }) or "none",
+            "situation": situation[:lines]
+        }
+
+def agent_inputs(request_data: Dict[str, Any], team_id: str, count: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Agent creation (or spawn plan, given count) workflow inputs for a request, from most to least detailed"""
+    strategy = request_data.get("strategy") or {}
+    resources = request_data.get("resources") or {}
+    composition: Dict[str, int] = {}
+    for entry in request_data.get("current_agents") or []:
+        agents = round_figure(entry.get("count")) if isinstance(entry, dict) else None
+        if isinstance(agents, int) and entry.get("type") is not None:
+            composition[str(entry["type"])] = composition.get(str(entry["type"]), 0) + agents
+    priorities = strategy.get("priorities") or []
+    for types_limit, step in ((None, 1), (HISTOGRAM_TOP_TYPES, 1), (HISTOGRAM_TOP_TYPES, 10)):
+        workflow_input = {
+            "team_id": team_id,
+            "strategy": {
+                "strategy": strategy.get("strategy"),
+                "focus": strategy.get("focus"),
+                "priorities": ", ".join(str(priority) for priority in priorities) if isinstance(priorities, list) else priorities
+            },
+            "resources": {name: round_figure(resources.get(name, 0), step) for name in RESOURCE_NAMES},
+            "current_agents": histogram(composition, types_limit) or "none"
+        }
+        if count is not None:
+            workflow_input["count"] = count
+        yield workflow_input
+
+def fit(workflow: str, inputs: Iterable[Dict[str, Any]], step: Optional[str] = None,
+        budget: Optional[int] = None) -> Dict[str, Any]:
+    """The most detailed input whose rendered prompt fits the token budget, else the least detailed"""
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    metric_name = workflow if step is None else f"{workflow}.{step}"
+    chosen: Optional[Dict[str, Any]] = None
+    for level, workflow_input in enumerate(inputs):
+        chosen = workflow_input
+        if budget <= 0 or estimate_tokens(get_executor().render_prompt(workflow, workflow_input, step)) <= budget:
+            break
+    PROMPT_DETAIL.labels(metric_name, str(level)).inc()
+    return chosen
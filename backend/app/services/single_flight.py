@@ -0,0 +1,70 @@
+"""Coalescing of identical in-flight workflow runs.
+
+Concurrent callers asking for the same normalized workflow input await one
+shared task instead of each starting their own LLM call. Callers await the
+task through ``asyncio.shield`` so a caller that goes away (for example a
+client disconnecting mid-request) does not cancel the run for the others.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def _json_default(value: Any) -> Any:
+    """Serialize pydantic models and other objects found in workflow inputs"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+def workflow_key(workflow_name: str, workflow_input: Dict[str, Any]) -> str:
+    """Build a stable key for a workflow run from its normalized input"""
+    payload = json.dumps(workflow_input, sort_keys=True, separators=(",", ":"), default=_json_default)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{workflow_name}:{digest}"
+
+class SingleFlight:
+    """Run at most one task per key; concurrent callers share its result"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await the shared run for key, starting it with factory if none is in flight"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Coalesced workflow call for %s", key)
+
+        # Shield so cancelling this caller leaves the shared task running
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every caller has already gone away
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Shared workflow call for %s failed: %s", key, task.exception())
+
+workflow_flight = SingleFlight()
@@ -0,0 +1,171 @@
+"""Spawn plans: the next several agent specifications from one workflow call.
+
+Spawning one agent used to cost one LLM round trip. A spawn plan asks the
+agent_creation workflow (its plan_agents step) for an ordered queue of N
+agents at once. The agents that have not been handed out yet are kept per
+client and team, and /api/agent-specification serves from that queue until it
+runs out or the team's strategy changes.
+"""
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from . import agent_service
+from ..config import get_settings
+from ..metrics import GENERATIONS, STAGE_DURATION
+from ..schemas.agent_spec import MAX_ATTRIBUTE_SUM, AgentSpecification
+from .admission import AdmissionRejected, admission
+from .prompts import agent_inputs, fit
+from .single_flight import workflow_flight, workflow_key
+from .strategy_service import normalize_team_id
+from .workflow_executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+# Number of agents planned when the request does not ask for a count
+SPAWN_PLAN_SIZE = int(os.getenv("SPAWN_PLAN_SIZE", "5"))
+# Largest plan a single request may ask for
+SPAWN_PLAN_MAX_SIZE = int(os.getenv("SPAWN_PLAN_MAX_SIZE", "10"))
+
+QueueKey = Tuple[str, str]
+
+def strategy_signature(strategy: Optional[Dict[str, Any]]) -> Tuple:
+    """The parts of a strategy that decide which agents a team needs"""
+    strategy = strategy or {}
+    return (strategy.get("strategy"), strategy.get("focus"), tuple(strategy.get("priorities") or ()))
+
+def validate_plan_agents(items: Any) -> List[AgentSpecification]:
+    """Validate planned agents, dropping any outside the attribute bounds or sum limit"""
+    if not isinstance(items, list):
+        return []
+    agents = []
+    for index, item in enumerate(items):
+        try:
+            agent = AgentSpecification.model_validate(item)
+        except ValidationError as e:
+            logger.warning("Dropping planned agent %s: %s validation errors", index, e.error_count())
+            continue
+        if agent.attributes.total() > MAX_ATTRIBUTE_SUM + 1e-6:
+            logger.warning("Dropping planned agent %s: attribute sum %.2f exceeds %s", index, agent.attributes.total(), MAX_ATTRIBUTE_SUM)
+            continue
+        agents.append(agent)
+    return agents
+
+async def generate_spawn_plan(request_data: dict, count: int) -> List[AgentSpecification]:
+    """Generate the next count agents for a team with a single workflow call"""
+    try:
+        if get_settings().use_mock_responses:
+            logger.info("Using fallback spawn plan (mock mode enabled)")
+            GENERATIONS.labels("spawn_plan", "mock").inc()
+            return generate_fallback_plan(request_data, count)
+
+        normalized_team_id = normalize_team_id(request_data.get("team_id"))
+        with STAGE_DURATION.labels("build_prompt").time():
+            workflow_input = fit("agent_creation", agent_inputs(request_data, normalized_team_id, count), step="plan_agents")
+
+        logger.info("Generating spawn plan of %s agents for team %s", count, normalized_team_id)
+        agents = await workflow_flight.do(
+            workflow_key("agent_creation.plan_agents", workflow_input),
+            lambda: admission.run("agent", lambda: run_spawn_plan_workflow(workflow_input))
+        )
+        if not agents:
+            raise ValueError("workflow returned no valid agents")
+        GENERATIONS.labels("spawn_plan", "workflow").inc()
+        return agents[:count]
+
+    except AdmissionRejected as e:
+        logger.info("Using fallback spawn plan for team %s: %s", request_data.get('team_id'), e)
+        GENERATIONS.labels("spawn_plan", "shed").inc()
+        return generate_fallback_plan(request_data, count)
+    except Exception as e:
+        logger.error("Error generating spawn plan: %s", e)
+        GENERATIONS.labels("spawn_plan", "fallback").inc()
+        return generate_fallback_plan(request_data, count)
+
+async def run_spawn_plan_workflow(workflow_input: Dict) -> List[AgentSpecification]:
+    """Run the plan_agents step of the agent creation workflow"""
+    result = await get_executor().run("agent_creation", workflow_input, step="plan_agents")
+    with STAGE_DURATION.labels("validate_spawn_plan").time():
+        return validate_plan_agents(result.get("agents"))
+
+def generate_fallback_plan(request_data: dict, count: int) -> List[AgentSpecification]:
+    """Plan count copies of the fallback agent for the team's strategy"""
+    agent = agent_service.generate_fallback_agent(request_data)
+    return [agent.model_copy(deep=True) for _ in range(count)]
+
+@dataclass
+class PlanQueue:
+    """Planned agents not yet handed out, and the strategy they were planned for"""
+    signature: Tuple
+    agents: List[AgentSpecification] = field(default_factory=list)
+
+class SpawnQueues:
+    """Remaining planned agents per client and team; callers without a client ID get no queue"""
+
+    def __init__(self):
+        self._queues: Dict[QueueKey, PlanQueue] = {}
+        self.served = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def _key(client_id: str, team_id: str) -> QueueKey:
+        return (client_id, normalize_team_id(team_id))
+
+    def replace(self, client_id: Optional[str], team_id: str, strategy: Optional[Dict[str, Any]],
+                agents: List[AgentSpecification]) -> None:
+        # Anonymous callers cannot be told apart, so one's plan must not serve another's arena
+        if client_id is None:
+            return
+        key = self._key(client_id, team_id)
+        if not agents:
+            self._queues.pop(key, None)
+            return
+        self._queues[key] = PlanQueue(strategy_signature(strategy), list(agents))
+
+    def pop(self, client_id: Optional[str], team_id: str,
+            strategy: Optional[Dict[str, Any]]) -> Optional[AgentSpecification]:
+        """Take the next planned agent, if one was planned for this strategy"""
+        if client_id is None or not self.invalidate(client_id, team_id, strategy):
+            return None
+        queue = self._queues[self._key(client_id, team_id)]
+        agent = queue.agents.pop(0)
+        if not queue.agents:
+            del self._queues[self._key(client_id, team_id)]
+        self.served += 1
+        return agent
+
+    def invalidate(self, client_id: Optional[str], team_id: str, strategy: Optional[Dict[str, Any]]) -> bool:
+        """Drop the team's queue if it was planned for a different strategy; True if one remains"""
+        key = self._key(client_id, team_id)
+        queue = self._queues.get(key)
+        if queue is None:
+            return False
+        if queue.signature != strategy_signature(strategy):
+            del self._queues[key]
+            self.invalidated += 1
+            logger.info("Strategy changed for team %s, dropped %s planned agents", key[1], len(queue.agents))
+            return False
+        return True
+
+    def remaining(self, client_id: Optional[str], team_id: str) -> int:
+        if client_id is None:
+            return 0
+        queue = self._queues.get(self._key(client_id, team_id))
+        return len(queue.agents) if queue else 0
+
+    def forget(self, client_id: str) -> None:
+        for key in [key for key in self._queues if key[0] == client_id]:
+            del self._queues[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queues": len(self._queues),
+            "planned_agents": sum(len(queue.agents) for queue in self._queues.values()),
+            "served": self.served,
+            "invalidated": self.invalidated
+        }
+
+spawn_queues = SpawnQueues()
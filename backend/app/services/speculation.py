@@ -0,0 +1,312 @@
+"""Speculative pre-generation of strategies and agent specifications.
+
+The frontend asks for a new strategy on a fixed interval (30 s) and for a new
+agent roughly every spawn interval (15 s), so the next request is predictable.
+The scheduler learns each client's cadence from the requests it makes, starts
+the workflow shortly before the next request is due using the latest known
+state (the client's WebSocket session when it has one, otherwise the state of
+its last request), and hands the prepared result to the request when it
+arrives, provided the state has not drifted too far in the meantime.
+
+Clients are identified by X-Client-Id (the same ID as their WebSocket).
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .admission import BACKGROUND, admission, set_arena_priority
+from .agent_service import generate_agent_specification
+from .directive_service import sessions
+from .strategy_service import classify_territory, generate_team_strategy, normalize_team_id
+
+logger = logging.getLogger(__name__)
+
+# How often the scheduler checks for clients whose next request is due
+SPECULATION_TICK_SECONDS = float(os.getenv("SPECULATION_TICK_SECONDS", "0.5"))
+# Extra time, on top of the expected generation time, to start before a request is due
+SPECULATION_LEAD_SECONDS = float(os.getenv("SPECULATION_LEAD_SECONDS", "1.0"))
+# Request gaps longer than this are pauses, not cadence, and clients idle this long are forgotten
+SPECULATION_IDLE_SECONDS = float(os.getenv("SPECULATION_IDLE_SECONDS", "120"))
+# Largest change between the speculated and the actual state that still serves the prepared result
+SPECULATION_MAX_TERRITORY_DRIFT = float(os.getenv("SPECULATION_MAX_TERRITORY_DRIFT", "5"))
+SPECULATION_MAX_RESOURCE_DRIFT = int(os.getenv("SPECULATION_MAX_RESOURCE_DRIFT", "25"))
+SPECULATION_MAX_AGENT_DRIFT = int(os.getenv("SPECULATION_MAX_AGENT_DRIFT", "2"))
+
+# Weight of the newest sample in the interval and generation time averages
+EWMA_ALPHA = 0.3
+
+RESOURCE_NAMES = ("energy", "materials", "data")
+
+def _resource_values(resources: Any) -> Dict[str, float]:
+    if resources is None:
+        return {}
+    if isinstance(resources, dict):
+        return {name: resources.get(name, 0) for name in RESOURCE_NAMES}
+    return {name: getattr(resources, name, 0) for name in RESOURCE_NAMES}
+
+def _resources_within(prepared: Any, current: Any) -> bool:
+    prepared_values = _resource_values(prepared)
+    current_values = _resource_values(current)
+    return all(
+        abs(prepared_values.get(name, 0) - current_values.get(name, 0)) <= SPECULATION_MAX_RESOURCE_DRIFT
+        for name in RESOURCE_NAMES
+    )
+
+def strategy_state_within_drift(prepared: Any, current: Any) -> bool:
+    """Whether a strategy generated for the prepared game state still fits the current one"""
+    if normalize_team_id(prepared.team_id) != normalize_team_id(current.team_id):
+        return False
+    team_id = normalize_team_id(current.team_id)
+    opponent_id = "blue" if team_id == "red" else "red"
+
+    prepared_territory, current_territory = prepared.territory_control, current.territory_control
+    # Crossing a territory threshold changes the strategy the workflow is asked for
+    if classify_territory(prepared_territory.get(team_id, 0), prepared_territory.get(opponent_id, 0)) != \
+            classify_territory(current_territory.get(team_id, 0), current_territory.get(opponent_id, 0)):
+        return False
+    for team in (team_id, opponent_id):
+        if abs(prepared_territory.get(team, 0) - current_territory.get(team, 0)) > SPECULATION_MAX_TERRITORY_DRIFT:
+            return False
+        if abs(len(prepared.agents.get(team, [])) - len(current.agents.get(team, []))) > SPECULATION_MAX_AGENT_DRIFT:
+            return False
+        if not _resources_within(prepared.resources.get(team), current.resources.get(team)):
+            return False
+    return True
+
+def _agent_total(request_data: Dict[str, Any]) -> int:
+    return sum(entry.get("count", 0) for entry in request_data.get("current_agents", []) if isinstance(entry, dict))
+
+def agent_request_within_drift(prepared: Dict[str, Any], current: Dict[str, Any]) -> bool:
+    """Whether an agent generated for the prepared request still fits the current one"""
+    if normalize_team_id(prepared.get("team_id")) != normalize_team_id(current.get("team_id")):
+        return False
+    prepared_strategy = prepared.get("strategy") or {}
+    current_strategy = current.get("strategy") or {}
+    if prepared_strategy.get("strategy") != current_strategy.get("strategy") or \
+            prepared_strategy.get("focus") != current_strategy.get("focus"):
+        return False
+    if abs(_agent_total(prepared) - _agent_total(current)) > SPECULATION_MAX_AGENT_DRIFT:
+        return False
+    return _resources_within(prepared.get("resources"), current.get("resources"))
+
+def latest_game_state(client_id: str, team_id: str, last_state: Any) -> Any:
+    """The client's current game state from its WebSocket session, or the last requested one"""
+    session = sessions.get(client_id)
+    if session is None or not session.has_state:
+        return last_state
+    state = session.game_state(normalize_team_id(team_id))
+    # Keep fields the WebSocket does not carry
+    state.team_id = last_state.team_id
+    state.bases = getattr(last_state, "bases", {}) or {}
+    return state
+
+def latest_agent_request(client_id: str, team_id: str, last_request: Dict[str, Any]) -> Dict[str, Any]:
+    """The last agent request with resources and composition refreshed from the WebSocket session"""
+    session = sessions.get(client_id)
+    if session is None or not session.has_state:
+        return last_request
+    current = session.agent_request(normalize_team_id(team_id))
+    return {**last_request, "resources": current["resources"], "current_agents": current["current_agents"]}
+
+@dataclass
+class SpeculationKind:
+    """How to generate, refresh and compare the payload of one kind of request"""
+    generate: Callable[[Any], Awaitable[Any]]
+    within_drift: Callable[[Any, Any], bool]
+    latest: Callable[[str, str, Any], Any]
+
+SPECULATION_KINDS = {
+    "strategy": SpeculationKind(generate_team_strategy, strategy_state_within_drift, latest_game_state),
+    "agent": SpeculationKind(generate_agent_specification, agent_request_within_drift, latest_agent_request)
+}
+
+@dataclass
+class Prepared:
+    """A speculative run and the payload it was started with"""
+    payload: Any
+    task: asyncio.Future
+    started: float
+
+@dataclass
+class Track:
+    """Request cadence and the latest payload for one client, request kind and team"""
+    last_request: float
+    payload: Any
+    interval: Optional[float] = None
+    prepared: Optional[Prepared] = None
+    # last_request of the cycle a speculative run was started for
+    speculated_for: Optional[float] = None
+
+TrackKey = Tuple[str, str, str]
+
+class SpeculationScheduler:
+    """Learns request cadence per client and prepares results before they are requested"""
+
+    def __init__(
+        self,
+        kinds: Optional[Dict[str, SpeculationKind]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        enabled: bool = True
+    ):
+        self.kinds = kinds if kinds is not None else SPECULATION_KINDS
+        self.clock = clock
+        self.enabled = enabled
+        self.tracks: Dict[TrackKey, Track] = {}
+        # Expected generation time, used to decide how early to start
+        self.generation_seconds: Dict[str, float] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self.started = 0
+        self.hits = 0
+        self.drifted = 0
+        self.wasted = 0
+
+    async def serve(self, kind: str, client_id: Optional[str], team_id: str, payload: Any) -> Any:
+        """Return the prepared result for this request if it still fits, otherwise generate one"""
+        if not self.enabled or not client_id:
+            return await self.kinds[kind].generate(payload)
+
+        key = (client_id, kind, team_id)
+        track = self.tracks.get(key)
+        prepared = track.prepared if track else None
+        self.record(key, payload)
+
+        if prepared is not None:
+            if self.kinds[kind].within_drift(prepared.payload, payload):
+                try:
+                    # Shield so an abandoned request leaves the run usable for the background push
+                    result = await asyncio.shield(prepared.task)
+                    self.hits += 1
+                    logger.info("Served speculative %s for client %s team %s", kind, client_id, team_id)
+                    return result
+                except asyncio.CancelledError:
+                    if not prepared.task.cancelled():
+                        raise
+                except Exception as e:
+                    logger.error("Speculative %s for client %s failed: %s", kind, client_id, e)
+            else:
+                self.drifted += 1
+                logger.info("Discarded speculative %s for client %s: state drifted", kind, client_id)
+
+        started = self.clock()
+        result = await self.kinds[kind].generate(payload)
+        self._observe_generation(kind, self.clock() - started)
+        return result
+
+    def record(self, key: TrackKey, payload: Any) -> None:
+        """Record a request arriving now and update the client's cadence"""
+        now = self.clock()
+        track = self.tracks.get(key)
+        if track is None:
+            self.tracks[key] = Track(last_request=now, payload=payload)
+            return
+
+        gap = now - track.last_request
+        if 0 < gap <= SPECULATION_IDLE_SECONDS:
+            track.interval = gap if track.interval is None else EWMA_ALPHA * gap + (1 - EWMA_ALPHA) * track.interval
+        track.last_request = now
+        track.payload = payload
+        # A prepared result belongs to the request it was prepared for, claimed or not
+        track.prepared = None
+
+    def tick(self) -> int:
+        """Start speculative runs for every track whose next request is due soon"""
+        now = self.clock()
+        started = 0
+        for key, track in list(self.tracks.items()):
+            if now - track.last_request > SPECULATION_IDLE_SECONDS:
+                self._drop(key)
+                continue
+            if track.prepared is not None and track.interval is not None and \
+                    now > track.last_request + 2 * track.interval:
+                # The expected request never came
+                self.wasted += 1
+                track.prepared = None
+            if self._is_due(key[1], track, now):
+                # Speculation is background work; skip it rather than queue behind requests
+                if admission.check(key[1], BACKGROUND) is not None:
+                    continue
+                self._start(key, track, now)
+                started += 1
+        return started
+
+    def forget(self, client_id: str) -> None:
+        """Drop every track of a client, e.g. when its WebSocket disconnects"""
+        for key in [key for key in self.tracks if key[0] == client_id]:
+            self._drop(key)
+
+    def start(self) -> None:
+        """Start the background scheduling loop on the running event loop"""
+        if self.enabled and self._loop_task is None:
+            self._loop_task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        for key in list(self.tracks):
+            self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tracked": len(self.tracks),
+            "prepared": sum(1 for track in self.tracks.values() if track.prepared is not None),
+            "started": self.started,
+            "hits": self.hits,
+            "drifted": self.drifted,
+            "wasted": self.wasted,
+            "generation_seconds": dict(self.generation_seconds)
+        }
+
+    def _is_due(self, kind: str, track: Track, now: float) -> bool:
+        if track.interval is None or track.prepared is not None or track.speculated_for == track.last_request:
+            return False
+        lead = self.generation_seconds.get(kind, SPECULATION_LEAD_SECONDS) + SPECULATION_LEAD_SECONDS
+        return now >= track.last_request + track.interval - lead
+
+    def _start(self, key: TrackKey, track: Track, now: float) -> None:
+        client_id, kind, team_id = key
+        speculation_kind = self.kinds[kind]
+        payload = speculation_kind.latest(client_id, team_id, track.payload)
+        task = asyncio.ensure_future(self._generate(kind, payload, now))
+        task.add_done_callback(_consume_exception)
+        track.prepared = Prepared(payload=payload, task=task, started=now)
+        track.speculated_for = track.last_request
+        self.started += 1
+        logger.info("Started speculative %s for client %s team %s", kind, client_id, team_id)
+
+    async def _generate(self, kind: str, payload: Any, started: float) -> Any:
+        set_arena_priority(BACKGROUND)
+        result = await self.kinds[kind].generate(payload)
+        self._observe_generation(kind, self.clock() - started)
+        return result
+
+    def _observe_generation(self, kind: str, seconds: float) -> None:
+        previous = self.generation_seconds.get(kind)
+        self.generation_seconds[kind] = seconds if previous is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+
+    def _drop(self, key: TrackKey) -> None:
+        track = self.tracks.pop(key, None)
+        if track is not None and track.prepared is not None and not track.prepared.task.done():
+            track.prepared.task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(SPECULATION_TICK_SECONDS)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error("Error scheduling speculative runs: %s", e)
+
+def _consume_exception(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+speculator = SpeculationScheduler()
@@ -2,95 +2,282 @@
 # import aiq  # Commented out since aiqtoolkit is not available
 from ..schemas.game_state import GameState
 from ..schemas.strategy import TeamStrategy
+from .features import StateFeatures, enemies_near_base, extract_features
+from .json_stream import IncrementalObjectParser
+from .prompts import fit, strategy_inputs
+from ..metrics import GENERATIONS, STAGE_DURATION
+from ..config import get_settings
+from .admission import AdmissionRejected, admission
+from .cache import quantization, strategy_cache, strategy_cache_key
+from .single_flight import workflow_flight, workflow_key
+from .workflow_executor import get_executor
 import json
 import os
 import logging
-from typing import Dict
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Check if we should use mock responses
-USE_MOCK_RESPONSES = os.getenv("USE_MOCK_RESPONSES", "true").lower() == "true"
+# Map of frontend team identifiers to the names used by the workflows
+TEAM_ID_MAP = {"team1": "red", "team2": "blue", "1": "red", "2": "blue"}
+
+# Fallback strategies keyed by the territory situation they respond to
+FALLBACK_STRATEGIES = {
+    # Behind in territory control
+    "behind": {
+        "strategy": "aggressive",
+        "focus": "territory",
+        "priorities": ["expand_territory", "attack_enemies", "collect_energy"],
+        "description": "Aggressive expansion to catch up in territory control."
+    },
+    # Ahead in territory control
+    "ahead": {
+        "strategy": "defensive",
+        "focus": "resources",
+        "priorities": ["defend_territory", "collect_materials", "collect_energy"],
+        "description": "Defend current territory while building resource advantage."
+    },
+    # Close game
+    "close": {
+        "strategy": "balanced",
+        "focus": "resources",
+        "priorities": ["collect_energy", "expand_territory", "collect_materials"],
+        "description": "Balanced approach focusing on resource collection and gradual expansion."
+    },
+    # Enemy agents gathered around our base
+    "threatened": {
+        "strategy": "defensive",
+        "focus": "combat",
+        "priorities": ["defend_base", "attack_enemies", "defend_territory"],
+        "description": "Enemy agents are massing near our base; pull back and defend it."
+    },
+    # Close game but we have clearly more agents
+    "outnumbering": {
+        "strategy": "aggressive",
+        "focus": "combat",
+        "priorities": ["attack_enemies", "expand_territory", "collect_energy"],
+        "description": "Press our numerical advantage to break the stalemate."
+    }
+}
+
+# Enemy agents near our base that trigger the "threatened" strategy
+BASE_THREAT_THRESHOLD = int(os.getenv("BASE_THREAT_THRESHOLD", "3"))
+# Agent count ratio over the opponent that counts as outnumbering them
+OUTNUMBER_RATIO = float(os.getenv("OUTNUMBER_RATIO", "1.5"))
+# Territory percentage points a team must lead or trail by to count as ahead or behind
+TERRITORY_MARGIN = float(os.getenv("TERRITORY_MARGIN", "10"))
+
+def normalize_team_id(team_id: str) -> str:
+    """Convert a frontend team identifier to the workflow format ('red'/'blue')"""
+    return TEAM_ID_MAP.get(team_id, team_id)
 
 async def generate_team_strategy(game_state: GameState) -> TeamStrategy:
     """Generate team strategy based on current game state using AIQToolkit"""
     try:
         # If mock responses are enabled or aiqtoolkit is not available, use fallback
-        if USE_MOCK_RESPONSES:
+        if get_settings().use_mock_responses:
             logger.info("Using fallback strategy (mock mode enabled)")
+            GENERATIONS.labels("strategy", "mock").inc()
             return generate_fallback_strategy(game_state)
             
-        # If we were to use AIQToolkit, this is where the code would go
-        # Prepare data for the workflow
-        opponent_id = "blue" if game_state.team_id == "red" else "red"
-        
         # Convert team_id to match format expected in workflow
         # Handle both numeric (1/2) and string ('red'/'blue') formats
-        team_id_map = {"team1": "red", "team2": "blue", "1": "red", "2": "blue"}
-        normalized_team_id = team_id_map.get(game_state.team_id, game_state.team_id)
-        normalized_opponent_id = "blue" if normalized_team_id == "red" else "red"
+        normalized_team_id = normalize_team_id(game_state.team_id)
         
-        workflow_input = {
-            "team_id": normalized_team_id,
-            "opponent_id": normalized_opponent_id,
-            "territory_control": game_state.territory_control,
-            "agents": game_state.agents,
-            "resources": game_state.resources,
-            "resource_distribution": game_state.resource_distribution
-        }
+        # Successive game states barely differ, so reuse results for equivalent states
+        features = extract_features(game_state, normalized_team_id)
+        cache_key = strategy_cache_key(game_state, normalized_team_id, quantization, features)
+        if get_settings().cache_enabled:
+            cached_strategy = await strategy_cache.get(cache_key)
+            if cached_strategy is not None:
+                logger.info("Using cached strategy for team %s", normalized_team_id)
+                GENERATIONS.labels("strategy", "cache").inc()
+                return cached_strategy
         
-        logger.info(f"Generating strategy for team {normalized_team_id}")
+        workflow_input = strategy_workflow_input(game_state, normalized_team_id, features)
         
-        # This code would load and run the AIQToolkit workflow, but we'll skip it
-        # and use the fallback strategy instead
-        logger.warning("AIQToolkit not available, using fallback strategy")
-        return generate_fallback_strategy(game_state)
+        logger.info("Generating strategy for team %s", normalized_team_id)
+        
+        # Concurrent requests with the same input share a single workflow run
+        strategy = await workflow_flight.do(
+            workflow_key("team_strategy", workflow_input),
+            lambda: admission.run("strategy", lambda: run_strategy_workflow(workflow_input))
+        )
+        
+        if get_settings().cache_enabled:
+            await strategy_cache.set(cache_key, strategy)
+        GENERATIONS.labels("strategy", "workflow").inc()
+        return strategy
     
+    except AdmissionRejected as e:
+        # Overloaded: answer with the deterministic strategy rather than queue past the budget
+        logger.info("Using fallback strategy for team %s: %s", game_state.team_id, e)
+        GENERATIONS.labels("strategy", "shed").inc()
+        return generate_fallback_strategy(game_state)
     except Exception as e:
-        logger.error(f"Error generating team strategy: {e}")
+        logger.error("Error generating team strategy: %s", e)
+        GENERATIONS.labels("strategy", "fallback").inc()
         # Provide a fallback strategy if AIQToolkit fails
         return generate_fallback_strategy(game_state)
 
-def generate_fallback_strategy(game_state: GameState) -> TeamStrategy:
-    """Generate a fallback strategy when AIQToolkit fails"""
-    # Simple logic to create a balanced fallback strategy
-    territory_control = game_state.territory_control
-    team_id = game_state.team_id
-    normalized_team_id = {"team1": "red", "team2": "blue", "1": "red", "2": "blue"}.get(team_id, team_id)
+def strategy_workflow_input(game_state: GameState, normalized_team_id: str,
+                            features: Optional[StateFeatures] = None) -> Dict:
+    """The team strategy workflow input for a game state, compacted to the prompt token budget"""
+    with STAGE_DURATION.labels("build_prompt").time():
+        return fit("team_strategy", strategy_inputs(game_state, normalized_team_id, features))
+
+async def run_strategy_workflow(workflow_input: Dict) -> TeamStrategy:
+    """Run the team strategy workflow for a prepared workflow input"""
+    result = await get_executor().run("team_strategy", workflow_input)
+    with STAGE_DURATION.labels("validate_strategy").time():
+        return TeamStrategy(**result)
+
+async def generate_team_strategies(game_states: List[GameState]) -> List[TeamStrategy]:
+    """Generate strategies for a batch of game states, preserving input order"""
+    if get_settings().use_mock_responses:
+        logger.info("Using fallback strategies for batch of %s (mock mode enabled)", len(game_states))
+        GENERATIONS.labels("strategy", "mock").inc(len(game_states))
+        return generate_fallback_strategies(game_states)
+
+    # Dispatch workflow-backed items concurrently; each item falls back on its own
+    return list(await asyncio.gather(*(generate_team_strategy(game_state) for game_state in game_states)))
+
+# Validators for each strategy field, so a streamed field is checked as soon as it arrives
+STRATEGY_FIELD_ADAPTERS = {name: TypeAdapter(field.annotation) for name, field in TeamStrategy.model_fields.items()}
+
+StrategyEvent = Tuple[str, Dict[str, Any]]
+
+def strategy_events(strategy: TeamStrategy, source: str) -> List[StrategyEvent]:
+    """Field events followed by the complete strategy, for a strategy that is already known"""
+    fields = strategy.model_dump()
+    events = [("field", {"name": name, "value": value}) for name, value in fields.items()]
+    events.append(("strategy", {"source": source, "strategy": fields}))
+    return events
+
+async def stream_team_strategy(game_state: GameState) -> AsyncIterator[StrategyEvent]:
+    """
+    Generate a team strategy, yielding each field as soon as the workflow has decided it
+
+    Yields ("field", {"name", "value"}) events in the order the model writes
+    them and ends with ("strategy", {"source", "strategy"}). If the streamed
+    output turns out invalid or truncated, the stream is abandoned at that
+    point and a ("fallback", {"reason"}) event is followed by the fallback
+    strategy's fields.
+    """
+    if get_settings().use_mock_responses:
+        GENERATIONS.labels("strategy", "mock").inc()
+        for event in strategy_events(generate_fallback_strategy(game_state), "mock"):
+            yield event
+        return
+
+    normalized_team_id = normalize_team_id(game_state.team_id)
+    features = extract_features(game_state, normalized_team_id)
+    cache_key = strategy_cache_key(game_state, normalized_team_id, quantization, features)
+    if get_settings().cache_enabled:
+        cached_strategy = await strategy_cache.get(cache_key)
+        if cached_strategy is not None:
+            GENERATIONS.labels("strategy", "cache").inc()
+            for event in strategy_events(cached_strategy, "cache"):
+                yield event
+            return
+
+    logger.info("Streaming strategy for team %s", normalized_team_id)
+    parser = IncrementalObjectParser()
+    fields: Dict[str, Any] = {}
+    try:
+        async with admission.slot("strategy"):
+            chunks = get_executor().stream("team_strategy", strategy_workflow_input(game_state, normalized_team_id, features))
+            try:
+                async for chunk in chunks:
+                    for name, value in parser.feed(chunk):
+                        adapter = STRATEGY_FIELD_ADAPTERS.get(name)
+                        if adapter is None:
+                            continue
+                        fields[name] = adapter.validate_python(value)
+                        yield ("field", {"name": name, "value": fields[name]})
+                    if parser.done:
+                        break
+            finally:
+                await chunks.aclose()
+        parser.close()
+        with STAGE_DURATION.labels("validate_strategy").time():
+            strategy = TeamStrategy(**fields)
+    except Exception as e:
+        logger.warning("Streamed strategy for team %s is unusable, switching to fallback: %s", normalized_team_id, e)
+        GENERATIONS.labels("strategy", "shed" if isinstance(e, AdmissionRejected) else "fallback").inc()
+        yield ("fallback", {"reason": str(e)})
+        for event in strategy_events(generate_fallback_strategy(game_state), "fallback"):
+            yield event
+        return
+
+    if get_settings().cache_enabled:
+        await strategy_cache.set(cache_key, strategy)
+    GENERATIONS.labels("strategy", "workflow").inc()
+    yield ("strategy", {"source": "workflow", "strategy": strategy.model_dump()})
+
+def classify_territory(team_territory: float, opponent_territory: float, margin: float = TERRITORY_MARGIN) -> str:
+    """Classify the territory situation into a FALLBACK_STRATEGIES key"""
+    if team_territory < opponent_territory - margin:
+        return "behind"
+    if team_territory > opponent_territory + margin:
+        return "ahead"
+    return "close"
+
+def fallback_situation(
+    game_state: GameState,
+    features: Optional[StateFeatures] = None,
+    margin: float = TERRITORY_MARGIN,
+    base_threat_threshold: int = BASE_THREAT_THRESHOLD,
+    outnumber_ratio: float = OUTNUMBER_RATIO
+) -> str:
+    """Pick the FALLBACK_STRATEGIES key from territory control and spatial features"""
+    normalized_team_id = normalize_team_id(game_state.team_id)
     opponent_id = "blue" if normalized_team_id == "red" else "red"
     
-    team_territory = territory_control.get(normalized_team_id, 0)
-    opponent_territory = territory_control.get(opponent_id, 0)
+    team_territory = game_state.territory_control.get(normalized_team_id, 0)
+    opponent_territory = game_state.territory_control.get(opponent_id, 0)
+    situation = classify_territory(team_territory, opponent_territory, margin)
     
-    # Determine strategy based on territory control
-    if team_territory < opponent_territory - 10:
-        # Behind in territory control
-        strategy = "aggressive"
-        focus = "territory"
-        priorities = ["expand_territory", "attack_enemies", "collect_energy"]
-        description = "Aggressive expansion to catch up in territory control."
-    elif team_territory > opponent_territory + 10:
-        # Ahead in territory control
-        strategy = "defensive"
-        focus = "resources"
-        priorities = ["defend_territory", "collect_materials", "collect_energy"]
-        description = "Defend current territory while building resource advantage."
+    if features is not None:
+        own_count, opponent_count = features.own.count, features.opponent.count
+        threat = features.own.enemies_near_base
     else:
-        # Close game
-        strategy = "balanced"
-        focus = "resources"
-        priorities = ["collect_energy", "expand_territory", "collect_materials"]
-        description = "Balanced approach focusing on resource collection and gradual expansion."
+        # Only the figures the rules read, rather than every spatial feature
+        own_count = len(game_state.agents.get(normalized_team_id) or ())
+        opponent_count = len(game_state.agents.get(opponent_id) or ())
+        threat = enemies_near_base(game_state, normalized_team_id)
     
-    return TeamStrategy(
-        strategy=strategy,
-        focus=focus,
-        priorities=priorities,
-        description=description
-    )
\ No newline at end of file
+    # A threatened base overrides the territory picture
+    if threat is not None and threat >= base_threat_threshold:
+        return "threatened"
+    if situation == "close" and opponent_count and own_count >= outnumber_ratio * opponent_count:
+        return "outnumbering"
+    return situation
+
+def generate_fallback_strategy(game_state: GameState) -> TeamStrategy:
+    """Generate a fallback strategy when AIQToolkit fails"""
+    # Determine strategy based on territory control and agent positions
+    situation = fallback_situation(game_state)
+    return TeamStrategy(**FALLBACK_STRATEGIES[situation])
+
+def generate_fallback_strategies(game_states: List[GameState]) -> List[TeamStrategy]:
+    """Generate fallback strategies for a batch of game states in a single pass
+
+    The strategy templates are validated once up front, so each item only pays
+    for the situation lookup and an unvalidated construct instead of a full
+    model validation.
+    """
+    templates = {key: TeamStrategy(**value) for key, value in FALLBACK_STRATEGIES.items()}
+    strategies = []
+    for game_state in game_states:
+        template = templates[fallback_situation(game_state)]
+        strategies.append(TeamStrategy.model_construct(
+            strategy=template.strategy,
+            focus=template.focus,
+            priorities=list(template.priorities),
+            description=template.description
+        ))
+    return strategies
@@ -0,0 +1,354 @@
+"""Async execution of the YAML workflows against an OpenAI-compatible LLM API.
+
+One executor owns a pooled ``httpx.AsyncClient`` with keep-alive connections
+that is shared by every workflow run. In-flight calls are capped by a
+semaphore, each attempt has its own timeout and failed attempts are retried
+with jittered exponential backoff.
+
+A prompt may have a ``prefix`` template holding its instructions. It is sent
+first, as a system message, and rendered once per value of the variables it
+uses, so only the state part of the prompt is rendered per call and providers
+with prompt caching can reuse the processed prefix.
+
+httpx, Jinja2 and PyYAML are imported on first use (or by ``prewarm`` in the
+background at startup) so they do not add to the application's import time.
+"""
+import asyncio
+import json
+import random
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..config import get_settings
+from ..metrics import PROMPT_TOKENS, WORKFLOW_ATTEMPT_FAILURES, WORKFLOW_DURATION
+
+if TYPE_CHECKING:
+    import httpx
+    from jinja2 import Environment, Template
+
+logger = logging.getLogger(__name__)
+
+WORKFLOWS_DIR = Path(__file__).resolve().parent.parent / "workflows"
+
+# HTTP statuses worth retrying; anything else in the 4xx range is a caller error
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Rough characters per token of English prompts, used to estimate prompt sizes
+CHARS_PER_TOKEN = 4
+# Rendered prefixes kept per workflow step (one per team, or per plan size)
+PREFIX_CACHE_SIZE = 64
+
+class WorkflowError(Exception):
+    """Raised when a workflow cannot produce a usable result"""
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+@dataclass
+class WorkflowDefinition:
+    """The parts of a workflow YAML needed to run its LLM step"""
+    name: str
+    template: "Template"
+    model: str
+    temperature: float
+    prefix: Optional["Template"] = None
+    prefix_variables: Tuple[str, ...] = ()
+    _prefixes: Dict[Tuple[str, ...], str] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def load(cls, path: Path, environment: "Environment", step_id: Optional[str] = None) -> "WorkflowDefinition":
+        """Load one LLM step of a workflow YAML (the first step unless step_id is given)"""
+        import yaml
+        from jinja2 import meta
+
+        with open(path) as f:
+            spec = yaml.safe_load(f)
+
+        entities = spec.get("entities", {})
+        steps = spec["workflow"]["steps"]
+        if step_id is None:
+            step = steps[0]
+        else:
+            step = next((candidate for candidate in steps if candidate.get("id") == step_id), None)
+            if step is None:
+                raise WorkflowError(f"Workflow {spec['name']} has no step {step_id}")
+        step_config = step.get("config", {})
+        prompt_name = step_config["prompt"].lstrip("$")
+        llm_config = entities.get(step.get("entity", "llm"), {}).get("config", {})
+        prompt_config = entities[prompt_name]["config"]
+        prefix_source = prompt_config.get("prefix")
+
+        return cls(
+            name=spec["name"],
+            template=environment.from_string(prompt_config["template"]),
+            model=llm_config.get("model", "gpt-4-turbo"),
+            temperature=float(step_config.get("temperature", 0.7)),
+            prefix=environment.from_string(prefix_source) if prefix_source else None,
+            prefix_variables=tuple(sorted(meta.find_undeclared_variables(environment.parse(prefix_source))))
+            if prefix_source else ()
+        )
+
+    def render_prefix(self, workflow_input: Dict[str, Any]) -> Optional[str]:
+        """The rendered prefix, from the cache when its variables had these values before"""
+        if self.prefix is None:
+            return None
+        key = tuple(str(workflow_input.get(name)) for name in self.prefix_variables)
+        rendered = self._prefixes.get(key)
+        if rendered is None:
+            if len(self._prefixes) >= PREFIX_CACHE_SIZE:
+                self._prefixes.clear()
+            rendered = self._prefixes[key] = self.prefix.render(**workflow_input)
+        return rendered
+
+    def messages(self, workflow_input: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Chat messages for a workflow input: the prefix as a system message, then the prompt"""
+        messages = [{"role": "user", "content": self.template.render(**workflow_input)}]
+        prefix = self.render_prefix(workflow_input)
+        if prefix is not None:
+            messages.insert(0, {"role": "system", "content": prefix})
+        return messages
+
+    def render(self, workflow_input: Dict[str, Any]) -> str:
+        return "\n".join(message["content"] for message in self.messages(workflow_input))
+
+def parse_json_content(content: str) -> Dict[str, Any]:
+    """Extract the JSON object from a model completion (tolerates code fences)"""
+    start = content.find("{")
+    end = content.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("Completion does not contain a JSON object")
+    return json.loads(content[start:end + 1])
+
+class WorkflowExecutor:
+    """Runs workflows through a shared, bounded pool of LLM connections"""
+
+    def __init__(
+        self,
+        base_url: str = "https://api.openai.com/v1",
+        api_key: str = "",
+        model: Optional[str] = None,
+        max_concurrency: int = 16,
+        timeout_seconds: float = 30.0,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.5,
+        workflows_dir: Path = WORKFLOWS_DIR,
+        transport: Optional["httpx.AsyncBaseTransport"] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.workflows_dir = Path(workflows_dir)
+        self._transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._environment: Optional["Environment"] = None
+        self._workflows: Dict[str, WorkflowDefinition] = {}
+
+    @property
+    def environment(self) -> "Environment":
+        """The Jinja2 environment for prompt templates, created on first use"""
+        if self._environment is None:
+            from jinja2 import Environment
+
+            self._environment = Environment(autoescape=False, keep_trailing_newline=True)
+        return self._environment
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """The pooled HTTP client, created on first use"""
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60.0
+                ),
+                transport=self._transport
+            )
+        return self._client
+
+    def workflow(self, name: str, step: Optional[str] = None) -> WorkflowDefinition:
+        """Load (once) and return the named workflow definition"""
+        cache_key = name if step is None else f"{name}.{step}"
+        definition = self._workflows.get(cache_key)
+        if definition is None:
+            definition = WorkflowDefinition.load(self.workflows_dir / f"{name}.yaml", self.environment, step)
+            self._workflows[cache_key] = definition
+        return definition
+
+    def render_prompt(self, name: str, workflow_input: Dict[str, Any], step: Optional[str] = None) -> str:
+        return self.workflow(name, step).render(workflow_input)
+
+    async def run(self, name: str, workflow_input: Dict[str, Any], step: Optional[str] = None) -> Dict[str, Any]:
+        """Render the workflow prompt, call the LLM and return the parsed JSON output"""
+        definition = self.workflow(name, step)
+        metric_name = name if step is None else f"{name}.{step}"
+        start = time.perf_counter()
+        try:
+            result = await self._run(metric_name, definition, workflow_input)
+        except Exception:
+            WORKFLOW_DURATION.labels(metric_name, "error").observe(time.perf_counter() - start)
+            raise
+        WORKFLOW_DURATION.labels(metric_name, "success").observe(time.perf_counter() - start)
+        return result
+
+    def _payload(self, name: str, definition: WorkflowDefinition, workflow_input: Dict[str, Any]) -> Dict[str, Any]:
+        messages = definition.messages(workflow_input)
+        for message in messages:
+            PROMPT_TOKENS.labels(name, "prefix" if message["role"] == "system" else "state").inc(
+                estimate_tokens(message["content"])
+            )
+        return {
+            "model": self.model or definition.model,
+            "temperature": definition.temperature,
+            "messages": messages
+        }
+
+    async def _run(self, name: str, definition: WorkflowDefinition, workflow_input: Dict[str, Any]) -> Dict[str, Any]:
+        import httpx
+
+        payload = self._payload(name, definition, workflow_input)
+
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt))
+            try:
+                # Hold a slot only while the request is in flight, not while backing off
+                async with self._semaphore:
+                    response = await asyncio.wait_for(
+                        self.client.post("/chat/completions", json=payload),
+                        timeout=self.timeout_seconds
+                    )
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise httpx.HTTPStatusError(
+                        f"Retryable status {response.status_code}",
+                        request=response.request,
+                        response=response
+                    )
+                response.raise_for_status()
+                content = response.json()["choices"][0]["message"]["content"]
+                return parse_json_content(content)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in RETRYABLE_STATUS_CODES:
+                    WORKFLOW_ATTEMPT_FAILURES.labels(name).inc()
+                    raise WorkflowError(f"Workflow {name} rejected: {e}") from e
+                last_error = e
+            except (httpx.TransportError, asyncio.TimeoutError, ValueError, KeyError, IndexError) as e:
+                last_error = e
+            WORKFLOW_ATTEMPT_FAILURES.labels(name).inc()
+            logger.warning("Workflow %s attempt %d failed: %r", name, attempt + 1, last_error)
+
+        raise WorkflowError(f"Workflow {name} failed after {self.max_retries + 1} attempts") from last_error
+
+    async def stream(self, name: str, workflow_input: Dict[str, Any], step: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Render the workflow prompt and yield the completion text as the LLM streams it
+
+        Streams are not retried: a failure is raised straight away so the
+        caller can fall back instead. Closing the generator early (e.g. on
+        invalid output) closes the connection and stops the generation.
+        """
+        import httpx
+
+        definition = self.workflow(name, step)
+        metric_name = name if step is None else f"{name}.{step}"
+        payload = dict(self._payload(metric_name, definition, workflow_input), stream=True)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._semaphore:
+                async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+                    if response.status_code >= 400:
+                        raise WorkflowError(f"Workflow {metric_name} stream failed with status {response.status_code}")
+                    async for line in response.aiter_lines():
+                        # Server-sent events: "data: <chunk JSON>" lines, ending with "data: [DONE]"
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        content = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if content:
+                            yield content
+            outcome = "success"
+        except GeneratorExit:
+            outcome = "abandoned"
+            raise
+        except (httpx.TransportError, ValueError, KeyError, IndexError) as e:
+            raise WorkflowError(f"Workflow {metric_name} stream failed: {e!r}") from e
+        finally:
+            if outcome == "error":
+                WORKFLOW_ATTEMPT_FAILURES.labels(metric_name).inc()
+            WORKFLOW_DURATION.labels(metric_name, outcome).observe(time.perf_counter() - start)
+
+    def workflow_steps(self) -> List[tuple]:
+        """(workflow, step) pairs for every LLM step defined in the workflows directory"""
+        import yaml
+
+        steps = []
+        for path in sorted(self.workflows_dir.glob("*.yaml")):
+            with open(path) as f:
+                spec = yaml.safe_load(f)
+            for index, step in enumerate(spec["workflow"]["steps"]):
+                steps.append((path.stem, None if index == 0 else step.get("id")))
+        return steps
+
+    def prewarm(self, connect: bool = True) -> None:
+        """Import the HTTP and template libraries, parse every workflow and build the client
+
+        Blocking; run it in a worker thread so startup and requests are not held up.
+        """
+        for name, step in self.workflow_steps():
+            self.workflow(name, step)
+        if connect:
+            self.client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, self.backoff_seconds * (2 ** (attempt - 1)))
+
+_executor: Optional[WorkflowExecutor] = None
+
+def get_executor() -> WorkflowExecutor:
+    """Return the process-wide executor, creating it from the settings"""
+    global _executor
+    if _executor is None:
+        settings = get_settings()
+        _executor = WorkflowExecutor(
+            base_url=settings.llm_base_url,
+            api_key=settings.openai_api_key,
+            model=settings.model_name,
+            max_concurrency=settings.llm_max_concurrency,
+            timeout_seconds=settings.llm_timeout_seconds,
+            max_retries=settings.llm_max_retries,
+            backoff_seconds=settings.llm_retry_backoff_seconds
+        )
+    return _executor
+
+def set_executor(executor: Optional[WorkflowExecutor]) -> None:
+    """Replace the process-wide executor (used by tests and benchmarks)"""
+    global _executor
+    _executor = executor
+
+async def close_executor() -> None:
+    if _executor is not None:
+        await _executor.aclose()
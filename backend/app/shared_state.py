@@ -0,0 +1,333 @@
+"""State shared between the workers serving one game backend.
+
+With ``uvicorn --workers N`` each worker holds its own WebSocket connections
+and caches. A ``SharedState`` backend gives the workers:
+
+- connection routing: which worker holds each client's WebSocket, so a push
+  for a client connected elsewhere is forwarded to that worker;
+- pub/sub: messages published on a channel are delivered to the handlers
+  subscribed to it in every worker (each worker listens on ``worker:<id>``);
+- a shared result cache: string values with a TTL, so a result generated by
+  one worker is reused by the others instead of repeating the LLM work;
+- room membership: how many members of each room every worker holds, so a
+  broadcast is only published when a member is connected somewhere else.
+
+``MemorySharedState`` is the single-process default. ``SqliteSharedState``
+shares state between processes on one machine through a SQLite database in
+WAL mode (``SHARED_STATE_BACKEND=sqlite``); subscribers poll it for new
+messages every ``SHARED_STATE_POLL_SECONDS``. Spanning several machines needs
+a networked implementation of the same interface.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# How often SQLite subscribers check for new messages
+SHARED_STATE_POLL_SECONDS = float(os.getenv("SHARED_STATE_POLL_SECONDS", "0.02"))
+# Published messages are kept this long for slow subscribers, then deleted
+SHARED_STATE_MESSAGE_TTL_SECONDS = float(os.getenv("SHARED_STATE_MESSAGE_TTL_SECONDS", "30"))
+
+DEFAULT_SQLITE_PATH = os.path.join(tempfile.gettempdir(), "agentarena-shared-state.db")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def worker_channel(worker_id: str) -> str:
+    """The channel a worker receives forwarded messages on"""
+    return f"worker:{worker_id}"
+
+class SharedState(ABC):
+    """Connection routing, pub/sub and a result cache shared by the workers"""
+
+    # Whether other processes see this state (a local memory backend does not)
+    distributed = False
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or default_worker_id()
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """Call handler with every message published on channel from now on"""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        """Deliver message to the handlers subscribed to channel in every worker"""
+
+    @abstractmethod
+    async def register_connection(self, client_id: str) -> None:
+        """Record this worker as holding the client's WebSocket"""
+
+    @abstractmethod
+    async def unregister_connection(self, client_id: str) -> None:
+        """Forget the client's WebSocket, unless another worker has taken it over"""
+
+    @abstractmethod
+    async def connection_owner(self, client_id: str) -> Optional[str]:
+        """The worker holding the client's WebSocket, if any"""
+
+    @abstractmethod
+    async def cache_get(self, key: str) -> Optional[str]:
+        """The cached value for key, or None when missing or expired"""
+
+    @abstractmethod
+    async def cache_set(self, key: str, value: str, ttl_seconds: float) -> None:
+        """Cache value under key for ttl_seconds"""
+
+    @abstractmethod
+    async def set_room_members(self, room: str, members: int) -> None:
+        """Record how many members of room this worker holds"""
+
+    @abstractmethod
+    async def remote_room_members(self, room: str) -> int:
+        """Members of room held by the other workers"""
+
+    async def _dispatch(self, channel: str, message: Dict[str, Any]) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(message)
+            except Exception as e:
+                logger.error("Error handling message on %s: %s", channel, e)
+
+class MemorySharedState(SharedState):
+    """Shared state for a single worker process"""
+
+    def __init__(self, worker_id: Optional[str] = None, clock: Callable[[], float] = time.monotonic):
+        super().__init__(worker_id)
+        self.clock = clock
+        self._connections: Dict[str, str] = {}
+        self._cache: Dict[str, tuple] = {}
+        self._rooms: Dict[str, Dict[str, int]] = {}
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        await self._dispatch(channel, message)
+
+    async def register_connection(self, client_id: str) -> None:
+        self._connections[client_id] = self.worker_id
+
+    async def unregister_connection(self, client_id: str) -> None:
+        if self._connections.get(client_id) == self.worker_id:
+            del self._connections[client_id]
+
+    async def connection_owner(self, client_id: str) -> Optional[str]:
+        return self._connections.get(client_id)
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None or entry[0] <= self.clock():
+            self._cache.pop(key, None)
+            return None
+        return entry[1]
+
+    async def cache_set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self._cache[key] = (self.clock() + ttl_seconds, value)
+
+    async def set_room_members(self, room: str, members: int) -> None:
+        workers = self._rooms.setdefault(room, {})
+        if members:
+            workers[self.worker_id] = members
+        else:
+            workers.pop(self.worker_id, None)
+            if not workers:
+                del self._rooms[room]
+
+    async def remote_room_members(self, room: str) -> int:
+        return sum(members for worker_id, members in self._rooms.get(room, {}).items() if worker_id != self.worker_id)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS connections (client_id TEXT PRIMARY KEY, worker_id TEXT NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel, id);
+CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS rooms (room TEXT NOT NULL, worker_id TEXT NOT NULL, members INTEGER NOT NULL, PRIMARY KEY (room, worker_id));
+"""
+
+class SqliteSharedState(SharedState):
+    """Shared state for the worker processes of one machine, kept in a SQLite database"""
+
+    distributed = True
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, worker_id: Optional[str] = None,
+                 poll_seconds: float = SHARED_STATE_POLL_SECONDS,
+                 message_ttl_seconds: float = SHARED_STATE_MESSAGE_TTL_SECONDS):
+        super().__init__(worker_id)
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.message_ttl_seconds = message_ttl_seconds
+        # One thread owns the connection; queries never block the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        self._db: Optional[sqlite3.Connection] = None
+        self._last_id = 0
+        self._poll_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._last_id = await self._call(self._open)
+        if self._poll_task is None:
+            self._poll_task = asyncio.ensure_future(self._poll())
+
+    async def stop(self) -> None:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        if self._db is not None:
+            await self._call(self._close)
+        self._executor.shutdown(wait=False)
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        await self._call(
+            self._execute,
+            "INSERT INTO messages (channel, payload, created) VALUES (?, ?, ?)",
+            (channel, json.dumps(message), time.time())
+        )
+
+    async def register_connection(self, client_id: str) -> None:
+        await self._call(
+            self._execute,
+            "INSERT OR REPLACE INTO connections (client_id, worker_id, updated) VALUES (?, ?, ?)",
+            (client_id, self.worker_id, time.time())
+        )
+
+    async def unregister_connection(self, client_id: str) -> None:
+        # Only our own entry: the client may already have reconnected to another worker
+        await self._call(
+            self._execute,
+            "DELETE FROM connections WHERE client_id = ? AND worker_id = ?",
+            (client_id, self.worker_id)
+        )
+
+    async def connection_owner(self, client_id: str) -> Optional[str]:
+        rows = await self._call(self._query, "SELECT worker_id FROM connections WHERE client_id = ?", (client_id,))
+        return rows[0][0] if rows else None
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        rows = await self._call(
+            self._query, "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+        )
+        return rows[0][0] if rows else None
+
+    async def cache_set(self, key: str, value: str, ttl_seconds: float) -> None:
+        await self._call(
+            self._execute,
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_seconds)
+        )
+
+    async def set_room_members(self, room: str, members: int) -> None:
+        if members:
+            await self._call(
+                self._execute,
+                "INSERT OR REPLACE INTO rooms (room, worker_id, members) VALUES (?, ?, ?)",
+                (room, self.worker_id, members)
+            )
+        else:
+            await self._call(self._execute, "DELETE FROM rooms WHERE room = ? AND worker_id = ?", (room, self.worker_id))
+
+    async def remote_room_members(self, room: str) -> int:
+        rows = await self._call(
+            self._query,
+            "SELECT COALESCE(SUM(members), 0) FROM rooms WHERE room = ? AND worker_id != ?",
+            (room, self.worker_id)
+        )
+        return rows[0][0]
+
+    async def _call(self, function: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # The methods below run on the executor thread
+
+    def _open(self) -> int:
+        self._db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # Entries left behind by an earlier process with the same worker ID
+        self._db.execute("DELETE FROM connections WHERE worker_id = ?", (self.worker_id,))
+        self._db.execute("DELETE FROM rooms WHERE worker_id = ?", (self.worker_id,))
+        # Subscribers only see messages published after they start
+        return self._db.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    def _close(self) -> None:
+        self._db.execute("DELETE FROM connections WHERE worker_id = ?", (self.worker_id,))
+        self._db.execute("DELETE FROM rooms WHERE worker_id = ?", (self.worker_id,))
+        self._db.close()
+        self._db = None
+
+    def _execute(self, sql: str, parameters: tuple) -> None:
+        self._db.execute(sql, parameters)
+
+    def _query(self, sql: str, parameters: tuple) -> List[tuple]:
+        return self._db.execute(sql, parameters).fetchall()
+
+    def _fetch_messages(self, after_id: int, channels: List[str]) -> List[tuple]:
+        placeholders = ",".join("?" * len(channels))
+        return self._db.execute(
+            f"SELECT id, channel, payload FROM messages WHERE id > ? AND channel IN ({placeholders}) ORDER BY id",
+            (after_id, *channels)
+        ).fetchall()
+
+    def _expire(self) -> None:
+        now = time.time()
+        self._db.execute("DELETE FROM messages WHERE created < ?", (now - self.message_ttl_seconds,))
+        self._db.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+
+    async def _poll(self) -> None:
+        last_expire = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                if self._handlers:
+                    rows = await self._call(self._fetch_messages, self._last_id, list(self._handlers))
+                    for message_id, channel, payload in rows:
+                        self._last_id = message_id
+                        await self._dispatch(channel, json.loads(payload))
+                if time.monotonic() - last_expire > self.message_ttl_seconds:
+                    last_expire = time.monotonic()
+                    await self._call(self._expire)
+            except Exception as e:
+                logger.error("Error polling shared state: %s", e)
+
+_shared_state: Optional[SharedState] = None
+
+def create_shared_state(backend: str, path: Optional[str] = None) -> SharedState:
+    if backend == "sqlite":
+        return SqliteSharedState(path or DEFAULT_SQLITE_PATH)
+    if backend != "memory":
+        logger.warning("Unknown shared state backend %r, using memory", backend)
+    return MemorySharedState()
+
+def get_shared_state() -> SharedState:
+    """Return the process-wide shared state, creating it from the settings"""
+    global _shared_state
+    if _shared_state is None:
+        settings = get_settings()
+        _shared_state = create_shared_state(settings.shared_state_backend, settings.shared_state_path)
+    return _shared_state
+
+def set_shared_state(shared_state: Optional[SharedState]) -> None:
+    """Replace the process-wide shared state (used by tests)"""
+    global _shared_state
+    _shared_state = shared_state
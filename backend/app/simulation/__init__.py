@@ -0,0 +1,5 @@
+"""Headless arena simulation for evaluating strategy policies offline"""
+from .arena import Arena, ArenaConfig, MatchResult
+from .policies import Policy, make_policy
+
+__all__ = ["Arena", "ArenaConfig", "MatchResult", "Policy", "make_policy"]
@@ -0,0 +1,410 @@
+"""Headless hex territory arena simulated with NumPy arrays.
+
+The map is an odd-r offset hex grid (the layout of the frontend's HexGrid).
+Cells hold an owner and a resource deposit; agents are columns of arrays
+(team, type, cell, health, attack, defense, speed, carry). Every tick, for
+all agents at once:
+
+- each agent pursues a goal - collect, expand, attack or defend - drawn from
+  weights set by its type and its team's current strategy, and steps to the
+  neighbouring cell closest to that goal's target;
+- agents on a deposit collect from it in proportion to their carry capacity;
+- a cell occupied by one team only becomes that team's territory;
+- agents take damage from the enemy attack in their cell and the adjacent
+  ones, shared among the friendly agents there; the same damages the bases;
+- a team with enough of every resource spawns an agent at its base.
+
+Strategies and agent specifications come from policies (see policies.py),
+called with the same GameState and request shapes the API receives, every
+``decision_interval`` ticks and at every spawn. A match ends when a base
+falls or after ``max_ticks``, when the team holding more territory wins.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..schemas.agent_spec import AgentSpecification
+from ..schemas.game_state import GameState
+from ..schemas.strategy import TeamStrategy
+from ..services.features import HEX_SIZE, HEX_SPACING
+
+TEAMS = ("red", "blue")
+AGENT_TYPES = ("collector", "explorer", "defender", "attacker")
+RESOURCE_TYPES = ("energy", "materials", "data")
+GOALS = ("collect", "expand", "attack", "defend")
+COLLECT, EXPAND, ATTACK, DEFEND = range(4)
+
+# Goal weights per agent type (rows follow AGENT_TYPES, columns GOALS)
+TYPE_GOALS = np.array([
+    [0.80, 0.10, 0.00, 0.10],
+    [0.30, 0.60, 0.05, 0.05],
+    [0.05, 0.15, 0.20, 0.60],
+    [0.05, 0.20, 0.65, 0.10],
+])
+# Multipliers on the goal weights for a strategy and for its focus
+STRATEGY_GOALS = {
+    "aggressive": np.array([0.6, 1.3, 1.8, 0.6]),
+    "defensive": np.array([1.0, 0.7, 0.6, 2.0]),
+    "balanced": np.array([1.0, 1.0, 1.0, 1.0]),
+    "economic": np.array([1.8, 0.8, 0.5, 0.8]),
+}
+FOCUS_GOALS = {
+    "territory": np.array([1.0, 1.5, 1.0, 1.0]),
+    "resources": np.array([1.5, 1.0, 1.0, 1.0]),
+    "combat": np.array([1.0, 1.0, 1.5, 1.2]),
+}
+
+# Attribute defaults per type, as in the frontend's Agent.getDefaultAttributes
+DEFAULT_ATTRIBUTES = {
+    "collector": {"speed": 0.4, "health": 0.5, "attack": 0.2, "defense": 0.3, "carryCapacity": 0.9},
+    "explorer": {"speed": 0.8, "health": 0.4, "attack": 0.4, "defense": 0.3, "carryCapacity": 0.4},
+    "defender": {"speed": 0.3, "health": 0.9, "attack": 0.6, "defense": 0.9, "carryCapacity": 0.2},
+    "attacker": {"speed": 0.7, "health": 0.6, "attack": 0.9, "defense": 0.4, "carryCapacity": 0.2},
+}
+STARTING_AGENTS = ("collector", "collector", "explorer", "explorer", "defender", "attacker")
+
+# Odd-r neighbour offsets (column, row) for even and odd rows
+EVEN_ROW_NEIGHBOURS = ((1, 0), (-1, 0), (0, -1), (-1, -1), (0, 1), (-1, 1))
+ODD_ROW_NEIGHBOURS = ((1, 0), (-1, 0), (1, -1), (0, -1), (1, 1), (0, 1))
+
+@dataclass(frozen=True)
+class ArenaConfig:
+    """Map size, economy and combat constants of a simulated match"""
+    columns: int = 24
+    rows: int = 16
+    max_ticks: int = 600
+    decision_interval: int = 20
+    # Ticks between goal re-draws for an agent
+    goal_interval: int = 5
+    max_agents_per_team: int = 40
+    deposit_share: float = 0.15
+    deposit_amount: Tuple[float, float] = (40.0, 100.0)
+    deposit_regen: float = 0.2
+    collect_rate: float = 2.0
+    starting_resources: int = 40
+    spawn_cost: Tuple[int, int, int] = (20, 15, 10)
+    spawn_interval: int = 10
+    damage_scale: float = 0.25
+    base_health: float = 400.0
+    base_damage_scale: float = 0.1
+
+@dataclass
+class MatchResult:
+    """Outcome of one simulated match"""
+    red: str
+    blue: str
+    seed: int
+    winner: Optional[str]
+    reason: str
+    ticks: int
+    territory: Dict[str, float]
+    agents: Dict[str, int]
+    spawned: Dict[str, int]
+    decisions: Dict[str, int] = field(default_factory=dict)
+
+@lru_cache(maxsize=8)
+def hex_grid(columns: int, rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pixel centres, neighbour table (self-padded) and hex distance matrix of a grid"""
+    column = np.tile(np.arange(columns), rows)
+    row = np.repeat(np.arange(rows), columns)
+    centres = np.stack([HEX_SPACING * (column + 0.5 * (row & 1)), 1.5 * HEX_SIZE * row], axis=1)
+
+    cells = columns * rows
+    neighbours = np.repeat(np.arange(cells)[:, None], 6, axis=1)
+    for parity, offsets in ((0, EVEN_ROW_NEIGHBOURS), (1, ODD_ROW_NEIGHBOURS)):
+        mask = (row & 1) == parity
+        for index, (dc, dr) in enumerate(offsets):
+            nc, nr = column[mask] + dc, row[mask] + dr
+            inside = (nc >= 0) & (nc < columns) & (nr >= 0) & (nr < rows)
+            target = np.flatnonzero(mask)[inside]
+            neighbours[target, index] = nr[inside] * columns + nc[inside]
+
+    # Cube coordinates give the hex distance as the largest coordinate difference
+    q = column - (row - (row & 1)) // 2
+    cube = np.stack([q, row, -q - row], axis=1)
+    distance = np.abs(cube[:, None, :] - cube[None, :, :]).max(axis=2).astype(np.int16)
+    return centres, neighbours, distance
+
+def goal_weights(strategy: TeamStrategy) -> np.ndarray:
+    """Cumulative goal probabilities per agent type for a strategy"""
+    weights = TYPE_GOALS * STRATEGY_GOALS.get(strategy.strategy, STRATEGY_GOALS["balanced"])
+    weights = weights * FOCUS_GOALS.get(strategy.focus, 1.0)
+    weights = weights / weights.sum(axis=1, keepdims=True)
+    return np.cumsum(weights, axis=1)
+
+class Arena:
+    """One simulated match between two policies"""
+
+    def __init__(self, red_policy, blue_policy, seed: int = 0, config: ArenaConfig = ArenaConfig()):
+        self.config = config
+        self.policies = (red_policy, blue_policy)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.centres, self.neighbours, self.distance = hex_grid(config.columns, config.rows)
+        cells = config.columns * config.rows
+        self._padding = (self.neighbours == np.arange(cells)[:, None]).sum(axis=1)
+
+        self.owner = np.full(cells, -1, dtype=np.int8)
+        deposits = self.rng.random(cells) < config.deposit_share
+        self.deposit_type = np.where(deposits, self.rng.integers(0, len(RESOURCE_TYPES), cells), -1).astype(np.int8)
+        low, high = config.deposit_amount
+        self.deposit_max = np.where(deposits, self.rng.uniform(low, high, cells), 0.0)
+        self.deposit = self.deposit_max.copy()
+
+        middle = (config.rows // 2) * config.columns
+        self.bases = np.array([middle + 1, middle + config.columns - 2])
+        self.deposit[self.bases] = self.deposit_max[self.bases] = 0.0
+        self.deposit_type[self.bases] = -1
+        self.base_health = np.full(2, config.base_health)
+        self.resources = np.full((2, len(RESOURCE_TYPES)), float(config.starting_resources))
+
+        capacity = 2 * config.max_agents_per_team
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.team = np.zeros(capacity, dtype=np.int8)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.cell = np.zeros(capacity, dtype=np.int32)
+        self.health = np.zeros(capacity)
+        self.max_health = np.zeros(capacity)
+        self.attack = np.zeros(capacity)
+        self.defense = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.carry = np.zeros(capacity)
+        self.goal = np.zeros(capacity, dtype=np.int8)
+
+        self.tick = 0
+        self.strategies: List[TeamStrategy] = [None, None]
+        self._goal_cdf = np.zeros((2, len(AGENT_TYPES), len(GOALS)))
+        self._last_spawn = np.full(2, -config.spawn_interval)
+        self.spawned = [0, 0]
+        self.decisions = [0, 0]
+
+        for team in range(2):
+            for agent_type in STARTING_AGENTS:
+                self.spawn(team, agent_type, DEFAULT_ATTRIBUTES[agent_type])
+        self.spawned = [0, 0]
+        self._decide()
+
+    def spawn(self, team: int, agent_type: str, attributes: Dict[str, float]) -> bool:
+        free = np.flatnonzero(~self.alive)
+        if not len(free) or np.count_nonzero(self.alive & (self.team == team)) >= self.config.max_agents_per_team:
+            return False
+        index = free[0]
+        # Attribute scales follow the frontend Agent: health 50-150, attack 5-25
+        self.alive[index] = True
+        self.team[index] = team
+        self.kind[index] = AGENT_TYPES.index(agent_type) if agent_type in AGENT_TYPES else AGENT_TYPES.index("explorer")
+        self.cell[index] = self.bases[team]
+        self.health[index] = self.max_health[index] = 50 + 100 * attributes["health"]
+        self.attack[index] = 5 + 20 * attributes["attack"]
+        self.defense[index] = attributes["defense"]
+        # Chance to move each tick
+        self.speed[index] = 0.3 + 0.7 * attributes["speed"]
+        self.carry[index] = attributes["carryCapacity"]
+        self.goal[index] = self._draw_goals(np.array([index]))[0] if self.strategies[team] is not None else COLLECT
+        self.spawned[team] += 1
+        return True
+
+    def territory(self) -> np.ndarray:
+        """Percentage of cells owned by each team"""
+        counts = np.bincount(self.owner[self.owner >= 0], minlength=2)
+        return 100.0 * counts / len(self.owner)
+
+    def game_state(self, team: int) -> GameState:
+        """The state a frontend would send for a team, built from the arrays"""
+        territory = self.territory()
+        agents: Dict[str, List[Dict[str, Any]]] = {name: [] for name in TEAMS}
+        for index in np.flatnonzero(self.alive).tolist():
+            x, y = self.centres[self.cell[index]]
+            agents[TEAMS[self.team[index]]].append({
+                "id": index, "type": AGENT_TYPES[self.kind[index]], "health": float(self.health[index]),
+                "x": float(x), "y": float(y)
+            })
+        remaining = np.bincount(self.deposit_type[self.deposit_type >= 0], weights=self.deposit[self.deposit_type >= 0],
+                                minlength=len(RESOURCE_TYPES))
+        return GameState(
+            team_id=TEAMS[team],
+            territory_control={name: float(territory[index]) for index, name in enumerate(TEAMS)},
+            resources={name: dict(zip(RESOURCE_TYPES, self.resources[index].astype(int).tolist()))
+                       for index, name in enumerate(TEAMS)},
+            agents=agents,
+            resource_distribution=dict(zip(RESOURCE_TYPES, remaining.astype(int).tolist())),
+            bases={name: {"x": float(self.centres[self.bases[index]][0]), "y": float(self.centres[self.bases[index]][1])}
+                   for index, name in enumerate(TEAMS)}
+        )
+
+    def agent_request(self, team: int) -> Dict[str, Any]:
+        """The /api/agent-specification request a frontend would send for a team"""
+        kinds = self.kind[self.alive & (self.team == team)]
+        composition = np.bincount(kinds, minlength=len(AGENT_TYPES))
+        return {
+            "team_id": TEAMS[team],
+            "strategy": self.strategies[team].model_dump(),
+            "resources": dict(zip(RESOURCE_TYPES, self.resources[team].astype(int).tolist())),
+            "current_agents": [{"type": agent_type, "count": int(count)}
+                               for agent_type, count in zip(AGENT_TYPES, composition.tolist()) if count]
+        }
+
+    def _decide(self) -> None:
+        for team in range(2):
+            strategy = self.policies[team].strategy(self.game_state(team))
+            self.decisions[team] += 1
+            if strategy != self.strategies[team]:
+                self.strategies[team] = strategy
+                self._goal_cdf[team] = goal_weights(strategy)
+                agents = np.flatnonzero(self.alive & (self.team == team))
+                self.goal[agents] = self._draw_goals(agents)
+
+    def _draw_goals(self, agents: np.ndarray) -> np.ndarray:
+        cdf = self._goal_cdf[self.team[agents], self.kind[agents]]
+        return (self.rng.random(len(agents))[:, None] > cdf).sum(axis=1).clip(0, len(GOALS) - 1)
+
+    def _targets(self, agents: np.ndarray) -> np.ndarray:
+        """Target cell of each agent's goal"""
+        cell, team, goal = self.cell[agents], self.team[agents], self.goal[agents]
+        targets = self.bases[team].copy()
+        enemy_base = self.bases[1 - team]
+
+        collecting = goal == COLLECT
+        deposits = np.flatnonzero(self.deposit > 1.0)
+        if collecting.any() and len(deposits):
+            nearest = self.distance[cell[collecting][:, None], deposits[None, :]].argmin(axis=1)
+            targets[collecting] = deposits[nearest]
+        elif collecting.any():
+            goal = np.where(collecting, EXPAND, goal)
+
+        for team_index in range(2):
+            expanding = (goal == EXPAND) & (team == team_index)
+            unowned = np.flatnonzero(self.owner != team_index)
+            if expanding.any() and len(unowned):
+                distance = self.distance[cell[expanding][:, None], unowned[None, :]].astype(np.float64)
+                # Random tie-breaking spreads explorers out instead of sending them to the same cell
+                nearest = (distance + self.rng.random(distance.shape)).argmin(axis=1)
+                targets[expanding] = unowned[nearest]
+
+            attacking = (goal == ATTACK) & (team == team_index)
+            enemies = np.flatnonzero(self.alive & (self.team != team_index))
+            if attacking.any():
+                targets[attacking] = enemy_base[attacking]
+                if len(enemies):
+                    enemy_cells = self.cell[enemies]
+                    distance = self.distance[cell[attacking][:, None], enemy_cells[None, :]]
+                    nearest = distance.argmin(axis=1)
+                    closer = distance[np.arange(len(nearest)), nearest] < \
+                        self.distance[cell[attacking], enemy_base[attacking]]
+                    targets[np.flatnonzero(attacking)[closer]] = enemy_cells[nearest[closer]]
+        return targets
+
+    def _move(self, agents: np.ndarray) -> None:
+        targets = self._targets(agents)
+        candidates = self.neighbours[self.cell[agents]]
+        distance = self.distance[candidates, targets[:, None]]
+        best = candidates[np.arange(len(agents)), distance.argmin(axis=1)]
+        closer = self.distance[best, targets] < self.distance[self.cell[agents], targets]
+        moving = closer & (self.rng.random(len(agents)) < self.speed[agents])
+        self.cell[agents[moving]] = best[moving]
+
+    def _collect(self, agents: np.ndarray) -> None:
+        cells = len(self.owner)
+        cell = self.cell[agents]
+        on_deposit = self.deposit[cell] > 0
+        if not on_deposit.any():
+            return
+        agents, cell = agents[on_deposit], cell[on_deposit]
+        rate = self.config.collect_rate * self.carry[agents]
+        demand = np.bincount(cell, weights=rate, minlength=cells)
+        taken = np.minimum(demand, self.deposit)
+        self.deposit -= taken
+        # Each agent gets its share of what its cell gave up
+        share = rate * (taken[cell] / np.maximum(demand[cell], 1e-9))
+        deposit_type = self.deposit_type[cell]
+        np.add.at(self.resources, (self.team[agents], deposit_type), share)
+
+    def _claim(self, agents: np.ndarray) -> np.ndarray:
+        cells = len(self.owner)
+        presence = np.stack([np.bincount(self.cell[agents][self.team[agents] == team], minlength=cells)
+                             for team in range(2)])
+        for team in range(2):
+            self.owner[(presence[team] > 0) & (presence[1 - team] == 0)] = team
+        return presence
+
+    def _near(self, per_cell: np.ndarray) -> np.ndarray:
+        """Sum of a per-team, per-cell quantity over each cell and its neighbours"""
+        # Edge cells list themselves in place of missing neighbours; those entries are taken back out
+        return per_cell + per_cell[:, self.neighbours].sum(axis=2) - per_cell * self._padding
+
+    def _fight(self, agents: np.ndarray, presence: np.ndarray) -> None:
+        cells = len(self.owner)
+        cell, team = self.cell[agents], self.team[agents]
+        # Attack and agent counts within one hex of every cell, per team
+        strength = np.stack([np.bincount(cell[team == index], weights=self.attack[agents][team == index], minlength=cells)
+                             for index in range(2)])
+        strength_near = self._near(strength)
+        presence_near = self._near(presence)
+
+        enemy = strength_near[1 - team, cell]
+        damage = self.config.damage_scale * enemy / np.maximum(presence_near[team, cell], 1) * (1 - 0.5 * self.defense[agents])
+        self.health[agents] -= damage
+        dead = agents[self.health[agents] <= 0]
+        self.alive[dead] = False
+
+        for index in range(2):
+            base = self.bases[index]
+            # Defenders at the base absorb half of the damage
+            shield = 0.5 if presence_near[index, base] else 1.0
+            self.base_health[index] -= self.config.base_damage_scale * strength_near[1 - index, base] * shield
+
+    def _spawn_ready_teams(self) -> None:
+        cost = np.array(self.config.spawn_cost, dtype=float)
+        for team in range(2):
+            if self.tick - self._last_spawn[team] < self.config.spawn_interval or (self.resources[team] < cost).any():
+                continue
+            specification: AgentSpecification = self.policies[team].agent(self.agent_request(team))
+            if self.spawn(team, specification.role, specification.attributes.model_dump()):
+                self.resources[team] -= cost
+                self._last_spawn[team] = self.tick
+
+    def step(self) -> None:
+        """Advance the match by one tick"""
+        self.tick += 1
+        if self.tick % self.config.decision_interval == 0:
+            self._decide()
+        agents = np.flatnonzero(self.alive)
+        redraw = agents[(agents + self.tick) % self.config.goal_interval == 0]
+        if len(redraw):
+            self.goal[redraw] = self._draw_goals(redraw)
+        if len(agents):
+            self._move(agents)
+            self._collect(agents)
+            presence = self._claim(agents)
+            self._fight(agents, presence)
+        self.deposit = np.minimum(self.deposit + self.config.deposit_regen * (self.deposit_max > 0), self.deposit_max)
+        self._spawn_ready_teams()
+
+    def run(self, red: str = "red", blue: str = "blue") -> MatchResult:
+        """Play the match to the end"""
+        winner, reason = None, "max_ticks"
+        while self.tick < self.config.max_ticks:
+            self.step()
+            fallen = np.flatnonzero(self.base_health <= 0)
+            if len(fallen):
+                winner = TEAMS[1 - fallen[0]] if len(fallen) == 1 else None
+                reason = "base_destroyed"
+                break
+        territory = self.territory()
+        if reason == "max_ticks" and territory[0] != territory[1]:
+            winner = TEAMS[int(territory.argmax())]
+            reason = "territory"
+        return MatchResult(
+            red=red,
+            blue=blue,
+            seed=self.seed,
+            winner=winner,
+            reason=reason,
+            ticks=self.tick,
+            territory={name: round(float(territory[index]), 2) for index, name in enumerate(TEAMS)},
+            agents={name: int(np.count_nonzero(self.alive & (self.team == index))) for index, name in enumerate(TEAMS)},
+            spawned=dict(zip(TEAMS, self.spawned)),
+            decisions=dict(zip(TEAMS, self.decisions))
+        )
@@ -0,0 +1,95 @@
+"""Strategy policies the arena plays, built from specs like ``"margin:5"``.
+
+A policy answers the two questions the frontend asks the backend - a team
+strategy for a GameState and an agent specification for a spawn request - so
+the existing services plug in unchanged:
+
+- ``fallback``: ``generate_fallback_strategy`` and ``generate_fallback_agent``
+  as served today;
+- ``margin:<points>``: the fallback logic with a different ahead/behind
+  territory margin (the service default is ``TERRITORY_MARGIN``);
+- ``threat:<enemies>``: the fallback logic with a different base threat
+  threshold;
+- ``fixed:<situation>``: always the ``FALLBACK_STRATEGIES`` entry for one
+  situation (``behind``, ``ahead``, ``close``, ...), as a baseline;
+- ``service``: ``generate_team_strategy`` and ``generate_agent_specification``,
+  including the cache and the workflow path when mock mode is off.
+
+Specs are strings so a process pool can send them to its workers.
+"""
+import asyncio
+from typing import Any, Callable, Dict
+
+from ..schemas.agent_spec import AgentSpecification
+from ..schemas.game_state import GameState
+from ..schemas.strategy import TeamStrategy
+from ..services.agent_service import generate_agent_specification, generate_fallback_agent
+from ..services.strategy_service import (
+    FALLBACK_STRATEGIES,
+    fallback_situation,
+    generate_fallback_strategy,
+    generate_team_strategy
+)
+
+class Policy:
+    """Decides strategies and spawned agents for one team"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+
+    def strategy(self, game_state: GameState) -> TeamStrategy:
+        return generate_fallback_strategy(game_state)
+
+    def agent(self, request_data: Dict[str, Any]) -> AgentSpecification:
+        return generate_fallback_agent(request_data)
+
+class SituationPolicy(Policy):
+    """The fallback strategy table with its own situation thresholds"""
+
+    def __init__(self, spec: str, **thresholds: float):
+        super().__init__(spec)
+        self.thresholds = thresholds
+        self._strategies = {situation: TeamStrategy(**strategy) for situation, strategy in FALLBACK_STRATEGIES.items()}
+
+    def strategy(self, game_state: GameState) -> TeamStrategy:
+        return self._strategies[fallback_situation(game_state, **self.thresholds)]
+
+class FixedPolicy(Policy):
+    """Always the strategy for one situation"""
+
+    def __init__(self, spec: str, situation: str):
+        super().__init__(spec)
+        if situation not in FALLBACK_STRATEGIES:
+            raise ValueError(f"Unknown situation {situation!r}, expected one of {', '.join(FALLBACK_STRATEGIES)}")
+        self._strategy = TeamStrategy(**FALLBACK_STRATEGIES[situation])
+
+    def strategy(self, game_state: GameState) -> TeamStrategy:
+        return self._strategy
+
+class ServicePolicy(Policy):
+    """The async services behind the API, run on a private event loop"""
+
+    def __init__(self, spec: str):
+        super().__init__(spec)
+        self._loop = asyncio.new_event_loop()
+
+    def strategy(self, game_state: GameState) -> TeamStrategy:
+        return self._loop.run_until_complete(generate_team_strategy(game_state))
+
+    def agent(self, request_data: Dict[str, Any]) -> AgentSpecification:
+        return self._loop.run_until_complete(generate_agent_specification(request_data))
+
+POLICIES: Dict[str, Callable[[str, str], Policy]] = {
+    "fallback": lambda spec, argument: Policy(spec),
+    "margin": lambda spec, argument: SituationPolicy(spec, margin=float(argument)),
+    "threat": lambda spec, argument: SituationPolicy(spec, base_threat_threshold=int(argument)),
+    "fixed": lambda spec, argument: FixedPolicy(spec, argument),
+    "service": lambda spec, argument: ServicePolicy(spec),
+}
+
+def make_policy(spec: str) -> Policy:
+    """Build a policy from a spec such as "fallback", "margin:5" or "fixed:behind\""""
+    name, _, argument = spec.partition(":")
+    if name not in POLICIES:
+        raise ValueError(f"Unknown policy {name!r}, expected one of {', '.join(POLICIES)}")
+    return POLICIES[name](spec, argument)
@@ -0,0 +1,116 @@
+"""Round-robin tournaments between policies across a process pool.
+
+Every pair of policies plays ``matches`` seeded matches, half with each
+policy as red, so map and side advantages cancel out. Matches are shipped to
+the workers in chunks and each worker keeps its policies between matches.
+
+    python -m app.simulation.tournament --policies fallback margin:5 fixed:ahead --matches 500 --workers 8
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .arena import Arena, ArenaConfig, MatchResult
+from .policies import Policy, make_policy
+
+Match = Tuple[str, str, int, ArenaConfig]
+
+_policies: Dict[str, Policy] = {}
+
+def _policy(spec: str) -> Policy:
+    if spec not in _policies:
+        _policies[spec] = make_policy(spec)
+    return _policies[spec]
+
+def run_match(match: Match) -> MatchResult:
+    """Play one match; top-level so the process pool can pickle it"""
+    red, blue, seed, config = match
+    return Arena(_policy(red), _policy(blue), seed=seed, config=config).run(red, blue)
+
+def schedule(policies: Sequence[str], matches: int, seed: int = 0, config: ArenaConfig = ArenaConfig()) -> List[Match]:
+    """Every pairing's matches, alternating sides, with distinct seeds"""
+    games = []
+    for first, second in itertools.combinations(policies, 2):
+        for index in range(matches):
+            red, blue = (first, second) if index % 2 == 0 else (second, first)
+            games.append((red, blue, seed + len(games), config))
+    return games
+
+def summarize(policies: Sequence[str], results: Sequence[MatchResult]) -> Dict[str, Any]:
+    """Win/loss/draw counts per policy and per pairing"""
+    standings = {spec: {"wins": 0, "losses": 0, "draws": 0, "matches": 0} for spec in policies}
+    pairings: Dict[str, Dict[str, int]] = {}
+    reasons: Dict[str, int] = {}
+    for result in results:
+        players = {"red": result.red, "blue": result.blue}
+        pairing = pairings.setdefault(" vs ".join(sorted(players.values())), {spec: 0 for spec in sorted(players.values())})
+        pairing.setdefault("draws", 0)
+        reasons[result.reason] = reasons.get(result.reason, 0) + 1
+        for side, spec in players.items():
+            standings[spec]["matches"] += 1
+            if result.winner is None:
+                standings[spec]["draws"] += 1
+            elif result.winner == side:
+                standings[spec]["wins"] += 1
+                pairing[spec] += 1
+            else:
+                standings[spec]["losses"] += 1
+        if result.winner is None:
+            pairing["draws"] += 1
+    for entry in standings.values():
+        entry["win_rate"] = round(entry["wins"] / entry["matches"], 3) if entry["matches"] else 0.0
+    return {"standings": standings, "pairings": pairings, "reasons": reasons}
+
+def run_tournament(
+    policies: Sequence[str],
+    matches: int = 100,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    config: ArenaConfig = ArenaConfig(),
+    keep_results: bool = False
+) -> Dict[str, Any]:
+    """Play a round robin and report standings and throughput; workers=0 plays in this process"""
+    for spec in policies:
+        make_policy(spec)
+    games = schedule(policies, matches, seed, config)
+    workers = os.cpu_count() or 1 if workers is None else workers
+
+    start = time.perf_counter()
+    if workers == 0:
+        results = [run_match(game) for game in games]
+    else:
+        chunksize = max(1, len(games) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_match, games, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    report = summarize(policies, results)
+    report.update({
+        "matches": len(results),
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "matches_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "mean_ticks": round(sum(result.ticks for result in results) / len(results), 1) if results else 0.0,
+    })
+    if keep_results:
+        report["results"] = [asdict(result) for result in results]
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--policies", nargs="+", default=["fallback", "fixed:ahead", "fixed:behind"])
+    parser.add_argument("--matches", type=int, default=100, help="Matches per pairing")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, 0 to run inline)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=ArenaConfig.max_ticks)
+    args = parser.parse_args()
+    report = run_tournament(args.policies, args.matches, args.workers, args.seed, ArenaConfig(max_ticks=args.max_ticks))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
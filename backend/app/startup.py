@@ -0,0 +1,132 @@
+"""Startup time profiling.
+
+``startup_profile`` starts its clock when ``app.main`` begins importing and
+records named phases (module imports, settings, background
+pre-warming) up to the point the application is ready to serve. The report
+is logged at startup and served on ``GET /startup/stats``.
+
+For a per-module import breakdown, run:
+
+    python -m app.startup            # top imports of app.main by cumulative time
+    python -m app.startup --top 40
+"""
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def process_age_seconds() -> Optional[float]:
+    """Seconds since this process was started, where /proc is available"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields after it are space separated
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupProfile:
+    """Named durations from package import to ready"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        # Time the interpreter spent before the app package was imported (server and framework imports)
+        age = process_age_seconds()
+        self.before_import_ms = age * 1000.0 if age is not None else None
+        self.phases: List[Dict[str, Any]] = []
+        self.background: Dict[str, float] = {}
+        self.ready_ms: Optional[float] = None
+        self._last = self.origin
+
+    def _elapsed_ms(self, since: float) -> float:
+        return (time.perf_counter() - since) * 1000.0
+
+    def mark(self, name: str) -> None:
+        """Record the time since the previous mark as phase name"""
+        now = time.perf_counter()
+        self.phases.append({"name": name, "ms": (now - self._last) * 1000.0})
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the duration of the block as phase name"""
+        self.mark("other")
+        try:
+            yield
+        finally:
+            self.mark(name)
+
+    def ready(self) -> None:
+        self.mark("other")
+        self.ready_ms = self._elapsed_ms(self.origin)
+        # Drop empty gaps between phases
+        self.phases = [phase for phase in self.phases if phase["name"] != "other" or phase["ms"] >= 0.1]
+
+    def record_background(self, name: str, ms: float) -> None:
+        self.background[name] = ms
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "before_app_import_ms": self.before_import_ms,
+            "phases": self.phases,
+            "ready_ms": self.ready_ms,
+            "background": self.background
+        }
+
+    def log(self) -> None:
+        phases = ", ".join(f"{phase['name']} {phase['ms']:.0f}ms" for phase in self.phases)
+        before = f" after {self.before_import_ms:.0f}ms of interpreter/server startup" if self.before_import_ms else ""
+        logger.info("Startup ready in %.0fms%s (%s)", self.ready_ms, before, phases)
+
+startup_profile = StartupProfile()
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_breakdown(module: str = "app.main", top: int = 25) -> Dict[str, Any]:
+    """Import the module in a fresh interpreter with -X importtime and summarize the cost"""
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "depth": len(indent) // 2,
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cumulative_us) / 1000.0
+            })
+
+    total = next((entry["cumulative_ms"] for entry in entries if entry["module"] == module), None)
+    # Direct imports of the application modules show which dependency each one pulls in
+    direct = [entry for entry in entries if entry["depth"] <= 2]
+    return {
+        "module": module,
+        "total_ms": total,
+        "top": sorted(direct, key=lambda entry: entry["cumulative_ms"], reverse=True)[:top],
+        "app_modules": [entry for entry in entries if entry["module"].startswith("app.")]
+    }
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Report the import time breakdown of the backend")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+    print(json.dumps(import_breakdown(args.module, args.top), indent=2))
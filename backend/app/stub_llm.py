@@ -0,0 +1,172 @@
+"""Local OpenAI-compatible stub LLM server for offline testing.
+
+Serves ``POST /v1/chat/completions`` with valid strategy or agent JSON after
+a configurable latency, so the workflow executor's throughput and tail
+latency can be measured without a real model:
+
+    python -m app.stub_llm --port 8001 --latency-ms 2000 --jitter-ms 500
+
+Point the backend at it with ``LLM_BASE_URL=http://localhost:8001/v1``.
+
+Requests with ``"stream": true`` get the completion as server-sent events,
+a few characters per chunk, ``--chunk-ms`` apart after the initial latency.
+
+``--prompt-token-ms`` adds prefill time per prompt token (four characters).
+Like providers with prompt caching, a system message the stub has seen
+before is not charged again and is reported as ``cached_tokens``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import zlib
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+STRATEGY_CHOICES = [
+    ("aggressive", "territory", ["expand_territory", "attack_enemies", "collect_energy"]),
+    ("defensive", "resources", ["defend_territory", "collect_materials", "collect_energy"]),
+    ("balanced", "resources", ["collect_energy", "expand_territory", "collect_materials"]),
+    ("economic", "resources", ["collect_energy", "collect_materials", "collect_data"])
+]
+
+AGENT_CHOICES = [
+    ("attacker", {"speed": 0.7, "health": 0.6, "attack": 0.8, "defense": 0.4, "carryCapacity": 0.3}, "territory"),
+    ("defender", {"speed": 0.4, "health": 0.9, "attack": 0.5, "defense": 0.9, "carryCapacity": 0.2}, "territory"),
+    ("collector", {"speed": 0.6, "health": 0.5, "attack": 0.3, "defense": 0.5, "carryCapacity": 0.9}, "energy"),
+    ("explorer", {"speed": 0.8, "health": 0.6, "attack": 0.5, "defense": 0.5, "carryCapacity": 0.6}, "data")
+]
+
+def stub_agent(choice: int) -> dict:
+    role, attributes, priority = AGENT_CHOICES[choice % len(AGENT_CHOICES)]
+    return {
+        "role": role,
+        "attributes": attributes,
+        "priority": priority,
+        "description": f"Stub {role} generated for offline testing."
+    }
+
+def completion_for_prompt(prompt: str) -> dict:
+    """Build a deterministic JSON answer matching the workflow that sent the prompt"""
+    choice = zlib.crc32(prompt.encode("utf-8"))
+    plan = re.search(r"planning the next (\d+) agents", prompt)
+    if plan:
+        return {"agents": [stub_agent(choice + offset) for offset in range(int(plan.group(1)))]}
+    if "designing a specialized agent" in prompt:
+        return stub_agent(choice)
+
+    strategy, focus, priorities = STRATEGY_CHOICES[choice % len(STRATEGY_CHOICES)]
+    return {
+        "strategy": strategy,
+        "focus": focus,
+        "priorities": priorities,
+        "description": f"Stub {strategy} strategy generated for offline testing."
+    }
+
+# Characters of the completion sent per streamed chunk (roughly two tokens)
+STREAM_CHUNK_CHARS = 8
+
+async def stream_chunks(content: str, model: str, completion_id: str, chunk_ms: float):
+    """Yield the completion as chat.completion.chunk server-sent events"""
+    for index in range(0, len(content), STREAM_CHUNK_CHARS):
+        if index and chunk_ms:
+            await asyncio.sleep(chunk_ms / 1000.0)
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[index:index + STREAM_CHUNK_CHARS]}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+# Distinct system messages the stub remembers as cached prefixes
+PREFIX_CACHE_SIZE = 256
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+               seed: Optional[int] = None, chunk_ms: float = 0.0, prompt_token_ms: float = 0.0) -> FastAPI:
+    """Create a stub server with the given latency profile and failure rate"""
+    app = FastAPI(title="Stub LLM")
+    rng = random.Random(seed)
+    app.state.requests = 0
+    app.state.prefixes = set()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: dict):
+        app.state.requests += 1
+        messages = request.get("messages", [])
+        prompt = "\n".join(message.get("content", "") for message in messages)
+        prompt_tokens = len(prompt) // 4
+        cached_tokens = 0
+        if messages and messages[0].get("role") == "system":
+            prefix = messages[0].get("content", "")
+            if prefix in app.state.prefixes:
+                cached_tokens = len(prefix) // 4
+            elif len(app.state.prefixes) < PREFIX_CACHE_SIZE:
+                app.state.prefixes.add(prefix)
+
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000.0
+        delay += prompt_token_ms * (prompt_tokens - cached_tokens) / 1000.0
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            raise HTTPException(status_code=503, detail="Stub LLM injected failure")
+
+        content = json.dumps(completion_for_prompt(prompt))
+        if request.get("stream"):
+            return StreamingResponse(
+                stream_chunks(content, request.get("model", "stub"), f"stub-{app.state.requests}", chunk_ms),
+                media_type="text/event-stream"
+            )
+        return {
+            "id": f"stub-{app.state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    return app
+
+app = create_app(
+    latency_ms=float(os.getenv("STUB_LLM_LATENCY_MS", "0")),
+    jitter_ms=float(os.getenv("STUB_LLM_JITTER_MS", "0")),
+    error_rate=float(os.getenv("STUB_LLM_ERROR_RATE", "0")),
+    chunk_ms=float(os.getenv("STUB_LLM_CHUNK_MS", "0")),
+    prompt_token_ms=float(os.getenv("STUB_LLM_PROMPT_TOKEN_MS", "0"))
+)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-ms", type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument("--prompt-token-ms", type=float, default=0.0, help="Prefill delay per uncached prompt token")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate, chunk_ms=args.chunk_ms,
+                   prompt_token_ms=args.prompt_token_ms),
+        host=args.host,
+        port=args.port,
+        log_level="warning"
+    )
@@ -0,0 +1,105 @@
+"""Prompt tokens and stub LLM latency with and without prompt compaction.
+
+For game states with a growing number of agents, compares the team strategy
+prompt carrying the raw state fields (agent lists included, as JSON after the
+instructions) with the compacted prompt, sent either as one message or with
+its instructions as a cached system prefix. The stub LLM charges
+``--prompt-token-ms`` of prefill per uncached prompt token on top of its
+fixed latency.
+
+    python -m benchmarks.bench_prompt_budget --agents 10 100 1000 --calls 20 --prompt-token-ms 0.25
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+from app.schemas.game_state import GameState
+from app.services.strategy_service import strategy_workflow_input
+from app.services.workflow_executor import estimate_tokens, get_executor
+from app.stub_llm import create_app
+
+AGENT_TYPES = ["collector", "explorer", "defender", "attacker"]
+
+def game_state(agents_per_team: int, seed: int = 0) -> GameState:
+    rng = random.Random(seed)
+    return GameState(
+        team_id="red",
+        territory_control={"red": 43.3333, "blue": 51.7712},
+        resources={
+            "red": {"energy": 123, "materials": 45, "data": 67},
+            "blue": {"energy": 98, "materials": 12, "data": 40}
+        },
+        agents={
+            team: [{
+                "id": index,
+                "type": rng.choice(AGENT_TYPES),
+                "health": rng.uniform(20, 100),
+                "x": rng.uniform(0, 1200) + offset,
+                "y": rng.uniform(0, 800)
+            } for index in range(agents_per_team)]
+            for team, offset in (("red", 0), ("blue", 400))
+        },
+        resource_distribution={"energy": 120, "materials": 80, "data": 33},
+        bases={"red": {"x": 100, "y": 400}, "blue": {"x": 1500, "y": 400}}
+    )
+
+def raw_messages(state: GameState, prefix: str) -> list:
+    """The instructions followed by the raw state fields, as one user message"""
+    fields = state.model_dump(include={"territory_control", "agents", "resources", "resource_distribution"})
+    return [{"role": "user", "content": f"{prefix}\nCURRENT GAME STATE:\n{json.dumps(fields)}"}]
+
+async def mean_latency_ms(client: httpx.AsyncClient, messages: list, calls: int) -> float:
+    async def one_call():
+        start = time.perf_counter()
+        response = await client.post("/chat/completions", json={"model": "stub", "messages": messages})
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000.0
+
+    # The first call primes the stub's prefix cache, as the first call of a match does
+    await one_call()
+    return statistics.mean(await asyncio.gather(*(one_call() for _ in range(calls))))
+
+async def run(agent_counts, calls: int, latency_ms: float, prompt_token_ms: float) -> list:
+    definition = get_executor().workflow("team_strategy")
+    stub = create_app(latency_ms=latency_ms, prompt_token_ms=prompt_token_ms, seed=0)
+    results = []
+    async with httpx.AsyncClient(base_url="http://stub/v1", transport=httpx.ASGITransport(app=stub)) as client:
+        for agents in agent_counts:
+            state = game_state(agents)
+            start = time.perf_counter()
+            for _ in range(10):
+                workflow_input = strategy_workflow_input(state, "red")
+            build_ms = (time.perf_counter() - start) * 100.0
+
+            compact = definition.messages(workflow_input)
+            prefix, body = compact[0]["content"], compact[1]["content"]
+            raw = raw_messages(state, prefix)
+            single = [{"role": "user", "content": definition.render(workflow_input)}]
+            results.append({
+                "agents_per_team": agents,
+                "raw_tokens": estimate_tokens(raw[0]["content"]),
+                "compact_tokens": estimate_tokens(single[0]["content"]),
+                "uncached_tokens": estimate_tokens(body),
+                "build_ms": round(build_ms, 3),
+                "raw_latency_ms": round(await mean_latency_ms(client, raw, calls), 1),
+                "compact_latency_ms": round(await mean_latency_ms(client, single, calls), 1),
+                "compact_prefix_latency_ms": round(await mean_latency_ms(client, compact, calls), 1)
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--prompt-token-ms", type=float, default=0.25)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.agents, args.calls, args.latency_ms, args.prompt_token_ms)), indent=2))
+
+if __name__ == "__main__":
+    main()
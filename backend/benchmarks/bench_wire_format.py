@@ -0,0 +1,98 @@
+"""Decode cost of the JSON/pydantic game state versus the compact formats.
+
+For each state size, measures the time to turn a request body into a game
+state the services can use, and the encoded body size:
+
+- json: json.loads + GameState validation (the original path)
+- json_direct: GameState.model_validate_json straight from bytes
+- msgpack: MessagePack with raw little-endian columns into NumPy arrays
+- packed: the fixed binary layout, decoded as zero-copy NumPy views
+
+    python -m benchmarks.bench_wire_format --sizes 100 1000 10000
+"""
+import argparse
+import json
+import random
+import timeit
+
+from app.schemas.compact import CompactGameState, decode_msgpack, decode_packed, encode_msgpack, encode_packed
+from app.schemas.game_state import GameState
+
+AGENT_TYPES = ["collector", "explorer", "defender", "attacker"]
+
+def make_game_state(agent_count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    agents = {"red": [], "blue": []}
+    for agent_id in range(agent_count):
+        team = "red" if agent_id % 2 == 0 else "blue"
+        agents[team].append({
+            "id": agent_id,
+            "type": rng.choice(AGENT_TYPES),
+            "health": rng.uniform(10, 150),
+            "x": rng.uniform(0, 1200),
+            "y": rng.uniform(0, 800)
+        })
+    return {
+        "team_id": "red",
+        "territory_control": {"red": 45.0, "blue": 55.0},
+        "resources": {
+            "red": {"energy": 50, "materials": 30, "data": 20},
+            "blue": {"energy": 40, "materials": 35, "data": 25}
+        },
+        "agents": agents,
+        "resource_distribution": {"energy": 10, "materials": 8, "data": 12}
+    }
+
+def time_per_call(func, min_time: float = 0.2) -> float:
+    """Seconds per call, auto-scaling the repeat count"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return elapsed / number
+
+def run(sizes):
+    results = []
+    for size in sizes:
+        payload = make_game_state(size)
+        json_body = json.dumps(payload).encode("utf-8")
+        compact = CompactGameState.from_game_state(GameState(**payload))
+        msgpack_body = encode_msgpack(compact)
+        packed_body = encode_packed(compact)
+
+        cases = {
+            "json": (json_body, lambda: GameState(**json.loads(json_body))),
+            "json_direct": (json_body, lambda: GameState.model_validate_json(json_body)),
+            "msgpack": (msgpack_body, lambda: decode_msgpack(msgpack_body)),
+            "packed": (packed_body, lambda: decode_packed(packed_body))
+        }
+        baseline = None
+        for name, (body, decode) in cases.items():
+            seconds = time_per_call(decode)
+            baseline = baseline or seconds
+            results.append({
+                "agents": size,
+                "format": name,
+                "bytes": len(body),
+                "decode_us": seconds * 1e6,
+                "speedup": baseline / seconds
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'agents':>7} {'format':>12} {'bytes':>10} {'decode_us':>12} {'speedup':>8}")
+    for row in results:
+        print(f"{row['agents']:>7} {row['format']:>12} {row['bytes']:>10} {row['decode_us']:>12.1f} {row['speedup']:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
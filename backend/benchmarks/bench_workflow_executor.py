@@ -0,0 +1,78 @@
+"""Throughput and tail latency of the workflow executor against the stub LLM.
+
+Runs entirely offline: the stub server is mounted in-process through an ASGI
+transport, so only the executor's pooling, concurrency cap and the stub's
+simulated latency are measured.
+
+    python -m benchmarks.bench_workflow_executor --requests 500 --concurrency 16 --latency-ms 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from app.services.workflow_executor import WorkflowExecutor
+from app.stub_llm import create_app
+
+WORKFLOW_INPUT = {
+    "team_id": "red",
+    "opponent_id": "blue",
+    "territory_control": {"red": 45, "blue": 55},
+    "agents": {"red": {"count": 0, "types": ""}, "blue": {"count": 0, "types": ""}},
+    "resources": {
+        "red": {"energy": 50, "materials": 30, "data": 20},
+        "blue": {"energy": 40, "materials": 35, "data": 25}
+    },
+    "resource_distribution": "data 12, energy 10, materials 8",
+    "situation": []
+}
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run(requests: int, concurrency: int, latency_ms: float, jitter_ms: float) -> dict:
+    stub = create_app(latency_ms=latency_ms, jitter_ms=jitter_ms, seed=0)
+    executor = WorkflowExecutor(
+        base_url="http://stub/v1",
+        max_concurrency=concurrency,
+        transport=httpx.ASGITransport(app=stub)
+    )
+    latencies = []
+
+    async def one_call():
+        start = time.perf_counter()
+        await executor.run("team_strategy", WORKFLOW_INPUT)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await executor.aclose()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "stub_latency_ms": latency_ms,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.mean(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.concurrency, args.latency_ms, args.jitter_ms)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Time and allocations per call of the service hot paths, gated against baselines.
+
+Each case runs at several state sizes (agents across both teams; cases that do
+not depend on the state run once). Time per call comes from ``timeit`` with an
+auto-scaled repeat count, the best of ``TIMING_REPEATS`` runs; ``peak_bytes``
+is the tracemalloc peak of a single call above what was allocated before it,
+the lowest of a few calls.
+
+``--update`` records the results as ``benchmarks/baselines.json``; ``--check``
+compares against it and exits with status 1 when a case is slower than
+``--time-tolerance`` or allocates more than ``--alloc-tolerance`` above its
+baseline. Times are compared relative to a fixed calibration workload timed in
+the same run, so a machine running uniformly slower or faster does not count,
+and cases that regress are measured once more before the check fails, so a
+drift within the run does not count either. Allocations also get
+``ALLOC_SLACK_BYTES`` of absolute slack, as small calls vary by a few interned
+objects. Timings only compare on the machine that recorded them, so
+``--alloc-only`` gates on allocations alone, which hold across machines
+running the same Python version.
+
+    python -m benchmarks.microbench --sizes 10 100 1000 --update
+    python -m benchmarks.microbench --check --time-tolerance 0.25 --alloc-tolerance 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.connections import envelope
+from app.schemas.agent_spec import AgentSpecification
+from app.schemas.game_state import GameState
+from app.services.agent_service import generate_fallback_agent
+from app.services.strategy_service import generate_fallback_strategy, normalize_team_id
+from benchmarks.bench_wire_format import make_game_state
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+ALLOC_SAMPLES = 5
+TIMING_REPEATS = 5
+ALLOC_SLACK_BYTES = 512
+
+AGENT_REQUEST = {
+    "team_id": "team1",
+    "strategy": {"strategy": "aggressive", "focus": "territory", "priorities": ["expand_territory", "attack_enemies"]},
+    "resources": {"energy": 50, "materials": 30, "data": 20},
+    "current_agents": [{"type": "collector", "count": 3}, {"type": "attacker", "count": 2}]
+}
+AGENT_SPECIFICATION = {
+    "role": "attacker",
+    "attributes": {"speed": 0.7, "health": 0.6, "attack": 0.8, "defense": 0.4, "carryCapacity": 0.3},
+    "priority": "territory",
+    "description": "Fast attacker sent to take contested territory."
+}
+TEAM_IDS = ("team1", "team2", "1", "2", "red", "blue")
+
+def _game_state_validate(size: int) -> Callable[[], Any]:
+    payload = make_game_state(size)
+    return lambda: GameState.model_validate(payload)
+
+def _game_state_serialize(size: int) -> Callable[[], Any]:
+    state = GameState.model_validate(make_game_state(size))
+    return state.model_dump_json
+
+def _fallback_strategy(size: int) -> Callable[[], Any]:
+    state = GameState.model_validate(make_game_state(size))
+    return lambda: generate_fallback_strategy(state)
+
+def _ws_round_trip(size: int) -> Callable[[], Any]:
+    # A snapshot as the frontend sends it, decoded and sent back in the outbound envelope
+    text = json.dumps({"type": "snapshot", "seq": 0, "data": make_game_state(size)})
+    return lambda: envelope("state", json.loads(text)["data"])
+
+def _agent_spec_validate(size: int) -> Callable[[], Any]:
+    return lambda: AgentSpecification.model_validate(AGENT_SPECIFICATION)
+
+def _agent_spec_serialize(size: int) -> Callable[[], Any]:
+    return AgentSpecification.model_validate(AGENT_SPECIFICATION).model_dump_json
+
+def _fallback_agent(size: int) -> Callable[[], Any]:
+    return lambda: generate_fallback_agent(AGENT_REQUEST)
+
+def _normalize_team_ids(size: int) -> Callable[[], Any]:
+    return lambda: [normalize_team_id(team_id) for team_id in TEAM_IDS]
+
+# name -> (builder taking a state size, whether the size matters)
+CASES: Dict[str, Tuple[Callable[[int], Callable[[], Any]], bool]] = {
+    "game_state_validate": (_game_state_validate, True),
+    "game_state_serialize": (_game_state_serialize, True),
+    "fallback_strategy": (_fallback_strategy, True),
+    "ws_json_round_trip": (_ws_round_trip, True),
+    "agent_spec_validate": (_agent_spec_validate, False),
+    "agent_spec_serialize": (_agent_spec_serialize, False),
+    "fallback_agent": (_fallback_agent, False),
+    "normalize_team_id": (_normalize_team_ids, False),
+}
+
+CALIBRATION_DOCUMENT = json.dumps({"agents": [{"id": index, "type": "collector", "x": index * 1.5, "y": 2.0}
+                                             for index in range(50)]})
+
+def calibration() -> None:
+    """A fixed mix of JSON decoding and interpreter work every timing is scaled against"""
+    agents = json.loads(CALIBRATION_DOCUMENT)["agents"]
+    sum(agent["x"] * agent["y"] for agent in agents if agent["type"] == "collector")
+
+def best_time_per_call(func: Callable[[], Any], min_time: float = 0.2, repeats: int = TIMING_REPEATS) -> float:
+    """Seconds per call in the fastest of several runs, each lasting about min_time / repeats"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / repeats / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeats, number=number)) / number
+
+def peak_bytes(func: Callable[[], Any], samples: int = ALLOC_SAMPLES) -> int:
+    """Lowest tracemalloc peak of one call above the memory in use before it"""
+    func()
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        if not started:
+            tracemalloc.stop()
+    return min(peaks)
+
+def run(sizes: Iterable[int], cases: Optional[Iterable[str]] = None, min_time: float = 0.5,
+        timing: bool = True) -> Dict[str, Dict[str, float]]:
+    """Results keyed by "case[size]" ("case" for cases that do not depend on the state size)"""
+    results = {}
+    if timing:
+        results["calibration"] = {"us_per_call": round(best_time_per_call(calibration, min_time) * 1e6, 3)}
+    for name in cases or CASES:
+        build, sized = CASES[name]
+        for size in (sizes if sized else [0]):
+            func = build(size)
+            result = {"peak_bytes": peak_bytes(func)}
+            if timing:
+                result["us_per_call"] = round(best_time_per_call(func, min_time) * 1e6, 3)
+            results[f"{name}[{size}]" if sized else name] = result
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]],
+            time_tolerance: float, alloc_tolerance: float) -> List[str]:
+    """Descriptions of the results that regress beyond the tolerances; cases without a baseline pass"""
+    regressions = []
+    # Baseline times rescaled to the speed this run measured on the calibration workload
+    speed = 1.0
+    if "calibration" in results and "calibration" in baselines:
+        speed = results["calibration"]["us_per_call"] / baselines["calibration"]["us_per_call"]
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None or key == "calibration":
+            continue
+        for metric, tolerance in (("us_per_call", time_tolerance), ("peak_bytes", alloc_tolerance)):
+            if metric not in result or metric not in baseline:
+                continue
+            expected = baseline[metric] * (speed if metric == "us_per_call" else 1.0)
+            limit = expected * (1.0 + tolerance) + (ALLOC_SLACK_BYTES if metric == "peak_bytes" else 0)
+            if result[metric] > limit:
+                regressions.append(f"{key} {metric}: {result[metric]:g} > {expected:g} (+{tolerance:.0%})")
+    return regressions
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
+
+def environment() -> Dict[str, str]:
+    return {"python": platform.python_version(), "machine": platform.machine()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="run only these cases")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent timing each case")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update", action="store_true", help="record the results as the baselines")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    parser.add_argument("--alloc-only", action="store_true", help="skip timing and gate on allocations only")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.cases, args.min_time, timing=not args.alloc_only)
+    if args.update:
+        with open(args.baselines, "w") as file:
+            json.dump({"environment": environment(), "results": results}, file, indent=2, sort_keys=True)
+            file.write("\n")
+    print(json.dumps(results, indent=2))
+    if not args.check:
+        return
+
+    baselines = load_baselines(args.baselines)
+    if baselines["environment"] != environment():
+        print(f"Baselines were recorded on {baselines['environment']}, not {environment()}", file=sys.stderr)
+    regressions = compare(results, baselines["results"], args.time_tolerance, args.alloc_tolerance)
+    if regressions:
+        retry = sorted({regression.split("[")[0].split(" ")[0] for regression in regressions})
+        results = run(args.sizes, retry, args.min_time, timing=not args.alloc_only)
+        regressions = compare(results, baselines["results"], args.time_tolerance, args.alloc_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Load testing harness: simulated arenas driving the REST and WebSocket APIs."""
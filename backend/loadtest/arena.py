@@ -0,0 +1,132 @@
+"""Simulated arena state for the load generator.
+
+An ``Arena`` evolves a plausible game (agents wandering around the hex map,
+territory and resources drifting, agents spawning and dying) and produces the
+payloads a real frontend would send: team strategy and agent specification
+requests, and WebSocket snapshots followed by deltas.
+"""
+import random
+from typing import Any, Dict, List, Optional
+
+TEAMS = ("red", "blue")
+AGENT_TYPES = ("collector", "explorer", "defender", "attacker")
+MAP_WIDTH = 1600
+MAP_HEIGHT = 1200
+# Pixels an agent moves per simulated second
+AGENT_SPEED = 40.0
+
+class Arena:
+    """One simulated game, driven forward with step()"""
+
+    def __init__(self, arena_id: str, agents_per_team: int = 30, seed: Optional[int] = None):
+        self.arena_id = arena_id
+        self.rng = random.Random(seed)
+        self.next_agent_id = 0
+        self.territory_control = {"red": 50.0, "blue": 50.0}
+        self.resources = {team: {"energy": 40, "materials": 40, "data": 40} for team in TEAMS}
+        self.resource_distribution = {"energy": 20, "materials": 20, "data": 20}
+        self.agents: Dict[str, Dict[int, Dict[str, Any]]] = {team: {} for team in TEAMS}
+        self.strategies: Dict[str, Dict[str, Any]] = {}
+        for team in TEAMS:
+            for _ in range(agents_per_team):
+                self.spawn(team)
+        self._sent_agents: Optional[Dict[str, Dict[int, Dict[str, Any]]]] = None
+        self._sent_header: Dict[str, Any] = {}
+        self.seq = -1
+
+    def spawn(self, team: str, agent_type: Optional[str] = None) -> None:
+        base_x = MAP_WIDTH * (0.2 if team == "red" else 0.8)
+        self.agents[team][self.next_agent_id] = {
+            "id": self.next_agent_id,
+            "type": agent_type or self.rng.choice(AGENT_TYPES),
+            "health": 100.0,
+            "x": base_x + self.rng.uniform(-100, 100),
+            "y": MAP_HEIGHT / 2 + self.rng.uniform(-100, 100)
+        }
+        self.next_agent_id += 1
+
+    def step(self, seconds: float) -> None:
+        """Advance the simulation by the given number of game seconds"""
+        rng = self.rng
+        distance = AGENT_SPEED * seconds
+        for team in TEAMS:
+            for agent_id, agent in list(self.agents[team].items()):
+                agent["x"] = min(MAP_WIDTH, max(0.0, agent["x"] + rng.uniform(-distance, distance)))
+                agent["y"] = min(MAP_HEIGHT, max(0.0, agent["y"] + rng.uniform(-distance, distance)))
+                if rng.random() < 0.02 * seconds:
+                    agent["health"] = max(0.0, agent["health"] - rng.uniform(10, 40))
+                    if agent["health"] == 0.0:
+                        del self.agents[team][agent_id]
+            for name in self.resources[team]:
+                self.resources[team][name] = max(0, self.resources[team][name] + rng.randint(-2, 4))
+
+        shift = rng.uniform(-1.0, 1.0) * seconds
+        red = min(90.0, max(10.0, self.territory_control["red"] + shift))
+        self.territory_control = {"red": round(red, 1), "blue": round(100.0 - red, 1)}
+
+    def team_strategy_request(self, team: str) -> Dict[str, Any]:
+        return {
+            "team_id": team,
+            "territory_control": dict(self.territory_control),
+            "resources": {name: dict(values) for name, values in self.resources.items()},
+            "agents": {name: [dict(agent) for agent in agents.values()] for name, agents in self.agents.items()},
+            "resource_distribution": dict(self.resource_distribution)
+        }
+
+    def agent_specification_request(self, team: str) -> Dict[str, Any]:
+        composition: Dict[str, int] = {}
+        for agent in self.agents[team].values():
+            composition[agent["type"]] = composition.get(agent["type"], 0) + 1
+        return {
+            "team_id": team,
+            "strategy": self.strategies.get(team, {"strategy": "balanced", "focus": "resources", "priorities": []}),
+            "resources": dict(self.resources[team]),
+            "current_agents": [{"type": agent_type, "count": count} for agent_type, count in composition.items()]
+        }
+
+    def apply_agent(self, team: str, specification: Dict[str, Any]) -> None:
+        """Spend resources and spawn the agent the backend specified"""
+        for name in self.resources[team]:
+            self.resources[team][name] = max(0, self.resources[team][name] - 10)
+        self.spawn(team, specification.get("role"))
+
+    def ws_message(self, resync: bool = False) -> Dict[str, Any]:
+        """The next WebSocket message: a snapshot first (or after a resync), then deltas"""
+        self.seq += 1
+        header = {
+            "territory_control": dict(self.territory_control),
+            "resources": {name: dict(values) for name, values in self.resources.items()},
+            "resource_distribution": dict(self.resource_distribution)
+        }
+        agents = {team: {agent_id: dict(agent) for agent_id, agent in team_agents.items()}
+                  for team, team_agents in self.agents.items()}
+
+        if resync or self._sent_agents is None:
+            self.seq = 0
+            message = {"type": "snapshot", "seq": self.seq, "data": {
+                **header,
+                "agents": {team: list(team_agents.values()) for team, team_agents in agents.items()}
+            }}
+        else:
+            data: Dict[str, Any] = {key: value for key, value in header.items() if value != self._sent_header.get(key)}
+            changes = {}
+            for team, team_agents in agents.items():
+                previous = self._sent_agents.get(team, {})
+                upsert = [agent for agent_id, agent in team_agents.items() if previous.get(agent_id) != agent]
+                remove = [agent_id for agent_id in previous if agent_id not in team_agents]
+                if upsert or remove:
+                    changes[team] = {"upsert": upsert, "remove": remove}
+            if changes:
+                data["agents"] = changes
+            message = {"type": "delta", "seq": self.seq, "data": data}
+
+        self._sent_header = header
+        self._sent_agents = agents
+        return message
+
+    def agent_count(self) -> int:
+        return sum(len(agents) for agents in self.agents.values())
+
+def agent_counts(arenas: List[Arena]) -> Dict[str, float]:
+    counts = [arena.agent_count() for arena in arenas]
+    return {"min": min(counts), "max": max(counts), "mean": sum(counts) / len(counts)} if counts else {}
@@ -0,0 +1,356 @@
+"""End-to-end load generator for the REST and WebSocket APIs.
+
+Simulates N arenas against one backend. Like the frontend, each arena:
+
+- streams its game state over ``/ws/{arena_id}`` every game second (a snapshot, then deltas),
+- requests a strategy per team every 30 game seconds (``/api/team-strategy``),
+- requests an agent per team every 15 game seconds (``/api/agent-specification``).
+
+``--speedup`` compresses game time, so ``--speedup 10`` sends ten WebSocket
+updates and a strategy request per team every 3 s per arena. The report lists
+throughput, p50/p95/p99 latency and error rates per operation as JSON.
+
+Runs offline: unless ``--url`` points at a running backend, the backend is
+started as a subprocess in mock mode. With ``--stub-latency-ms`` it uses the
+real workflow path against the stub LLM server (``app.stub_llm``) instead.
+
+    python -m loadtest.harness --arenas 50 --duration 60 --speedup 10 --output loadtest.json
+    python -m loadtest.harness --arenas 20 --stub-latency-ms 1500 --stub-jitter-ms 500
+    python -m loadtest.harness --url http://localhost:8000 --arenas 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+from .arena import Arena, agent_counts
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Frontend cadences in game seconds (TeamStrategySystem, SpawnScheduler, LLMSystem)
+STRATEGY_INTERVAL = 30.0
+SPAWN_INTERVAL = 15.0
+STATE_INTERVAL = 1.0
+
+@dataclass
+class LoadConfig:
+    arenas: int = 10
+    duration: float = 30.0
+    speedup: float = 10.0
+    agents_per_team: int = 30
+    deadline_ms: float = 8000.0
+    # Arenas sending X-Arena-Priority: background (admitted after interactive ones)
+    background_arenas: int = 0
+    request_timeout: float = 30.0
+    websocket: bool = True
+    url: Optional[str] = None
+    stub_latency_ms: Optional[float] = None
+    stub_jitter_ms: float = 0.0
+    stub_error_rate: float = 0.0
+    seed: int = 0
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+class Recorder:
+    """Latencies, errors and event counts per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: Dict[str, List[str]] = {}
+        self.events: Dict[str, int] = {}
+
+    def record(self, operation: str, seconds: float, error: Optional[str] = None) -> None:
+        self.latencies.setdefault(operation, []).append(seconds * 1000.0)
+        if error is not None:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+            samples = self.error_samples.setdefault(operation, [])
+            if len(samples) < 5:
+                samples.append(error)
+
+    def count(self, event: str) -> None:
+        self.events[event] = self.events.get(event, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        operations = {}
+        for operation, latencies in sorted(self.latencies.items()):
+            errors = self.errors.get(operation, 0)
+            operations[operation] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": errors / len(latencies),
+                "throughput_rps": len(latencies) / elapsed,
+                "latency_ms": {
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "mean": sum(latencies) / len(latencies),
+                    "max": max(latencies)
+                },
+                "error_samples": self.error_samples.get(operation, [])
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        total_errors = sum(self.errors.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "total_requests": total,
+            "total_errors": total_errors,
+            "error_rate": total_errors / total if total else 0.0,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "operations": operations,
+            "events": dict(sorted(self.events.items()))
+        }
+
+class ArenaDriver:
+    """Drives one simulated arena against the backend until the stop time"""
+
+    def __init__(self, arena: Arena, client: httpx.AsyncClient, ws_url: Optional[str],
+                 recorder: Recorder, config: LoadConfig, background: bool = False):
+        self.arena = arena
+        self.client = client
+        self.ws_url = ws_url
+        self.recorder = recorder
+        self.config = config
+        self.headers = {
+            "X-Client-Deadline-Ms": str(config.deadline_ms),
+            "X-Client-Id": arena.arena_id,
+            "X-Arena-Priority": "background" if background else "interactive"
+        }
+        self.resync = False
+        self.pending: set = set()
+
+    async def run(self, stop_at: float) -> None:
+        scale = 1.0 / self.config.speedup
+        # Arenas start at random points of their cycles, like independent browsers
+        offset = self.arena.rng.uniform(0, SPAWN_INTERVAL)
+        next_strategy = {team: time.monotonic() + (offset + i * 0.5) * scale for i, team in enumerate(("red", "blue"))}
+        next_spawn = {team: time.monotonic() + (offset / 2 + i * 0.5) * scale for i, team in enumerate(("red", "blue"))}
+
+        async with AsyncExitStack() as stack:
+            socket_connection = await self._connect(stack) if self.ws_url else None
+            next_state = time.monotonic()
+            while time.monotonic() < stop_at:
+                now = time.monotonic()
+                for team in ("red", "blue"):
+                    if now >= next_strategy[team]:
+                        next_strategy[team] += STRATEGY_INTERVAL * scale
+                        self._spawn_task(self.request_strategy(team))
+                    if now >= next_spawn[team]:
+                        next_spawn[team] += SPAWN_INTERVAL * scale
+                        self._spawn_task(self.request_agent(team))
+                if now >= next_state:
+                    next_state += STATE_INTERVAL * scale
+                    self.arena.step(STATE_INTERVAL)
+                    if socket_connection is not None:
+                        await self.send_state(socket_connection)
+                await asyncio.sleep(max(0.0, min(next_state, *next_strategy.values(), *next_spawn.values()) - time.monotonic()))
+
+            if self.pending:
+                await asyncio.wait(self.pending, timeout=self.config.request_timeout)
+
+    def _spawn_task(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _connect(self, stack: AsyncExitStack):
+        start = time.perf_counter()
+        try:
+            connection = await stack.enter_async_context(
+                websockets.connect(f"{self.ws_url}/ws/{self.arena.arena_id}", max_size=None)
+            )
+        except Exception as e:
+            self.recorder.record("ws_connect", time.perf_counter() - start, repr(e))
+            return None
+        self.recorder.record("ws_connect", time.perf_counter() - start)
+        reader = asyncio.ensure_future(self.read_messages(connection))
+        stack.callback(reader.cancel)
+        return connection
+
+    async def send_state(self, connection) -> None:
+        message = self.arena.ws_message(resync=self.resync)
+        self.resync = False
+        start = time.perf_counter()
+        try:
+            await connection.send(json.dumps(message))
+            self.recorder.record("ws_send", time.perf_counter() - start)
+        except Exception as e:
+            self.recorder.record("ws_send", time.perf_counter() - start, repr(e))
+
+    async def read_messages(self, connection) -> None:
+        try:
+            async for raw in connection:
+                message = json.loads(raw)
+                message_type = message.get("type", "unknown")
+                self.recorder.count(f"ws_received_{message_type}")
+                data = message.get("data", {})
+                if message_type == "resync":
+                    self.resync = True
+                elif message_type == "directive" and "strategy" in data:
+                    self.arena.strategies[data["team"]] = data["strategy"]
+        except websockets.ConnectionClosed:
+            self.recorder.count("ws_closed")
+
+    async def request_strategy(self, team: str) -> None:
+        response = await self._post("team_strategy", "/api/team-strategy", self.arena.team_strategy_request(team))
+        if response is not None:
+            self.arena.strategies[team] = response
+
+    async def request_agent(self, team: str) -> None:
+        response = await self._post("agent_specification", "/api/agent-specification",
+                                    self.arena.agent_specification_request(team))
+        if response is not None:
+            self.arena.apply_agent(team, response)
+
+    async def _post(self, operation: str, path: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=body, headers=self.headers)
+        except Exception as e:
+            self.recorder.record(operation, time.perf_counter() - start, repr(e))
+            return None
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            self.recorder.record(operation, elapsed, f"HTTP {response.status_code}")
+            return None
+        self.recorder.record(operation, elapsed)
+        return response.json()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+async def wait_until_ready(url: str, path: str = "/", timeout: float = 30.0, method: str = "GET") -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.request(method, path)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start within {timeout:.0f}s")
+
+async def start_servers(config: LoadConfig, processes: List[subprocess.Popen]) -> str:
+    """Start the stub LLM (if requested) and the backend; return the backend URL"""
+    env = {"USE_MOCK_RESPONSES": "true"}
+    if config.stub_latency_ms is not None:
+        stub_port = free_port()
+        processes.append(start_process([
+            "-m", "app.stub_llm", "--port", str(stub_port),
+            "--latency-ms", str(config.stub_latency_ms),
+            "--jitter-ms", str(config.stub_jitter_ms),
+            "--error-rate", str(config.stub_error_rate)
+        ], {}))
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        await wait_until_ready(stub_url, "/v1/chat/completions", method="GET")
+        env = {"USE_MOCK_RESPONSES": "false", "LLM_BASE_URL": f"{stub_url}/v1", "OPENAI_API_KEY": "stub"}
+
+    port = free_port()
+    processes.append(start_process(
+        ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env
+    ))
+    url = f"http://127.0.0.1:{port}"
+    await wait_until_ready(url)
+    return url
+
+async def run_load(config: LoadConfig) -> Dict[str, Any]:
+    """Run the configured load and return the report"""
+    processes: List[subprocess.Popen] = []
+    try:
+        url = config.url or await start_servers(config, processes)
+        ws_url = url.replace("http", "ws", 1) if config.websocket else None
+        rng = random.Random(config.seed)
+        arenas = [
+            Arena(f"arena-{index}", config.agents_per_team, seed=rng.randrange(1 << 30))
+            for index in range(config.arenas)
+        ]
+        recorder = Recorder()
+        limits = httpx.Limits(max_connections=config.arenas * 4, max_keepalive_connections=config.arenas * 4)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=config.request_timeout) as client:
+            start = time.monotonic()
+            stop_at = start + config.duration
+            await asyncio.gather(*(
+                ArenaDriver(arena, client, ws_url, recorder, config, index < config.background_arenas).run(stop_at)
+                for index, arena in enumerate(arenas)
+            ))
+            elapsed = time.monotonic() - start
+
+        report = recorder.report(elapsed)
+        report["config"] = {**asdict(config), "url": url}
+        report["agents_per_arena"] = agent_counts(arenas)
+        return report
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate arenas against the backend and report latency")
+    parser.add_argument("--arenas", type=int, default=10, help="number of simulated arenas")
+    parser.add_argument("--duration", type=float, default=30.0, help="wall-clock run time in seconds")
+    parser.add_argument("--speedup", type=float, default=10.0, help="game seconds per wall-clock second")
+    parser.add_argument("--agents", type=int, default=30, help="initial agents per team")
+    parser.add_argument("--deadline-ms", type=float, default=8000.0, help="X-Client-Deadline-Ms sent with requests")
+    parser.add_argument("--background-arenas", type=int, default=0, help="arenas sent at background priority")
+    parser.add_argument("--no-websocket", action="store_true", help="only drive the REST endpoints")
+    parser.add_argument("--url", help="target an already running backend instead of starting one")
+    parser.add_argument("--stub-latency-ms", type=float, help="run the workflows against the stub LLM with this latency")
+    parser.add_argument("--stub-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    config = LoadConfig(
+        arenas=args.arenas,
+        duration=args.duration,
+        speedup=args.speedup,
+        agents_per_team=args.agents,
+        deadline_ms=args.deadline_ms,
+        background_arenas=args.background_arenas,
+        websocket=not args.no_websocket,
+        url=args.url,
+        stub_latency_ms=args.stub_latency_ms,
+        stub_jitter_ms=args.stub_jitter_ms,
+        stub_error_rate=args.stub_error_rate,
+        seed=args.seed
+    )
+    report = json.dumps(asyncio.run(run_load(config)), indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import dataclasses
+
+import pytest
+
+from app import config
+
+@pytest.fixture
+def override_settings(monkeypatch):
+    """Replace application settings for the duration of a test"""
+    def override(**changes):
+        monkeypatch.setattr(config, "_settings", dataclasses.replace(config.get_settings(), **changes))
+    return override
@@ -0,0 +1,126 @@
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.game_state import GameState, Resource
+from app.services import strategy_service
+from app.services.admission import AdmissionController, AdmissionRejected, arena_priority
+from app.services.workflow_executor import WorkflowExecutor, set_executor
+
+client = TestClient(app)
+
+def controller(**kwargs):
+    kwargs.setdefault("budgets", {"interactive": 1.0, "background": 1.0})
+    return AdmissionController(**kwargs)
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_in_priority_order():
+    """Test interactive before background and strategy before agent once a slot frees up"""
+    admission = controller(concurrency=1)
+    await admission.acquire("agent", "background")
+    admitted = []
+
+    async def wait(kind, arena):
+        await admission.acquire(kind, arena)
+        admitted.append(f"{arena}.{kind}")
+
+    tasks = [asyncio.ensure_future(wait(kind, arena)) for kind, arena in [
+        ("agent", "background"), ("agent", "interactive"), ("strategy", "background"), ("strategy", "interactive")
+    ]]
+    await asyncio.sleep(0)
+    for _ in tasks:
+        admission.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert admitted == ["interactive.strategy", "interactive.agent", "background.strategy", "background.agent"]
+
+@pytest.mark.asyncio
+async def test_full_queue_is_shed():
+    """Test a request is shed at once when its class queue is full"""
+    admission = controller(concurrency=1, queue_limit=1)
+    await admission.acquire("strategy", "interactive")
+    waiting = asyncio.ensure_future(admission.acquire("strategy", "interactive"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("strategy", "interactive")
+    assert rejected.value.reason == "queue_full"
+    # Other classes have their own queues
+    other = asyncio.ensure_future(admission.acquire("agent", "interactive"))
+    await asyncio.sleep(0)
+    admission.release()
+    await waiting
+    other.cancel()
+
+@pytest.mark.asyncio
+async def test_queue_budget_and_predicted_wait_shed():
+    """Test requests are shed after waiting out their budget, or up front if the wait is predicted to exceed it"""
+    admission = controller(concurrency=1, budgets={"interactive": 0.02, "background": 0.02})
+    await admission.acquire("strategy", "interactive")
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("strategy", "interactive")
+    assert rejected.value.reason == "queue_timeout"
+    assert admission.stats()["queued"]["interactive.strategy"] == 0
+
+    admission.run_seconds = 5.0
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("strategy", "interactive")
+    assert rejected.value.reason == "predicted_wait"
+
+    # The timed out waiter does not hold up the next request once the slot is free
+    admission.release()
+    await asyncio.wait_for(admission.acquire("agent", "interactive"), 0.5)
+    assert admission.in_flight == 1
+
+@pytest.mark.asyncio
+async def test_overloaded_service_degrades_to_fallback(monkeypatch, override_settings):
+    """Test a shed strategy request answers with the fallback without calling the LLM"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    admission = controller(concurrency=1, queue_limit=0)
+    await admission.acquire("strategy", "interactive")
+    monkeypatch.setattr(strategy_service, "admission", admission)
+
+    def handler(request):
+        raise AssertionError("the LLM must not be called")
+
+    game_state = GameState(
+        team_id="red",
+        territory_control={"red": 45, "blue": 55},
+        resources={"red": Resource(energy=1, materials=2, data=3), "blue": Resource(energy=1, materials=2, data=3)},
+        agents={"red": [], "blue": []},
+        resource_distribution={}
+    )
+    set_executor(WorkflowExecutor(base_url="http://llm", transport=httpx.MockTransport(handler)))
+    try:
+        strategy = await strategy_service.generate_team_strategy(game_state)
+    finally:
+        set_executor(None)
+    assert strategy == strategy_service.generate_fallback_strategy(game_state)
+    assert admission.stats()["shed"] == {"queue_full": 1}
+
+def test_arena_priority_header(override_settings):
+    """Test X-Arena-Priority sets the priority the request's workflow runs are admitted at"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    seen = []
+
+    def handler(request):
+        seen.append(arena_priority.get())
+        content = '{"strategy": "balanced", "focus": "resources", "priorities": [], "description": "x"}'
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    payload = {
+        "team_id": "red",
+        "territory_control": {"red": 45, "blue": 55},
+        "resources": {"red": {"energy": 1, "materials": 2, "data": 3}, "blue": {"energy": 1, "materials": 2, "data": 3}},
+        "agents": {"red": [], "blue": []},
+        "resource_distribution": {}
+    }
+    set_executor(WorkflowExecutor(base_url="http://llm", transport=httpx.MockTransport(handler)))
+    try:
+        assert client.post("/api/team-strategy", json=payload, headers={"X-Arena-Priority": "background"}).status_code == 200
+        payload["territory_control"] = {"red": 10, "blue": 90}
+        assert client.post("/api/team-strategy", json=payload).status_code == 200
+    finally:
+        set_executor(None)
+    assert seen == ["background", "interactive"]
+    assert client.get("/admission/stats").json()["in_flight"] == 0
@@ -83,4 +83,33 @@ def test_agent_specification():
     
     # Validate attribute sum
     attr_sum = sum(attributes.values())
-    assert attr_sum <= 3.0
\ No newline at end of file
+    assert attr_sum <= 3.0
+
+def test_team_strategy_batch():
+    """Test the batch team strategy endpoint preserves order"""
+    def make_state(team_id, red, blue):
+        return {
+            "team_id": team_id,
+            "territory_control": {"red": red, "blue": blue},
+            "resources": {
+                "red": {"energy": 50, "materials": 30, "data": 20},
+                "blue": {"energy": 40, "materials": 35, "data": 25}
+            },
+            "agents": {
+                "red": [{"id": 1, "type": "collector", "health": 100, "x": 100, "y": 100}],
+                "blue": [{"id": 2, "type": "explorer", "health": 90, "x": 200, "y": 200}]
+            },
+            "resource_distribution": {"energy": 10, "materials": 8, "data": 12}
+        }
+    
+    batch = [make_state("red", 20, 60), make_state("blue", 20, 60), make_state("team1", 45, 50)]
+    response = client.post("/api/team-strategy/batch", json=batch)
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert [item["strategy"] for item in data] == ["aggressive", "defensive", "balanced"]
+
+def test_team_strategy_batch_rejects_invalid_item():
+    """Test that one malformed game state fails validation for the batch"""
+    response = client.post("/api/team-strategy/batch", json=[{"team_id": "red"}])
+    assert response.status_code == 422
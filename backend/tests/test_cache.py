@@ -0,0 +1,114 @@
+from app.schemas.game_state import GameState, Resource, Agent, Position
+from app.services.cache import (
+    STRATEGY_INTERVAL_SECONDS, QuantizedCache, QuantizationConfig, agent_cache_key, strategy_cache, strategy_cache_key
+)
+from app.schemas.strategy import TeamStrategy
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_state(red_territory, red_energy, red_agents):
+    return GameState(
+        team_id="red",
+        territory_control={"red": red_territory, "blue": 100 - red_territory},
+        resources={
+            "red": Resource(energy=red_energy, materials=30, data=20),
+            "blue": Resource(energy=40, materials=35, data=25)
+        },
+        agents={
+            "red": [Agent(id=i, type="collector", health=100, x=0, y=0) for i in range(red_agents)],
+            "blue": []
+        },
+        resource_distribution={"energy": 10}
+    )
+
+def test_strategy_key_buckets_similar_states():
+    """Test that nearby states share a key and distant ones do not"""
+    config = QuantizationConfig(territory_bucket=5, resource_bucket=25, agent_bucket=2)
+    base = strategy_cache_key(make_state(41, 51, 4), "red", config)
+    assert strategy_cache_key(make_state(43, 60, 5), "red", config) == base
+    assert strategy_cache_key(make_state(46, 51, 4), "red", config) != base
+    assert strategy_cache_key(make_state(41, 80, 4), "red", config) != base
+    assert strategy_cache_key(make_state(41, 51, 6), "red", config) != base
+
+def test_strategy_key_tells_spatial_situations_apart():
+    """Test states alike in counts but not in base threats or frontline get different keys"""
+    config = QuantizationConfig()
+
+    def positioned(blue_x):
+        state = make_state(45, 50, 3)
+        state.agents["blue"] = [Agent(id=10 + i, type="attacker", health=100, x=x, y=0) for i, x in enumerate(blue_x)]
+        state.bases = {"red": Position(x=0, y=0), "blue": Position(x=3000, y=0)}
+        return strategy_cache_key(state, "red", config)
+
+    far = positioned([1500, 1510, 1520])
+    assert positioned([1502, 1512, 1522]) == far
+    assert positioned([10, 20, 1520]) != far
+    assert positioned([900, 910, 920]) != far
+
+def test_agent_key_ignores_small_resource_changes():
+    """Test agent keys bucket resources and composition counts"""
+    config = QuantizationConfig()
+    request = {
+        "team_id": "blue",
+        "strategy": {"strategy": "defensive", "focus": "resources", "priorities": ["collect_energy"]},
+        "resources": {"energy": 40, "materials": 35, "data": 25},
+        "current_agents": [{"type": "collector", "count": 3}]
+    }
+    nudged = dict(request, resources={"energy": 45, "materials": 30, "data": 26})
+    changed_strategy = dict(request, strategy={"strategy": "aggressive", "focus": "territory"})
+    assert agent_cache_key(request, "blue", config) == agent_cache_key(nudged, "blue", config)
+    assert agent_cache_key(request, "blue", config) != agent_cache_key(changed_strategy, "blue", config)
+
+def test_cache_ttl_and_stats():
+    """Test entries expire after the TTL and lookups are counted"""
+    clock = FakeClock()
+    cache = QuantizedCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    clock.now = 6
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+
+def test_cache_lru_eviction():
+    """Test the least recently used entry is evicted first"""
+    cache = QuantizedCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_byte_bound():
+    """Test the approximate memory bound evicts entries"""
+    strategy = TeamStrategy(strategy="balanced", focus="resources", priorities=["collect_energy"], description="x" * 200)
+    cache = QuantizedCache(max_entries=100, max_bytes=1500, ttl_seconds=60)
+    for i in range(10):
+        cache.set(i, strategy)
+    stats = cache.stats()
+    assert stats["bytes"] <= 1500
+    assert stats["entries"] < 10
+    assert stats["evictions"] == 10 - stats["entries"]
+
+def test_strategy_results_survive_one_strategy_tick():
+    """Test a cached strategy still serves the request one cadence later, but not two"""
+    clock = FakeClock()
+    cache = QuantizedCache(ttl_seconds=strategy_cache.local.ttl_seconds, clock=clock)
+    cache.set("key", "strategy")
+    clock.now = STRATEGY_INTERVAL_SECONDS + 2
+    assert cache.get("key") == "strategy"
+    clock.now = 2 * STRATEGY_INTERVAL_SECONDS
+    assert cache.get("key") is None
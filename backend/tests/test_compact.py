@@ -0,0 +1,145 @@
+import json
+import msgpack
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.compact import (
+    MAX_CODED_TYPES,
+    MSGPACK_CONTENT_TYPE,
+    PACKED_CONTENT_TYPE,
+    PACKED_MAGIC,
+    PACKED_PREFIX,
+    PACKED_VERSION,
+    CompactFormatError,
+    CompactGameState,
+    decode_msgpack,
+    decode_packed,
+    encode_msgpack,
+    encode_packed
+)
+from app.schemas.game_state import GameState
+
+client = TestClient(app)
+
+GAME_STATE = {
+    "team_id": "red",
+    "territory_control": {"red": 20, "blue": 60},
+    "resources": {
+        "red": {"energy": 50, "materials": 30, "data": 20},
+        "blue": {"energy": 40, "materials": 35, "data": 25}
+    },
+    "agents": {
+        "red": [
+            {"id": 1, "type": "collector", "health": 100, "x": 100.5, "y": 100},
+            {"id": 3, "type": "attacker", "health": 75, "x": 10, "y": 20}
+        ],
+        "blue": [{"id": 2, "type": "explorer", "health": 90, "x": 200, "y": 200}]
+    },
+    "resource_distribution": {"energy": 10, "materials": 8, "data": 12}
+}
+
+@pytest.mark.parametrize("encode, decode", [(encode_msgpack, decode_msgpack), (encode_packed, decode_packed)])
+def test_round_trip(encode, decode):
+    """Test both compact encodings reproduce the original game state"""
+    state = CompactGameState.from_game_state(GameState(**GAME_STATE))
+    decoded = decode(encode(state))
+    
+    assert decoded.to_game_state() == GameState(**GAME_STATE)
+    assert decoded.agents["red"].type_counts() == {"attacker": 1, "collector": 1}
+    assert decoded.agents["red"].x.dtype == np.float32
+
+def test_msgpack_accepts_list_columns():
+    """Test columns may be plain lists with type names"""
+    payload = dict(GAME_STATE, agents={"red": {"ids": [1, 2], "types": ["a", "b"], "health": [1, 2], "x": [0, 0], "y": [0, 0]}})
+    state = decode_msgpack(msgpack.packb(payload))
+    assert state.agents["red"].types().tolist() == ["a", "b"]
+
+def test_packed_rejects_truncated_payload():
+    """Test truncated packed payloads raise a format error"""
+    body = encode_packed(CompactGameState.from_game_state(GameState(**GAME_STATE)))
+    with pytest.raises(CompactFormatError):
+        decode_packed(body[:-8])
+
+@pytest.mark.parametrize("header", [
+    [1, 2],
+    {"teams": [["red"]]},
+    {"teams": [["red", "2"]]},
+    {"teams": [["red", -1]]},
+    {"teams": {"red": 2}},
+    {"teams": [["red", 0]], "type_tables": {"red": "collector"}}
+])
+def test_packed_rejects_malformed_headers(header):
+    """Test malformed packed headers are a 400, not a server error"""
+    header_bytes = json.dumps(header).encode("utf-8")
+    body = PACKED_PREFIX.pack(PACKED_MAGIC, PACKED_VERSION, len(header_bytes)) + header_bytes
+    with pytest.raises(CompactFormatError):
+        decode_packed(body)
+    response = client.post("/api/team-strategy", content=body, headers={"content-type": PACKED_CONTENT_TYPE})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("columns", [
+    {"ids": [2 ** 40]},
+    {"ids": [2 ** 64 - 1]},
+    {"ids": [-2 ** 40]},
+    {"type_codes": [-1], "type_table": ["collector"]},
+    {"type_codes": [300], "type_table": ["collector"]}
+])
+def test_out_of_range_list_columns_are_rejected(columns):
+    """Test list columns outside their integer dtype are a 400 rather than wrapping or a server error"""
+    columns = dict({"ids": [1], "type_codes": [0], "type_table": ["collector"], "health": [1], "x": [0], "y": [0]},
+                   **columns)
+    body = msgpack.packb(dict(GAME_STATE, agents={"red": columns}))
+    with pytest.raises(CompactFormatError):
+        decode_msgpack(body)
+    response = client.post("/api/team-strategy", content=body, headers={"content-type": MSGPACK_CONTENT_TYPE})
+    assert response.status_code == 400
+
+def test_type_codes_do_not_wrap():
+    """Test more agent types than uint8 codes hold keep their types, and the binary encoders refuse them"""
+    agents = [{"id": index, "type": f"type{index}", "health": 100, "x": 0, "y": 0} for index in range(MAX_CODED_TYPES + 44)]
+    state = CompactGameState.from_game_state(GameState(**dict(GAME_STATE, agents={"red": agents, "blue": []})))
+    assert state.agents["red"].types().tolist() == [agent["type"] for agent in agents]
+    for encode in (encode_msgpack, encode_packed):
+        with pytest.raises(CompactFormatError):
+            encode(state)
+
+def test_team_strategy_with_msgpack():
+    """Test the REST endpoint negotiates MessagePack in both directions"""
+    body = encode_msgpack(CompactGameState.from_game_state(GameState(**GAME_STATE)))
+    response = client.post(
+        "/api/team-strategy",
+        content=body,
+        headers={"content-type": MSGPACK_CONTENT_TYPE, "accept": MSGPACK_CONTENT_TYPE}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK_CONTENT_TYPE
+    assert msgpack.unpackb(response.content)["strategy"] == "aggressive"
+
+def test_team_strategy_with_packed_body():
+    """Test the packed format is accepted and JSON is returned by default"""
+    body = encode_packed(CompactGameState.from_game_state(GameState(**GAME_STATE)))
+    response = client.post("/api/team-strategy", content=body, headers={"content-type": PACKED_CONTENT_TYPE})
+    assert response.status_code == 200
+    assert response.json()["strategy"] == "aggressive"
+    
+    response = client.post("/api/team-strategy", content=b"junk", headers={"content-type": PACKED_CONTENT_TYPE})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/octet-stream"])
+def test_undecodable_json_body_is_rejected(content_type):
+    """Test a body that is not UTF-8 is a 400 and malformed JSON a 422, as FastAPI answers them"""
+    response = client.post("/api/team-strategy", content=b"\xff", headers={"content-type": content_type})
+    assert response.status_code == 400
+    response = client.post("/api/team-strategy", content=b"{bad", headers={"content-type": content_type})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+
+def test_websocket_packed_snapshot():
+    """Test a binary packed snapshot is applied on the WebSocket"""
+    body = encode_packed(CompactGameState.from_game_state(GameState(**GAME_STATE)))
+    with client.websocket_connect("/ws/compact-client") as websocket:
+        websocket.send_bytes(body)
+        first = json.loads(websocket.receive_text())
+        assert first["type"] == "directive"
+        assert first["data"]["strategy"]["strategy"] == "aggressive"
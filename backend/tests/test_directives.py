@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.strategy import TeamStrategy
+from app.services import directive_service
+from app.services.directive_service import GameSession, sessions
+
+SNAPSHOT = {
+    "territoryControl": {"red": 45, "blue": 50},
+    "resources": {
+        "red": {"energy": 5, "materials": 5, "data": 5},
+        "blue": {"energy": 5, "materials": 5, "data": 5}
+    },
+    "agents": {
+        "red": [{"id": 1, "type": "collector", "health": 100, "x": 10, "y": 10}],
+        "blue": [{"id": 2, "role": "explorer", "health": 90, "x": 200, "y": 200}]
+    },
+    "resourcesOnMap": {"energy": 10, "materials": 8, "data": 12, "total": 30}
+}
+
+@pytest.mark.asyncio
+async def test_snapshot_emits_initial_directives():
+    """Test the first snapshot produces a strategy directive for each team"""
+    session = GameSession("client")
+    replies = await session.handle({"type": "snapshot", "seq": 0, "data": SNAPSHOT})
+    assert [(kind, data["team"]) for kind, data in replies] == [("directive", "red"), ("directive", "blue")]
+    assert session.agents["blue"][2]["type"] == "explorer"
+    assert session.resource_distribution["total"] == 30
+
+@pytest.mark.asyncio
+async def test_deltas_apply_incrementally():
+    """Test deltas upsert, patch and remove agents without a full resend"""
+    session = GameSession("client")
+    await session.handle({"type": "snapshot", "seq": 0, "data": SNAPSHOT})
+    replies = await session.handle({"type": "delta", "seq": 1, "data": {
+        "agents": {
+            "red": {"upsert": [{"id": 1, "x": 15}, {"id": 3, "type": "attacker", "health": 80, "x": 0, "y": 0}]},
+            "blue": {"remove": [2]}
+        },
+        "territoryControl": {"red": 46}
+    }})
+    assert replies == []
+    assert session.agents["red"][1] == {"id": 1, "type": "collector", "health": 100, "x": 15, "y": 10}
+    assert set(session.agents["red"]) == {1, 3}
+    assert session.agents["blue"] == {}
+    assert session.territory_control == {"red": 46, "blue": 50}
+
+@pytest.mark.asyncio
+async def test_directives_only_on_threshold_change():
+    """Test strategy and spawn directives fire when their thresholds change"""
+    session = GameSession("client")
+    await session.handle({"type": "snapshot", "seq": 0, "data": SNAPSHOT})
+    
+    replies = await session.handle({"type": "delta", "seq": 1, "data": {"territoryControl": {"red": 20, "blue": 70}}})
+    assert replies[0][0] == "directive"
+    assert replies[0][1]["team"] == "red"
+    assert replies[0][1]["strategy"]["strategy"] == "aggressive"
+    
+    replies = await session.handle({"type": "delta", "seq": 2, "data": {"resources": {"red": {"energy": 30, "materials": 20, "data": 10}}}})
+    assert [(kind, data["team"]) for kind, data in replies] == [("agent_recommendation", "red")]
+    
+    replies = await session.handle({"type": "delta", "seq": 3, "data": {"resources": {"red": {"energy": 31}}}})
+    assert replies == []
+
+@pytest.mark.asyncio
+async def test_resync_on_sequence_gap():
+    """Test a missing delta asks the client for a fresh snapshot"""
+    session = GameSession("client")
+    assert (await session.handle({"type": "delta", "seq": 1, "data": {}}))[0][0] == "resync"
+    
+    await session.handle({"type": "snapshot", "seq": 5, "data": SNAPSHOT})
+    replies = await session.handle({"type": "delta", "seq": 7, "data": {}})
+    assert replies == [("resync", {"reason": "sequence gap", "expected_seq": 6})]
+
+@pytest.mark.asyncio
+async def test_slow_directives_are_pushed_when_ready(monkeypatch):
+    """Test a slow strategy does not hold up the reply, and one superseded by a newer state is dropped"""
+    async def slow_strategy(game_state):
+        await asyncio.sleep(0.2)
+        return TeamStrategy(strategy="balanced", focus="resources", priorities=[],
+                            description=str(game_state.territory_control[game_state.team_id]))
+
+    monkeypatch.setattr(directive_service, "generate_team_strategy", slow_strategy)
+    pushed = []
+
+    async def push(messages):
+        pushed.extend(messages)
+
+    session = GameSession("client")
+    session.push = push
+    started = time.perf_counter()
+    assert await session.handle({"type": "snapshot", "seq": 0, "data": SNAPSHOT}) == []
+    # Red falls behind before its first strategy is ready
+    assert await session.handle({"type": "delta", "seq": 1, "data": {"territoryControl": {"red": 20}}}) == []
+    assert time.perf_counter() - started < 0.2
+
+    await asyncio.sleep(0.3)
+    assert sorted((data["team"], data["strategy"]["description"]) for _, data in pushed) == [("blue", "50.0"), ("red", "20.0")]
+    assert session.strategies["red"]["description"] == "20.0"
+
+def test_websocket_directive_channel():
+    """Test the WebSocket endpoint applies state and replies with directives"""
+    client = TestClient(app)
+    with client.websocket_connect("/ws/test-client") as websocket:
+        websocket.send_text(json.dumps({"type": "snapshot", "seq": 0, "data": SNAPSHOT}))
+        first = json.loads(websocket.receive_text())
+        second = json.loads(websocket.receive_text())
+        assert {first["data"]["team"], second["data"]["team"]} == {"red", "blue"}
+        assert first["type"] == "directive"
+        
+        websocket.send_text(json.dumps({"type": "delta", "seq": 3, "data": {}}))
+        assert json.loads(websocket.receive_text())["type"] == "resync"
+
+def test_reconnect_keeps_its_session_when_the_old_socket_closes():
+    """Test the teardown of a replaced socket leaves the reconnected client's session alone"""
+    client = TestClient(app)
+    old = client.websocket_connect("/ws/reconnecting-client")
+    old.__enter__()
+    with client.websocket_connect("/ws/reconnecting-client") as new:
+        new.send_text(json.dumps({"type": "snapshot", "seq": 0, "data": SNAPSHOT}))
+        new.receive_text(), new.receive_text()
+        session = sessions.get("reconnecting-client")
+        # Leaving the context waits for the old socket's handler to finish its teardown
+        old.__exit__(None, None, None)
+        assert sessions.get("reconnecting-client") is session
+        new.send_text(json.dumps({"type": "delta", "seq": 3, "data": {}}))
+        assert json.loads(new.receive_text())["data"] == {"reason": "sequence gap", "expected_seq": 1}
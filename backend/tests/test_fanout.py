@@ -0,0 +1,182 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.connections import ConnectionManager, IDLE_CLOSE_CODE, SLOW_CLIENT_CLOSE_CODE, match_room
+from app.main import app
+from app.shared_state import MemorySharedState
+
+class FakeWebSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed = None
+        # A blocked socket never completes a send, like a client that stopped reading
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await self.unblocked.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed = code
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def new_manager(**kwargs):
+    return ConnectionManager(MemorySharedState(worker_id="test"), **kwargs)
+
+async def drain():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_once_for_every_member():
+    """Test every room member is sent the same string and non-members nothing"""
+    manager = new_manager()
+    sockets = [FakeWebSocket() for _ in range(50)]
+    for index, websocket in enumerate(sockets):
+        await manager.connect(websocket, f"spectator-{index}", register=False)
+        if index < 40:
+            manager.join(f"spectator-{index}", match_room("player"))
+
+    assert await manager.broadcast(match_room("player"), "state", {"seq": 1}) == 40
+    await drain()
+    texts = [websocket.sent[0] for websocket in sockets[:40]]
+    assert json.loads(texts[0]) == {"type": "state", "data": {"seq": 1}}
+    assert all(text is texts[0] for text in texts)
+    assert all(not websocket.sent for websocket in sockets[40:])
+
+    await manager.disconnect("spectator-0", register=False)
+    manager.leave("spectator-1", match_room("player"))
+    assert len(manager.rooms[match_room("player")]) == 38
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_delay_others():
+    """Test a client that stops reading holds up neither the sender nor other members"""
+    manager = new_manager()
+    slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+    for client_id, websocket in (("slow", slow), ("fast", fast)):
+        await manager.connect(websocket, client_id, register=False)
+        manager.join(client_id, "room")
+
+    for seq in range(5):
+        await asyncio.wait_for(manager.broadcast("room", "state", {"seq": seq}), 0.5)
+    await drain()
+    assert len(fast.sent) == 5
+    assert slow.sent == []
+
+@pytest.mark.asyncio
+async def test_stale_state_is_coalesced_and_dropped():
+    """Test a queued state is replaced by a newer one and the queue stays bounded"""
+    manager = new_manager(queue_limit=3)
+    websocket = FakeWebSocket(blocked=True)
+    connection = await manager.connect(websocket, "spectator", register=False)
+
+    # The first message is taken by the writer and blocks in send_text
+    await manager.send_json("event", {"n": 0}, "spectator")
+    await drain()
+    for seq in range(10):
+        await manager.send_json("state", {"seq": seq}, "spectator", coalesce_key="state")
+    await manager.send_json("event", {"n": 1}, "spectator")
+    await manager.send_json("event", {"n": 2}, "spectator")
+    assert len(connection.queue) == 3
+    assert [json.loads(text)["data"] for text in connection.queue.values()] == [{"seq": 9}, {"n": 1}, {"n": 2}]
+
+    # Full: the stale state is dropped to make room
+    await manager.send_json("event", {"n": 3}, "spectator")
+    assert [json.loads(text)["data"] for text in connection.queue.values()] == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+    websocket.unblocked.set()
+    await drain()
+    assert [json.loads(text)["data"] for text in websocket.sent] == [{"n": 0}, {"n": 1}, {"n": 2}, {"n": 3}]
+
+@pytest.mark.asyncio
+async def test_client_that_cannot_keep_up_is_closed():
+    """Test a full queue with nothing droppable closes the client"""
+    manager = new_manager(queue_limit=2)
+    websocket = FakeWebSocket(blocked=True)
+    await manager.connect(websocket, "spectator", register=False)
+    manager.join("spectator", "room")
+
+    for n in range(4):
+        await manager.send_json("event", {"n": n}, "spectator")
+    await drain()
+    assert websocket.closed == SLOW_CLIENT_CLOSE_CODE
+    assert not manager.is_connected("spectator")
+    assert "room" not in manager.rooms
+
+@pytest.mark.asyncio
+async def test_stuck_send_is_closed_by_heartbeat():
+    """Test the heartbeat closes a client whose send has not completed within the timeout"""
+    clock = Clock()
+    manager = new_manager(send_timeout=5.0, clock=clock)
+    stuck = FakeWebSocket(blocked=True)
+    await manager.connect(stuck, "stuck", register=False)
+    await manager.send_json("event", {}, "stuck")
+    await drain()
+
+    clock.now = 4.0
+    manager.heartbeat(ping=False)
+    assert stuck.closed is None
+    clock.now = 6.0
+    manager.heartbeat(ping=False)
+    await drain()
+    assert stuck.closed == SLOW_CLIENT_CLOSE_CODE
+    assert not manager.is_connected("stuck")
+
+@pytest.mark.asyncio
+async def test_heartbeat_pings_and_reaps_idle_clients():
+    """Test live clients are pinged once per interval and silent ones are closed"""
+    clock = Clock()
+    manager = new_manager(idle_timeout=30.0, clock=clock)
+    quiet, chatty = FakeWebSocket(blocked=True), FakeWebSocket(blocked=True)
+    await manager.connect(quiet, "quiet")
+    await manager.connect(chatty, "chatty")
+
+    clock.now = 20.0
+    manager.heartbeat()
+    manager.heartbeat()
+    # Pings coalesce while the client is not reading
+    assert len(manager.active_connections["quiet"].queue) <= 1
+
+    manager.record_received("chatty")
+    clock.now = 40.0
+    manager.heartbeat()
+    await drain()
+    assert quiet.closed == IDLE_CLOSE_CODE
+    assert chatty.closed is None
+    assert list(manager.active_connections) == ["chatty"]
+
+def test_spectators_receive_match_state():
+    """Test a spectator socket receives the player's state and directives, and pongs are accepted"""
+    snapshot = {
+        "type": "snapshot", "seq": 0,
+        "data": {"territory_control": {"red": 40, "blue": 60}, "resources": {}, "agents": {"red": [], "blue": []}}
+    }
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/match-1") as player:
+            player.send_text(json.dumps(snapshot))
+            assert json.loads(player.receive_text())["type"] == "directive"
+            with client.websocket_connect("/ws/spectate/match-1") as spectator:
+                # Joining shows the current state
+                first = json.loads(spectator.receive_text())
+                assert first["type"] == "state" and first["data"]["territory_control"] == {"red": 40, "blue": 60}
+
+                player.send_text(json.dumps({"type": "pong"}))
+                player.send_text(json.dumps({"type": "delta", "seq": 1, "data": {"territory_control": {"red": 70, "blue": 30}}}))
+                messages = [json.loads(spectator.receive_text()) for _ in range(3)]
+                assert messages[0] == {"type": "state", "data": {
+                    "seq": 1, "territory_control": {"red": 70, "blue": 30}, "resources": {}, "agents": {"red": [], "blue": []}
+                }}
+                assert [message["type"] for message in messages[1:]] == ["directive", "directive"]
+                spectator.send_text(json.dumps({"type": "pong"}))
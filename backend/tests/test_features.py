@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from app.schemas.game_state import GameState, Resource, Agent, Position
+from app.schemas.compact import CompactGameState
+from app.services.features import HEX_SPACING, UniformGrid, enemies_near_base, extract_features
+from app.services.strategy_service import generate_fallback_strategy
+
+def make_state(red_positions, blue_positions, territory=(50, 50), bases=None, team_id="red"):
+    def agents(positions, start, agent_type):
+        return [Agent(id=start + i, type=agent_type, health=100, x=x, y=y) for i, (x, y) in enumerate(positions)]
+    
+    return GameState(
+        team_id=team_id,
+        territory_control={"red": territory[0], "blue": territory[1]},
+        resources={"red": Resource(energy=0, materials=0, data=0), "blue": Resource(energy=0, materials=0, data=0)},
+        agents={"red": agents(red_positions, 0, "collector"), "blue": agents(blue_positions, 1000, "attacker")},
+        resource_distribution={},
+        bases=bases or {}
+    )
+
+def test_grid_radius_query_matches_brute_force():
+    """Test the uniform grid returns exactly the points inside the radius"""
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-500, 1500, 2000)
+    y = rng.uniform(-500, 1000, 2000)
+    grid = UniformGrid(x, y, cell_size=120)
+    
+    for px, py, radius in [(0, 0, 200), (700, 300, 50), (1400, 900, 400)]:
+        expected = np.flatnonzero((x - px) ** 2 + (y - py) ** 2 <= radius ** 2)
+        assert sorted(grid.query_radius(px, py, radius).tolist()) == expected.tolist()
+
+def test_team_features():
+    """Test counts, centroids, clustering and frontline for separated teams"""
+    red = [(0, 0), (0, 10), (10, 0), (10, 10)]
+    blue = [(1000, 0), (1000, 10)]
+    features = extract_features(make_state(red, blue), "red")
+    
+    assert features.own.count == 4
+    assert features.own.type_counts == {"collector": 4}
+    assert features.own.centroid == pytest.approx((5, 5))
+    assert features.own.cluster_count == 1
+    assert features.own.concentration == 1.0
+    assert features.frontline_distance == pytest.approx(990 / HEX_SPACING, rel=1e-3)
+    assert features.own.enemies_near_base is None
+
+def test_enemies_near_base():
+    """Test enemy agents within the threat radius of a base are counted"""
+    base = Position(x=0, y=0)
+    blue = [(50, 0), (0, 100), (HEX_SPACING * 10, 0)]
+    features = extract_features(make_state([(500, 500)], blue, bases={"red": base}), "red")
+    assert features.own.enemies_near_base == 2
+
+def test_enemies_near_base_without_the_other_features():
+    """Test the direct base threat count agrees with the full features for models, dicts and columns"""
+    rng = np.random.default_rng(1)
+    blue = [tuple(point) for point in rng.uniform(-300, 300, (400, 2))]
+    state = make_state([(500, 500)], blue, bases={"red": Position(x=0, y=0)})
+    expected = extract_features(state, "red").own.enemies_near_base
+    as_dicts = GameState.model_construct(**dict(state, agents={
+        team: [agent.model_dump() for agent in agents] for team, agents in state.agents.items()
+    }))
+    for view in (state, as_dicts, CompactGameState.from_game_state(state)):
+        assert enemies_near_base(view, "red") == expected
+    assert enemies_near_base(state, "blue") is None
+
+def test_fallback_uses_features():
+    """Test base threats and numerical advantage change the fallback strategy"""
+    threatened = make_state([(500, 500)], [(10, 0), (0, 10), (5, 5)], bases={"red": Position(x=0, y=0)})
+    assert generate_fallback_strategy(threatened).priorities[0] == "defend_base"
+    
+    outnumbering = make_state([(i, 0) for i in range(6)], [(900, 0), (910, 0)])
+    strategy = generate_fallback_strategy(outnumbering)
+    assert strategy.strategy == "aggressive"
+    assert strategy.focus == "combat"
+    
+    even = make_state([(0, 0), (5, 0)], [(900, 0), (910, 0)])
+    assert generate_fallback_strategy(even).strategy == "balanced"
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from app.services.hedging import parse_deadline_ms, run_with_deadline
+
+def test_parse_deadline_reserves_margin():
+    """Test the client deadline is converted to seconds minus the safety margin"""
+    assert parse_deadline_ms(None) is None
+    assert parse_deadline_ms(0) is None
+    assert parse_deadline_ms(8000) == pytest.approx(7.75)
+    assert parse_deadline_ms(100) == 0.0
+
+@pytest.mark.asyncio
+async def test_fast_work_beats_deadline():
+    """Test the workflow result is returned when it finishes in time"""
+    async def work():
+        return "workflow"
+    
+    assert await run_with_deadline(work(), 1.0, lambda: "fallback") == "workflow"
+
+@pytest.mark.asyncio
+async def test_slow_work_falls_back_and_upgrades_later():
+    """Test the fallback is returned at the deadline and the late result is delivered"""
+    delivered = asyncio.get_running_loop().create_future()
+    
+    async def work():
+        await asyncio.sleep(0.05)
+        return "workflow"
+    
+    async def on_late_result(result, fallback):
+        delivered.set_result((result, fallback))
+    
+    assert await run_with_deadline(work(), 0.01, lambda: "fallback", on_late_result) == "fallback"
+    assert await asyncio.wait_for(delivered, 1.0) == ("workflow", "fallback")
+
+@pytest.mark.asyncio
+async def test_failed_background_work_is_not_delivered():
+    """Test a late failure does not trigger an upgrade push"""
+    calls = []
+    
+    async def work():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("LLM failed")
+    
+    async def on_late_result(result, fallback):
+        calls.append(result)
+    
+    assert await run_with_deadline(work(), 0.005, lambda: "fallback", on_late_result) == "fallback"
+    await asyncio.sleep(0.05)
+    assert calls == []
@@ -0,0 +1,37 @@
+import pytest
+from app.services.directive_service import GameSession
+from loadtest.arena import Arena
+from loadtest.harness import Recorder
+
+@pytest.mark.asyncio
+async def test_arena_deltas_reproduce_state_on_server():
+    """Test the simulated snapshot and deltas rebuild the arena's state in a GameSession"""
+    arena = Arena("arena-0", agents_per_team=20, seed=1)
+    session = GameSession("arena-0")
+    for _ in range(30):
+        arena.step(1.0)
+        replies = await session.handle(arena.ws_message())
+        assert all(message_type != "resync" for message_type, _ in replies)
+    
+    state = session.game_state("red")
+    assert state.territory_control == arena.territory_control
+    for team in ("red", "blue"):
+        assert {agent.id for agent in state.agents[team]} == set(arena.agents[team])
+        assert state.resources[team].model_dump() == arena.resources[team]
+
+def test_recorder_report():
+    """Test the report aggregates latency percentiles and error rates per operation"""
+    recorder = Recorder()
+    for ms in range(1, 101):
+        recorder.record("team_strategy", ms / 1000.0)
+    recorder.record("team_strategy", 0.5, "HTTP 500")
+    recorder.count("ws_received_directive")
+    
+    report = recorder.report(elapsed=10.0)
+    operation = report["operations"]["team_strategy"]
+    assert operation["requests"] == 101
+    assert operation["errors"] == 1
+    assert operation["latency_ms"]["p50"] == pytest.approx(51.0)
+    assert operation["latency_ms"]["max"] == pytest.approx(500.0)
+    assert report["throughput_rps"] == pytest.approx(10.1)
+    assert report["events"] == {"ws_received_directive": 1}
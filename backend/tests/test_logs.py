@@ -0,0 +1,88 @@
+import io
+import json
+import logging
+import queue
+from fastapi.testclient import TestClient
+from app.logs import DroppingQueueHandler, SamplingFilter, configure_logging, stop_logging
+from app.main import app
+
+GAME_STATE = {
+    "team_id": "red",
+    "territory_control": {"red": 45, "blue": 55},
+    "resources": {"red": {"energy": 1, "materials": 2, "data": 3}, "blue": {"energy": 1, "materials": 2, "data": 3}},
+    "agents": {"red": [], "blue": []},
+    "resource_distribution": {"energy": 10}
+}
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_record(message="Generated %s", args=("agent",), level=logging.INFO, route=None, request_id=None):
+    record = logging.LogRecord("app.test", level, __file__, 1, message, args, None)
+    record.route = route
+    record.request_id = request_id
+    return record
+
+def test_request_lines_are_json_with_correlation_ids():
+    """Test request log lines are written as JSON by the listener with the request's ID and route"""
+    stream = io.StringIO()
+    with TestClient(app) as client:
+        configure_logging(stream=stream)
+        response = client.post("/api/team-strategy", json=GAME_STATE, headers={"X-Request-ID": "match-7.req-1"})
+        generated = client.post("/api/team-strategy", json=GAME_STATE)
+        stop_logging()
+    assert response.headers["x-request-id"] == "match-7.req-1"
+    assert len(generated.headers["x-request-id"]) == 16
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    received = [line for line in lines if line["message"] == "Received team strategy request for team red"]
+    assert [line["request_id"] for line in received] == ["match-7.req-1", generated.headers["x-request-id"]]
+    assert received[0]["route"] == "/api/team-strategy" and received[0]["level"] == "INFO"
+
+def test_routes_are_sampled_per_request():
+    """Test INFO lines are kept for a share of a route's requests, and all lines of a kept request stay"""
+    sampling = SamplingFilter({"/api/team-strategy": 0.25})
+    kept = {request_id for request_id in map(str, range(1000))
+            if sampling.filter(make_record(route="/api/team-strategy", request_id=request_id))}
+    assert 200 < len(kept) < 300
+    assert all(sampling.filter(make_record("Other line", (), route="/api/team-strategy", request_id=request_id))
+               for request_id in kept)
+    assert sampling.filter(make_record(level=logging.WARNING, route="/api/team-strategy", request_id="999999"))
+    assert sampling.filter(make_record(route="/api/agent-specification", request_id="1"))
+
+def test_rate_limit_counts_suppressed_lines():
+    """Test each message template is capped per second and the next line reports what was suppressed"""
+    clock = Clock()
+    sampling = SamplingFilter(rate_limit=5, clock=clock)
+    passed = [sampling.filter(make_record(args=(index,))) for index in range(20)]
+    assert passed.count(True) == 5
+    assert sampling.filter(make_record("Another template", ()))
+
+    clock.now = 1.0
+    record = make_record()
+    assert sampling.filter(record) and record.suppressed == 15
+
+def test_records_are_formatted_by_the_listener_only():
+    """Test arguments of dropped lines are never formatted and a full queue drops instead of blocking"""
+    formatted = []
+
+    class Value:
+        def __str__(self):
+            formatted.append(self)
+            return "value"
+
+    handler = DroppingQueueHandler(queue.Queue(), limit=3)
+    handler.addFilter(SamplingFilter(rate_limit=2))
+    for _ in range(5):
+        handler.handle(make_record(args=(Value(),)))
+    assert formatted == []
+    assert handler.queue.qsize() == 2
+
+    for index in range(5):
+        handler.handle(make_record(f"Line {index}", ()))
+    assert handler.queue.qsize() == 3
+    assert handler.queue.get_nowait().getMessage() == "Generated value" and len(formatted) == 1
@@ -0,0 +1,71 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import RateMeter, Registry
+
+client = TestClient(app)
+
+def sample(text, line_start):
+    """Value of the first exposition line starting with line_start"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def test_histogram_renders_cumulative_buckets():
+    """Test histograms render cumulative buckets, sum and count"""
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.labels("/a").observe(value)
+    text = registry.render()
+    
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert sample(text, 'latency_seconds_sum{route="/a"}') == 6.25
+
+def test_rate_meter_counts_completed_seconds():
+    """Test the message rate averages the last window of completed seconds"""
+    now = [100.2]
+    meter = RateMeter(window_seconds=4, clock=lambda: now[0])
+    meter.mark(8)
+    now[0] = 101.5
+    meter.mark(4)
+    assert meter.rate() == 2.0
+    now[0] = 110.0
+    assert meter.rate() == 0.0
+
+def test_metrics_endpoint_reports_requests_and_generations():
+    """Test /metrics labels requests by route template and counts generation sources"""
+    before = sample(client.get("/metrics").text, 'generations_total{kind="strategy",source="mock"}') or 0
+    
+    client.post("/api/team-strategy", json={
+        "team_id": "red",
+        "territory_control": {"red": 45, "blue": 55},
+        "resources": {"red": {"energy": 1, "materials": 2, "data": 3}, "blue": {"energy": 1, "materials": 2, "data": 3}},
+        "agents": {"red": [], "blue": []},
+        "resource_distribution": {}
+    })
+    client.get("/no-such-route")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert sample(text, 'generations_total{kind="strategy",source="mock"}') == before + 1
+    assert sample(text, 'http_requests_total{route="/api/team-strategy",method="POST",status="200"}') >= 1
+    assert sample(text, 'http_requests_total{route="unmatched",method="GET",status="404"}') >= 1
+    assert sample(text, 'stage_duration_seconds_count{stage="validate_game_state"}') >= 1
+    assert sample(text, "websocket_connections") is not None
+
+def test_websocket_messages_are_counted():
+    """Test WebSocket connections and received messages show up in the gauges and counters"""
+    before = sample(client.get("/metrics").text, 'websocket_messages_total{direction="received"}') or 0
+    with client.websocket_connect("/ws/metrics-client") as websocket:
+        websocket.send_text('{"type": "snapshot", "data": {"territory_control": {"red": 50, "blue": 50}}}')
+        websocket.receive_json()
+        text = client.get("/metrics").text
+        assert sample(text, "websocket_connections") == 1
+    assert sample(text, 'websocket_messages_total{direction="received"}') == before + 1
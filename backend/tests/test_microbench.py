@@ -0,0 +1,36 @@
+from benchmarks.microbench import CASES, compare, load_baselines, peak_bytes, run
+
+def test_every_case_runs_at_a_small_size():
+    """Test each case is measured once per size, or once when it does not depend on the state size"""
+    results = run([4], min_time=0.01)
+    assert results["calibration"]["us_per_call"] > 0
+    assert set(results) == {"calibration"} | {f"{name}[4]" if sized else name for name, (_, sized) in CASES.items()}
+    assert all(result["peak_bytes"] > 0 for key, result in results.items() if key != "calibration")
+
+def test_peak_bytes_grows_with_the_state():
+    """Test tracemalloc sees the larger allocation of a larger state"""
+    build, _ = CASES["game_state_validate"]
+    assert peak_bytes(build(200)) > 5 * peak_bytes(build(20))
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """Test times are rescaled by the calibration and allocations get a relative and absolute slack"""
+    baselines = {
+        "calibration": {"us_per_call": 10.0},
+        "case[10]": {"us_per_call": 100.0, "peak_bytes": 10000}
+    }
+    # The whole run is twice as slow: 210us is within 25% of the rescaled 200us
+    slower_machine = {"calibration": {"us_per_call": 20.0}, "case[10]": {"us_per_call": 210.0, "peak_bytes": 11000}}
+    assert compare(slower_machine, baselines, 0.25, 0.1) == []
+
+    regressed = {"calibration": {"us_per_call": 10.0}, "case[10]": {"us_per_call": 130.0, "peak_bytes": 12000},
+                 "new_case[10]": {"us_per_call": 1e6, "peak_bytes": 1e9}}
+    assert [regression.split(":")[0] for regression in compare(regressed, baselines, 0.25, 0.1)] == [
+        "case[10] us_per_call", "case[10] peak_bytes"
+    ]
+
+def test_baselines_cover_every_case():
+    """Test the stored baselines have an entry for every case at each default size"""
+    baselines = load_baselines()
+    keys = set(baselines["results"])
+    for name, (_, sized) in CASES.items():
+        assert {f"{name}[{size}]" for size in (10, 100, 1000)} <= keys if sized else name in keys
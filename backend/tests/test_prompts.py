@@ -0,0 +1,92 @@
+import httpx
+import pytest
+from app.schemas.game_state import GameState
+from app.services.prompts import agent_inputs, fit, strategy_inputs
+from app.services.workflow_executor import WorkflowExecutor, estimate_tokens, set_executor
+from app.stub_llm import create_app
+
+def make_state(agents_per_team, types=("collector", "explorer", "defender", "attacker")):
+    return GameState(
+        team_id="red",
+        territory_control={"red": 43.4, "blue": 51.6},
+        resources={"red": {"energy": 123, "materials": 45, "data": 67}, "blue": {"energy": 98, "materials": 12, "data": 40}},
+        agents={
+            team: [{"id": index, "type": types[index % len(types)], "health": 80, "x": offset + 10 * index, "y": 100}
+                   for index in range(agents_per_team)]
+            for team, offset in (("red", 0), ("blue", 2000))
+        },
+        resource_distribution={"energy": 121, "materials": 0, "data": 33},
+        bases={"red": {"x": 0, "y": 100}, "blue": {"x": 4000, "y": 100}}
+    )
+
+@pytest.fixture
+def executor():
+    executor = WorkflowExecutor()
+    set_executor(executor)
+    yield executor
+    set_executor(None)
+
+def test_strategy_prompt_does_not_grow_with_agents(executor):
+    """Test agent lists are summarized as histograms and spatial lines, so prompt size stays flat"""
+    small, large = (next(strategy_inputs(make_state(count), "red")) for count in (8, 2000))
+    assert small["agents"]["red"] == {"count": 8, "types": "attacker 2, collector 2, defender 2, explorer 2"}
+    assert small["territory_control"] == {"red": 43, "blue": 52}
+    assert small["resource_distribution"] == "energy 121, data 33"
+    assert small["situation"][0] == "Enemy agents near your base: 0"
+
+    sizes = [estimate_tokens(executor.render_prompt("team_strategy", state)) for state in (small, large)]
+    # Only the figures get more digits
+    assert sizes[1] - sizes[0] <= 10
+
+def test_fit_drops_detail_to_meet_the_budget(executor):
+    """Test the most detailed input within the budget is chosen, down to the tersest one"""
+    state = make_state(40, types=tuple(f"type{index}" for index in range(40)))
+    levels = list(strategy_inputs(state, "red"))
+    sizes = [estimate_tokens(executor.render_prompt("team_strategy", level)) for level in levels]
+    assert sizes == sorted(sizes, reverse=True)
+    assert levels[1]["agents"]["red"]["types"].endswith("other 36")
+    assert levels[2]["territory_control"] == {"red": 45, "blue": 50} and levels[2]["situation"] == []
+
+    assert fit("team_strategy", strategy_inputs(state, "red"), budget=sizes[0]) == levels[0]
+    assert fit("team_strategy", strategy_inputs(state, "red"), budget=sizes[1]) == levels[1]
+    assert fit("team_strategy", strategy_inputs(state, "red"), budget=10) == levels[2]
+    assert fit("team_strategy", strategy_inputs(state, "red"), budget=0) == levels[0]
+
+def test_agent_inputs_summarize_the_request():
+    """Test agent requests are compacted and malformed entries are skipped"""
+    request = {
+        "strategy": {"strategy": "economic", "focus": "resources", "priorities": ["collect_energy", "collect_data"]},
+        "resources": {"energy": 51.7, "materials": "lots"},
+        "current_agents": [{"type": "collector", "count": 3}, {"type": "explorer", "count": "?"}, "defender"]
+    }
+    workflow_input = next(agent_inputs(request, "blue", count=3))
+    assert workflow_input == {
+        "team_id": "blue",
+        "strategy": {"strategy": "economic", "focus": "resources", "priorities": "collect_energy, collect_data"},
+        "resources": {"energy": 52, "materials": "lots", "data": 0},
+        "current_agents": "collector 3",
+        "count": 3
+    }
+
+@pytest.mark.asyncio
+async def test_prefix_is_rendered_once_and_cached_by_the_stub(executor):
+    """Test the instructions go first as a system message, rendered once per team and cached by the stub"""
+    stub = create_app()
+    workflow_input = next(strategy_inputs(make_state(4), "red"))
+    definition = executor.workflow("team_strategy")
+    messages = definition.messages(workflow_input)
+    assert [message["role"] for message in messages] == ["system", "user"]
+    assert messages[0]["content"].startswith("You are the strategic AI for the red team")
+    assert messages[1]["content"].startswith("CURRENT GAME STATE:")
+
+    definition.messages(workflow_input)
+    definition.messages(dict(workflow_input, team_id="blue", opponent_id="red"))
+    assert len(definition._prefixes) == 2
+
+    async with httpx.AsyncClient(base_url="http://stub/v1", transport=httpx.ASGITransport(app=stub)) as client:
+        usages = []
+        for _ in range(2):
+            response = await client.post("/chat/completions", json={"model": "stub", "messages": messages})
+            usages.append(response.json()["usage"])
+    assert usages[0]["prompt_tokens_details"]["cached_tokens"] == 0
+    assert usages[1]["prompt_tokens_details"]["cached_tokens"] == len(messages[0]["content"]) // 4
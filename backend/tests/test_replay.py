@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.replay import INDEX_SUFFIX, ReplayReader, ReplayRecorder, ReplaySegment
+from app.schemas.strategy import TeamStrategy
+
+STRATEGY = TeamStrategy(strategy="economic", focus="resources", priorities=["collect_energy"], description="replayed")
+
+def record_matches(directory, **kwargs):
+    recorder = ReplayRecorder(**kwargs)
+    assert recorder.start(str(directory))
+    for tick in range(200):
+        for match in ("match-a", "match-b"):
+            recorder.record(match, "client_message", {"type": "delta", "seq": tick}, tick=tick, latency_ms=0.5)
+        if tick % 50 == 0:
+            recorder.record("match-a", "strategy", {"strategy": STRATEGY})
+    recorder.stop()
+    return recorder
+
+def test_records_are_read_back_by_match_and_tick(tmp_path):
+    """Test a match's records stream back in order, with only the chunks holding its ticks decompressed"""
+    recorder = record_matches(tmp_path, chunk_records=50, segment_bytes=2048)
+    assert recorder.written == 404 and recorder.dropped == 0
+    assert recorder.compressed_bytes < recorder.raw_bytes
+    assert len(list(tmp_path.glob("replay-*.log"))) > 1
+
+    with ReplayReader(str(tmp_path)) as reader:
+        assert reader.matches()["match-b"]["last_tick"] == 199
+        records = list(reader.records("match-a", from_tick=120, to_tick=150))
+        assert [record["tick"] for record in records if record["kind"] == "client_message"] == list(range(120, 151))
+        assert [record["data"]["strategy"] for record in records if record["kind"] == "strategy"] == [STRATEGY.model_dump()]
+        # Strategies take the tick of the latest message of their match
+        assert records[-1]["tick"] == 150 and records[0]["latency_ms"] == 0.5
+
+        decoded = []
+        for segment in reader.segments:
+            original = segment.read_chunk
+            segment.read_chunk = lambda entry, original=original: decoded.append(entry) or original(entry)
+        assert [record["tick"] for record in reader.records("match-b", from_tick=190)] == list(range(190, 200))
+        total = sum(len(segment.chunks) for segment in reader.segments)
+        assert len(decoded) <= 2 < total
+
+def test_unindexed_and_torn_chunks_are_recovered(tmp_path):
+    """Test chunks missing from the index are found by scanning, and a torn last chunk is ignored"""
+    record_matches(tmp_path, chunk_records=100)
+    segment_path = str(next(tmp_path.glob("replay-*.log")))
+    with open(segment_path + INDEX_SUFFIX) as f:
+        lines = f.readlines()
+    # The writer stopped after writing the last chunk but before indexing it, mid-way through a line
+    with open(segment_path + INDEX_SUFFIX, "w") as f:
+        f.writelines(lines[:-2])
+        f.write(lines[-2][:10])
+    with open(segment_path, "ab") as f:
+        f.write(b"RPCK\xff\xff")
+
+    segment = ReplaySegment(segment_path)
+    try:
+        assert len(segment.chunks) == len(lines)
+        assert sum(entry["records"] for entry in segment.chunks) == 404
+    finally:
+        segment.close()
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    """Test records are dropped and counted while the writer cannot keep up"""
+    recorder = ReplayRecorder(queue_limit=10, chunk_records=1)
+    release = threading.Event()
+    write_chunk = recorder._write_chunk
+    recorder._write_chunk = lambda batch: release.wait(5) and write_chunk(batch)
+    recorder.start(str(tmp_path))
+    for tick in range(100):
+        recorder.record("match", "client_message", "{}", tick=tick)
+    release.set()
+    recorder.stop()
+    assert recorder.dropped > 0
+    assert recorder.written + recorder.dropped == 100
+
+def test_old_segments_are_pruned_when_a_segment_is_opened(tmp_path):
+    """Test segments past the age limit, then the oldest beyond the size limit, are deleted with their indexes"""
+    week_ago = time.time() - 8 * 24 * 3600
+    for index, age in enumerate((week_ago, week_ago + 3600, time.time() - 60, time.time() - 30)):
+        path = tmp_path / f"replay-old-{index}.log"
+        path.write_bytes(b"x" * 1000)
+        (tmp_path / f"replay-old-{index}.log.idx").write_text("")
+        os.utime(path, (age, age))
+
+    recorder = ReplayRecorder(chunk_records=1, segment_bytes=1000, max_bytes=2500, max_age_seconds=7 * 24 * 3600)
+    recorder.start(str(tmp_path))
+    recorder.record("match", "client_message", "{}", tick=0)
+    recorder.stop()
+    # Two segments are too old; the next oldest leaves no room for a new segment within 2500 bytes
+    assert sorted(path.name for path in tmp_path.glob("replay-old-*")) == ["replay-old-3.log", "replay-old-3.log.idx"]
+    assert recorder.pruned == 3
+    assert len(list(tmp_path.glob("replay-2*.log"))) == 1
+
+def test_requests_are_recorded_and_served(tmp_path, monkeypatch):
+    """Test HTTP and WebSocket traffic is recorded and streamed back by the replay endpoint"""
+    monkeypatch.setenv("REPLAY_ENABLED", "true")
+    monkeypatch.setenv("REPLAY_DIR", str(tmp_path))
+    payload = {
+        "team_id": "red",
+        "territory_control": {"red": 45, "blue": 55},
+        "resources": {"red": {"energy": 1, "materials": 2, "data": 3}, "blue": {"energy": 1, "materials": 2, "data": 3}},
+        "agents": {"red": [], "blue": []},
+        "resource_distribution": {"energy": 10}
+    }
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/replayed") as websocket:
+            websocket.send_text(json.dumps({"type": "snapshot", "seq": 3, "data": {"territory_control": {"red": 45, "blue": 55}}}))
+            websocket.receive_text()
+            response = client.post("/api/team-strategy", json=payload, headers={"X-Client-Id": "replayed"})
+            assert response.status_code == 200
+
+    with TestClient(app) as client:
+        assert client.get("/replays").json()["replayed"]["last_tick"] == 3
+        lines = client.get("/replays/replayed", params={"kind": ["client_message", "strategy"]}).text.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["kind"] for record in records] == ["client_message", "strategy"]
+    assert records[1]["tick"] == 3
+    assert json.loads(records[1]["data"]["game_state"]) == payload
+    assert records[1]["data"]["strategy"] == response.json()
+    assert records[1]["latency_ms"] >= 0
@@ -62,4 +62,22 @@ def test_fallback_agent():
         
         # Validate attribute sum
         attr_sum = sum(attributes.values())
-        assert attr_sum <= 3.0
\ No newline at end of file
+        assert attr_sum <= 3.0
+
+def test_fallback_strategies_match_single():
+    """Test the batch fallback pass agrees with the per-state fallback"""
+    from app.services.strategy_service import generate_fallback_strategies
+    
+    game_states = [
+        GameState(
+            team_id=team_id,
+            territory_control={"red": red, "blue": blue},
+            resources={"red": Resource(energy=0, materials=0, data=0)},
+            agents={"red": [], "blue": []},
+            resource_distribution={}
+        )
+        for team_id, red, blue in [("red", 10, 80), ("blue", 10, 80), ("2", 50, 45), ("1", 70, 20)]
+    ]
+    
+    batch = generate_fallback_strategies(game_states)
+    assert [s.model_dump() for s in batch] == [generate_fallback_strategy(g).model_dump() for g in game_states]
@@ -0,0 +1,192 @@
+import asyncio
+import subprocess
+import sys
+import pytest
+import pytest_asyncio
+from app.connections import ROOMS_CHANNEL, ConnectionManager
+from app.schemas.strategy import TeamStrategy
+from app.services.cache import QuantizedCache, SharedResultCache
+from app.shared_state import MemorySharedState, SharedState, SqliteSharedState, set_shared_state, worker_channel
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+@pytest_asyncio.fixture
+async def workers(tmp_path):
+    """Two SQLite-backed shared states on one database, as two workers would have"""
+    states = [SqliteSharedState(str(tmp_path / "shared.db"), worker_id=f"worker-{index}", poll_seconds=0.01)
+              for index in range(2)]
+    for state in states:
+        await state.start()
+    yield states
+    for state in states:
+        await state.stop()
+
+@pytest.mark.asyncio
+async def test_push_is_routed_to_the_worker_holding_the_connection(workers):
+    """Test a message sent on one worker reaches a WebSocket held by another"""
+    holder, sender = ConnectionManager(workers[0]), ConnectionManager(workers[1])
+    holder.listen()
+    websocket = FakeWebSocket()
+    await holder.connect(websocket, "client-1")
+
+    assert not sender.is_connected("client-1")
+    assert await sender.is_reachable("client-1")
+    await sender.send_json("directive", {"team": "red"}, "client-1")
+    await wait_for(lambda: websocket.sent)
+    assert websocket.sent == ['{"type": "directive", "data": {"team": "red"}}']
+
+    await holder.disconnect("client-1")
+    assert not await sender.is_reachable("client-1")
+
+@pytest.mark.asyncio
+async def test_pub_sub_and_reconnect_ownership(workers):
+    """Test published messages reach subscribers only, and a reconnect moves the route"""
+    received = []
+
+    async def handler(message):
+        received.append(message)
+
+    workers[0].subscribe("directives", handler)
+    await workers[1].publish("other", {"n": 0})
+    await workers[1].publish("directives", {"n": 1})
+    await wait_for(lambda: received)
+    assert received == [{"n": 1}]
+
+    await workers[0].register_connection("client-2")
+    await workers[1].register_connection("client-2")
+    # The old worker cleaning up must not remove the new route
+    await workers[0].unregister_connection("client-2")
+    assert await workers[0].connection_owner("client-2") == "worker-1"
+
+@pytest.mark.asyncio
+async def test_broadcasts_are_published_only_to_rooms_with_members_elsewhere(workers):
+    """Test a room broadcast is published while another worker holds a spectator, and not otherwise"""
+    player, watcher = ConnectionManager(workers[0], audience_ttl=0.0), ConnectionManager(workers[1])
+    watcher.listen()
+    published = []
+
+    async def handler(message):
+        published.append(message)
+
+    workers[1].subscribe(ROOMS_CHANNEL, handler)
+    assert not await player.has_audience("match:p")
+    await player.broadcast("match:p", "state", {"n": 0})
+
+    websocket = FakeWebSocket()
+    await watcher.connect(websocket, "spectator", register=False)
+    watcher.join("spectator", "match:p")
+    await wait_for(lambda: not watcher._room_updates)
+    assert await workers[0].remote_room_members("match:p") == 1
+    assert await player.has_audience("match:p")
+    await player.broadcast("match:p", "state", {"n": 1})
+    await wait_for(lambda: websocket.sent)
+    assert websocket.sent == ['{"type": "state", "data": {"n": 1}}']
+
+    await watcher.disconnect("spectator", websocket, register=False)
+    await wait_for(lambda: not watcher._room_updates)
+    assert not await player.has_audience("match:p")
+    assert [message["text"] for message in published] == ['{"type": "state", "data": {"n": 1}}']
+
+@pytest.mark.asyncio
+async def test_results_are_shared_between_workers(workers):
+    """Test a result cached by one worker is a hit on another"""
+    strategy = TeamStrategy(strategy="economic", focus="resources", priorities=["collect_energy"], description="shared")
+    caches = [SharedResultCache("strategy", QuantizedCache(), TeamStrategy) for _ in workers]
+    key = (("blue", 11), ("red", 9))
+
+    set_shared_state(workers[0])
+    try:
+        await caches[0].set(key, strategy)
+        set_shared_state(workers[1])
+        assert await caches[1].get(key) == strategy
+        assert caches[1].stats()["shared_hits"] == 1
+        # Now also held locally
+        assert caches[1].local.get(key) == strategy
+    finally:
+        set_shared_state(None)
+
+    await workers[0].cache_set("short", "value", ttl_seconds=0.0)
+    assert await workers[1].cache_get("short") is None
+
+def test_incomplete_backend_fails_when_created():
+    """Test a backend missing part of the interface cannot be instantiated"""
+    class RoutingOnly(SharedState):
+        async def publish(self, channel, message):
+            pass
+
+    with pytest.raises(TypeError, match="cache_get"):
+        RoutingOnly()
+
+@pytest.mark.asyncio
+async def test_memory_state_is_local():
+    """Test the single-process backend delivers locally and is not used for shared caching"""
+    state = MemorySharedState(worker_id="only")
+    received = []
+
+    async def handler(message):
+        received.append(message)
+
+    state.subscribe(worker_channel("only"), handler)
+    await state.publish(worker_channel("only"), {"client_id": "c", "text": "x"})
+    assert received == [{"client_id": "c", "text": "x"}]
+    assert not state.distributed
+
+@pytest.mark.asyncio
+async def test_routing_between_processes(tmp_path):
+    """Test a push from this process reaches a connection held by a separate worker process"""
+    path = str(tmp_path / "shared.db")
+    script = f"""
+import asyncio
+from app.connections import ConnectionManager
+from app.shared_state import SqliteSharedState
+
+class WebSocket:
+    async def accept(self):
+        pass
+    async def send_text(self, message):
+        print(message, flush=True)
+        done.set()
+
+async def main():
+    global done
+    done = asyncio.Event()
+    state = SqliteSharedState({path!r}, worker_id="child", poll_seconds=0.01)
+    await state.start()
+    manager = ConnectionManager(state)
+    manager.listen()
+    await manager.connect(WebSocket(), "client-3")
+    print("ready", flush=True)
+    await asyncio.wait_for(done.wait(), 10)
+    await state.stop()
+
+asyncio.run(main())
+"""
+    child = await asyncio.create_subprocess_exec(sys.executable, "-c", script, stdout=subprocess.PIPE)
+    try:
+        assert (await asyncio.wait_for(child.stdout.readline(), 10)).strip() == b"ready"
+        state = SqliteSharedState(path, worker_id="parent", poll_seconds=0.01)
+        await state.start()
+        try:
+            await ConnectionManager(state).send_json("directive", {"team": "blue"}, "client-3")
+        finally:
+            await state.stop()
+        line = await asyncio.wait_for(child.stdout.readline(), 10)
+        assert line.strip() == b'{"type": "directive", "data": {"team": "blue"}}'
+    finally:
+        if child.returncode is None:
+            child.kill()
+        await child.wait()
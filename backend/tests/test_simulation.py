@@ -0,0 +1,65 @@
+import pytest
+from app.schemas.strategy import TeamStrategy
+from app.services.strategy_service import FALLBACK_STRATEGIES
+from app.simulation import Arena, ArenaConfig, Policy, make_policy
+from app.simulation.tournament import run_tournament, schedule
+
+SHORT = ArenaConfig(max_ticks=150)
+
+class RecordingPolicy(Policy):
+    """Fallback policy that remembers what the arena asked it"""
+
+    def __init__(self):
+        super().__init__("recording")
+        self.states = []
+        self.requests = []
+
+    def strategy(self, game_state):
+        self.states.append(game_state)
+        return TeamStrategy(**FALLBACK_STRATEGIES["behind"])
+
+    def agent(self, request_data):
+        self.requests.append(request_data)
+        return super().agent(request_data)
+
+def test_matches_are_deterministic_per_seed():
+    """Test the same seed replays the same match and another seed plays a different one"""
+    play = lambda seed: Arena(make_policy("fallback"), make_policy("fixed:ahead"), seed=seed, config=SHORT).run()
+    assert play(3) == play(3)
+    assert play(3) != play(4)
+
+def test_arena_consults_policies_with_api_payloads():
+    """Test policies receive GameStates and agent requests shaped like the API's"""
+    red = RecordingPolicy()
+    arena = Arena(red, make_policy("fallback"), seed=1, config=SHORT)
+    result = arena.run()
+
+    assert len(red.states) == result.decisions["red"] == 1 + result.ticks // SHORT.decision_interval
+    assert red.states[0].team_id == "red" and set(red.states[0].bases) == {"red", "blue"}
+    state = arena.game_state(0)
+    assert sum(len(agents) for agents in state.agents.values()) == int(arena.alive.sum())
+    assert len(red.requests) >= result.spawned["red"] > 0
+    assert red.requests[0]["strategy"]["strategy"] == "aggressive"
+    assert sum(result.territory.values()) <= 100
+
+def test_unknown_policy_is_rejected():
+    """Test policy specs are validated"""
+    with pytest.raises(ValueError):
+        make_policy("random")
+    with pytest.raises(ValueError):
+        make_policy("fixed:winning")
+
+def test_tournament_in_process_and_pool():
+    """Test a round robin swaps sides and reports the same standings inline and across worker processes"""
+    policies = ["fallback", "margin:5", "fixed:ahead"]
+    games = schedule(policies, 4, config=SHORT)
+    assert len(games) == 12 and len({seed for _, _, seed, _ in games}) == 12
+    assert sum(red == "fallback" for red, _, _, _ in games) == sum(blue == "fallback" for _, blue, _, _ in games)
+
+    inline = run_tournament(policies, 4, workers=0, config=SHORT)
+    pooled = run_tournament(policies, 4, workers=2, config=SHORT)
+    assert inline["standings"] == pooled["standings"]
+    assert inline["matches"] == 12 and pooled["matches_per_second"] > 0
+    for standing in inline["standings"].values():
+        assert standing["matches"] == 8
+        assert standing["wins"] + standing["losses"] + standing["draws"] == 8
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight, workflow_key
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_run():
+    """Test that identical concurrent calls execute the factory once"""
+    flight = SingleFlight()
+    calls = 0
+    
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+    
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_clear_key():
+    """Test that a failed run raises for all callers and is not reused"""
+    flight = SingleFlight()
+    
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("workflow failed")
+    
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+    
+    async def succeed():
+        return "ok"
+    
+    assert await flight.do("key", succeed) == "ok"
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_run():
+    """Test that one caller going away leaves the run alive for the others"""
+    flight = SingleFlight()
+    release = asyncio.Event()
+    
+    async def work():
+        await release.wait()
+        return "done"
+    
+    leaving = asyncio.ensure_future(flight.do("key", work))
+    staying = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    leaving.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    
+    assert await staying == "done"
+    assert leaving.cancelled()
+
+def test_workflow_key_ignores_dict_order():
+    """Test that keys are built from normalized input"""
+    assert workflow_key("w", {"a": 1, "b": [1, 2]}) == workflow_key("w", {"b": [1, 2], "a": 1})
+    assert workflow_key("w", {"a": 1}) != workflow_key("other", {"a": 1})
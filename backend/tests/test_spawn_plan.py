@@ -0,0 +1,109 @@
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.spawn_plan import generate_spawn_plan, spawn_queues, validate_plan_agents
+from app.services.workflow_executor import WorkflowExecutor, set_executor
+from app.stub_llm import create_app
+
+client = TestClient(app)
+
+AGGRESSIVE = {"strategy": "aggressive", "focus": "territory", "priorities": ["expand_territory"]}
+DEFENSIVE = {"strategy": "defensive", "focus": "resources", "priorities": ["defend_territory"]}
+
+def agent_request(strategy=AGGRESSIVE, **extra):
+    return {
+        "team_id": "red",
+        "strategy": strategy,
+        "resources": {"energy": 60, "materials": 40, "data": 30},
+        "current_agents": [{"type": "collector", "count": 2}],
+        **extra
+    }
+
+def planned_agent(role="attacker", **attributes):
+    return {
+        "role": role,
+        "attributes": {"speed": 0.5, "health": 0.5, "attack": 0.5, "defense": 0.5, "carryCapacity": 0.5, **attributes},
+        "priority": "territory",
+        "description": f"Planned {role}"
+    }
+
+def test_validate_plan_agents_enforces_limits():
+    """Test planned agents outside the attribute bounds or over the sum limit are dropped"""
+    agents = validate_plan_agents([
+        planned_agent("attacker"),
+        planned_agent("defender", speed=1.2),
+        planned_agent("explorer", speed=1.0, health=1.0),
+        {"role": "collector"},
+        planned_agent("collector", speed=0.8, health=0.6, carryCapacity=0.6)
+    ])
+    assert [agent.role for agent in agents] == ["attacker", "collector"]
+    assert validate_plan_agents(None) == []
+
+def test_spawn_plan_queue_serves_agent_specification():
+    """Test the plan's remaining agents are served in order until the strategy changes"""
+    headers = {"X-Client-Id": "plan-client"}
+    response = client.post("/api/spawn-plan", json=agent_request(count=3), headers=headers)
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["team_id"] == "red"
+    assert len(plan["agents"]) == 3
+    assert spawn_queues.remaining("plan-client", "red") == 2
+
+    response = client.post("/api/agent-specification", json=agent_request(), headers=headers)
+    assert response.json() == plan["agents"][1]
+    assert spawn_queues.remaining("plan-client", "red") == 1
+
+    # A different strategy drops the rest of the queue
+    response = client.post("/api/agent-specification", json=agent_request(DEFENSIVE), headers=headers)
+    assert response.json()["role"] == "defender"
+    assert spawn_queues.remaining("plan-client", "red") == 0
+
+def test_anonymous_callers_do_not_share_a_plan():
+    """Test a plan requested without X-Client-Id is a single agent and never served to another caller"""
+    response = client.post("/api/spawn-plan", json=agent_request(count=3))
+    assert len(response.json()["agents"]) == 1
+    assert spawn_queues.remaining(None, "red") == 0
+
+    served = spawn_queues.stats()["served"]
+    response = client.post("/api/agent-specification", json=agent_request())
+    assert response.status_code == 200
+    assert spawn_queues.stats()["served"] == served
+
+def test_spawn_plan_rejects_bad_count():
+    """Test plan sizes outside 1..SPAWN_PLAN_MAX_SIZE are rejected"""
+    assert client.post("/api/spawn-plan", json=agent_request(count=0)).status_code == 422
+    assert client.post("/api/spawn-plan", json=agent_request(count=1000)).status_code == 422
+    assert client.post("/api/spawn-plan", json={"team_id": "red"}).status_code == 422
+
+@pytest.mark.asyncio
+async def test_spawn_plan_uses_one_workflow_call(override_settings):
+    """Test the whole plan comes from a single call to the plan_agents workflow step"""
+    override_settings(use_mock_responses=False)
+    stub = create_app()
+    set_executor(WorkflowExecutor(base_url="http://stub/v1", transport=httpx.ASGITransport(app=stub)))
+    try:
+        agents = await generate_spawn_plan(agent_request(), 4)
+    finally:
+        set_executor(None)
+    assert len(agents) == 4
+    assert stub.state.requests == 1
+    assert all(agent.attributes.total() <= 3.0 + 1e-6 for agent in agents)
+
+@pytest.mark.asyncio
+async def test_invalid_plan_falls_back(override_settings):
+    """Test a plan with no valid agents is replaced by the fallback plan"""
+    override_settings(use_mock_responses=False)
+
+    def handler(request):
+        content = json.dumps({"agents": [planned_agent(speed=1.0, health=1.0)]})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    set_executor(WorkflowExecutor(base_url="http://llm", transport=httpx.MockTransport(handler)))
+    try:
+        agents = await generate_spawn_plan(agent_request(), 2)
+    finally:
+        set_executor(None)
+    assert [agent.role for agent in agents] == ["attacker", "attacker"]
+    assert agents[0].description == "Fast attacker focused on territory control."
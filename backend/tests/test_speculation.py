@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from app.schemas.game_state import GameState
+from app.services.speculation import (
+    SpeculationKind,
+    SpeculationScheduler,
+    agent_request_within_drift,
+    strategy_state_within_drift
+)
+
+def make_state(red_territory=45, blue_territory=50, red_energy=50, red_agents=2, team_id="red"):
+    return GameState(
+        team_id=team_id,
+        territory_control={"red": red_territory, "blue": blue_territory},
+        resources={
+            "red": {"energy": red_energy, "materials": 30, "data": 20},
+            "blue": {"energy": 40, "materials": 35, "data": 25}
+        },
+        agents={
+            "red": [{"id": i, "type": "collector", "health": 100, "x": 10 * i, "y": 0} for i in range(red_agents)],
+            "blue": [{"id": 100, "type": "explorer", "health": 90, "x": 200, "y": 200}]
+        },
+        resource_distribution={"energy": 10, "materials": 8, "data": 12}
+    )
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_scheduler():
+    """Scheduler with a clock under test control and a generator that counts its calls"""
+    clock = FakeClock()
+    calls = []
+
+    async def generate(state):
+        calls.append(state)
+        return f"strategy for {state.territory_control['red']}"
+
+    kind = SpeculationKind(generate, strategy_state_within_drift, lambda client_id, team_id, last: last)
+    return SpeculationScheduler(kinds={"strategy": kind}, clock=clock, enabled=True), clock, calls
+
+def test_strategy_drift():
+    """Test small changes keep the prepared strategy and threshold crossings discard it"""
+    assert strategy_state_within_drift(make_state(), make_state(red_territory=48, red_energy=70, red_agents=3))
+    assert not strategy_state_within_drift(make_state(), make_state(red_territory=39))  # now behind by 11
+    assert not strategy_state_within_drift(make_state(), make_state(red_energy=100))
+    assert not strategy_state_within_drift(make_state(), make_state(red_agents=5))
+    assert not strategy_state_within_drift(make_state(), make_state(team_id="blue"))
+
+def test_agent_request_drift():
+    """Test agent requests must share team and strategy and stay within resource drift"""
+    request = {
+        "team_id": "team1",
+        "strategy": {"strategy": "aggressive", "focus": "territory"},
+        "resources": {"energy": 60, "materials": 40, "data": 30},
+        "current_agents": [{"type": "collector", "count": 3}]
+    }
+    assert agent_request_within_drift(request, {**request, "team_id": "red", "resources": {"energy": 70, "materials": 40, "data": 30}})
+    assert not agent_request_within_drift(request, {**request, "strategy": {"strategy": "defensive", "focus": "territory"}})
+    assert not agent_request_within_drift(request, {**request, "current_agents": [{"type": "collector", "count": 6}]})
+
+@pytest.mark.asyncio
+async def test_prepared_result_is_served_before_the_next_request():
+    """Test the scheduler learns the cadence, speculates before the request and serves the result"""
+    scheduler, clock, calls = make_scheduler()
+
+    await scheduler.serve("strategy", "client", "red", make_state(red_territory=40))
+    clock.now = 30.0
+    await scheduler.serve("strategy", "client", "red", make_state(red_territory=42))
+    assert len(calls) == 2
+
+    # Not due yet, then due within the lead time of the next request
+    clock.now = 40.0
+    assert scheduler.tick() == 0
+    clock.now = 59.0
+    assert scheduler.tick() == 1
+    await asyncio.sleep(0)
+    assert len(calls) == 3
+
+    # Only one speculative run per cycle
+    assert scheduler.tick() == 0
+
+    clock.now = 60.0
+    result = await scheduler.serve("strategy", "client", "red", make_state(red_territory=43))
+    assert result == "strategy for 42.0"
+    assert len(calls) == 3
+    assert scheduler.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_drifted_state_generates_fresh_result():
+    """Test a prepared result is discarded when the state changed too much"""
+    scheduler, clock, calls = make_scheduler()
+
+    await scheduler.serve("strategy", "client", "red", make_state(red_territory=40))
+    clock.now = 30.0
+    await scheduler.serve("strategy", "client", "red", make_state(red_territory=42))
+    clock.now = 59.0
+    scheduler.tick()
+    await asyncio.sleep(0)
+
+    clock.now = 60.0
+    result = await scheduler.serve("strategy", "client", "red", make_state(red_territory=60))
+    assert result == "strategy for 60.0"
+    assert len(calls) == 4
+    assert scheduler.stats()["drifted"] == 1
+
+@pytest.mark.asyncio
+async def test_untracked_requests_are_not_recorded():
+    """Test requests without a client ID or with speculation disabled go straight to the generator"""
+    scheduler, clock, calls = make_scheduler()
+    await scheduler.serve("strategy", None, "red", make_state())
+    assert scheduler.tracks == {}
+
+    scheduler.enabled = False
+    await scheduler.serve("strategy", "client", "red", make_state())
+    assert scheduler.tracks == {}
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_forget_cancels_pending_speculation():
+    """Test disconnecting clients drop their tracks and in-flight speculative runs"""
+    clock = FakeClock()
+
+    async def slow_generate(state):
+        await asyncio.sleep(10)
+
+    kind = SpeculationKind(slow_generate, strategy_state_within_drift, lambda client_id, team_id, last: last)
+    scheduler = SpeculationScheduler(kinds={"strategy": kind}, clock=clock, enabled=True)
+    scheduler.record(("client", "strategy", "red"), make_state())
+    clock.now = 30.0
+    scheduler.record(("client", "strategy", "red"), make_state())
+    clock.now = 59.0
+    scheduler.tick()
+    task = scheduler.tracks[("client", "strategy", "red")].prepared.task
+
+    scheduler.forget("client")
+    await asyncio.sleep(0)
+    assert scheduler.tracks == {}
+    assert task.cancelled()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app import config
+from app.config import Settings
+from app.main import app
+from app.services.speculation import speculator
+from app.services.workflow_executor import WorkflowExecutor
+
+def test_settings_from_env(monkeypatch):
+    """Test settings are read from the environment, with ALLOWED_ORIGINS as the CORS fallback"""
+    monkeypatch.delenv("CORS_ORIGINS", raising=False)
+    monkeypatch.setenv("ALLOWED_ORIGINS", "http://a.test, http://b.test")
+    monkeypatch.setenv("USE_MOCK_RESPONSES", "false")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "4")
+    settings = Settings.from_env()
+    assert settings.cors_origins == ["http://a.test", "http://b.test"]
+    assert settings.use_mock_responses is False
+    assert settings.llm_max_concurrency == 4
+
+def test_workflow_libraries_are_not_imported_at_startup():
+    """Test importing the app does not pull in the HTTP and template libraries"""
+    code = "import sys, app.main; print(sorted({'httpx', 'jinja2', 'yaml'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_prewarm_loads_every_workflow_step():
+    """Test pre-warming parses each workflow step so the first request does not"""
+    executor = WorkflowExecutor(base_url="http://llm")
+    executor.prewarm(connect=False)
+    steps = executor.workflow_steps()
+    assert ("team_strategy", None) in steps
+    assert ("agent_creation", "plan_agents") in steps
+    assert len(executor._workflows) == len(steps)
+
+def test_startup_stats(monkeypatch):
+    """Test the lifespan applies the settings and records startup phases"""
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(speculator, "enabled", speculator.enabled)
+    monkeypatch.setenv("PREWARM", "false")
+    monkeypatch.setenv("SPECULATION_ENABLED", "false")
+    with TestClient(app) as client:
+        stats = client.get("/startup/stats").json()
+        assert client.get("/speculation/stats").json()["enabled"] is False
+    assert stats["ready_ms"] > 0
+    assert {"import", "settings"} <= {phase["name"] for phase in stats["phases"]}
@@ -0,0 +1,144 @@
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.game_state import GameState, Resource, Agent
+from app.services.json_stream import IncrementalObjectParser
+from app.services.strategy_service import stream_team_strategy
+from app.services.workflow_executor import WorkflowExecutor, set_executor
+from app.stub_llm import create_app
+
+client = TestClient(app)
+
+STRATEGY = {
+    "strategy": "economic",
+    "focus": "resources",
+    "priorities": ["collect_data", "collect_energy"],
+    "description": "Streamed \"economic\" plan {with braces}"
+}
+
+def game_state():
+    return GameState(
+        team_id="red",
+        territory_control={"red": 45, "blue": 55},
+        resources={"red": Resource(energy=1, materials=2, data=3), "blue": Resource(energy=1, materials=2, data=3)},
+        agents={"red": [Agent(id=1, type="collector", health=100, x=1, y=2)], "blue": []},
+        resource_distribution={"energy": 10}
+    )
+
+def sse_body(content, chunk_chars=5):
+    for index in range(0, len(content), chunk_chars):
+        chunk = {"choices": [{"index": 0, "delta": {"content": content[index:index + chunk_chars]}}]}
+        yield f"data: {json.dumps(chunk)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+def streaming_executor(content, pulled=None):
+    async def body():
+        for chunk in sse_body(content):
+            if pulled is not None:
+                pulled.append(chunk)
+            yield chunk
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+
+    return WorkflowExecutor(base_url="http://llm", transport=httpx.MockTransport(handler))
+
+async def collect(executor):
+    set_executor(executor)
+    try:
+        return [event async for event in stream_team_strategy(game_state())]
+    finally:
+        set_executor(None)
+
+def test_parser_emits_fields_as_they_complete():
+    """Test each field is returned by the chunk that completes it, whatever the chunking"""
+    text = "```json\n" + json.dumps(STRATEGY, indent=2) + "\n```"
+    parser = IncrementalObjectParser()
+    fields = []
+    for char in text:
+        completed = parser.feed(char)
+        fields.extend(completed)
+        if completed and completed[-1][0] == "focus":
+            # The description has not been generated yet
+            assert "description" not in dict(fields)
+    parser.close()
+    assert parser.done
+    assert dict(fields) == STRATEGY
+    assert [name for name, _ in fields] == list(STRATEGY)
+
+def test_parser_rejects_invalid_output_early():
+    """Test invalid output raises at the offending character, not at the end"""
+    parser = IncrementalObjectParser()
+    parser.feed('{"strategy": "aggressive", ')
+    with pytest.raises(ValueError):
+        parser.feed('"focus" = "territory"')
+    with pytest.raises(ValueError):
+        IncrementalObjectParser(max_preamble=10).feed("I think the best strategy would be aggressive.")
+    with pytest.raises(ValueError):
+        IncrementalObjectParser().feed('{"priorities": [1, 2}')
+
+def test_parser_detects_truncation():
+    """Test a completion that stops mid-object is rejected on close"""
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"strategy": "aggressive", "focus": "terr') == [("strategy", "aggressive")]
+    with pytest.raises(ValueError):
+        parser.close()
+
+@pytest.mark.asyncio
+async def test_stream_yields_fields_then_strategy(override_settings):
+    """Test the workflow stream yields each field in order and ends with the full strategy"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    events = await collect(streaming_executor(json.dumps(STRATEGY)))
+    assert [data["name"] for event, data in events if event == "field"] == list(STRATEGY)
+    assert events[-1] == ("strategy", {"source": "workflow", "strategy": STRATEGY})
+
+@pytest.mark.asyncio
+async def test_invalid_field_switches_to_fallback_early(override_settings):
+    """Test a field of the wrong type abandons the stream and returns the fallback"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    content = json.dumps({"strategy": "aggressive", "focus": 42, "priorities": ["x"] * 200, "description": "never read"})
+    pulled = []
+    events = await collect(streaming_executor(content, pulled))
+    names = [event for event, _ in events]
+    assert names[:2] == ["field", "fallback"]
+    assert events[-1][0] == "strategy" and events[-1][1]["source"] == "fallback"
+    # The rest of the completion was not waited for
+    assert len(pulled) < len(list(sse_body(content))) // 2
+
+@pytest.mark.asyncio
+async def test_truncated_stream_falls_back(override_settings):
+    """Test a completion cut off mid-object falls back once the stream ends"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    events = await collect(streaming_executor(json.dumps(STRATEGY)[:60]))
+    assert ("fallback" in [event for event, _ in events])
+    assert events[-1][1]["source"] == "fallback"
+
+@pytest.mark.asyncio
+async def test_stream_against_stub_server(override_settings):
+    """Test streaming through the stub LLM server's server-sent events"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    stub = create_app()
+    events = await collect(WorkflowExecutor(base_url="http://stub/v1", transport=httpx.ASGITransport(app=stub)))
+    assert events[-1][1]["source"] == "workflow"
+    assert events[0] == ("field", {"name": "strategy", "value": events[-1][1]["strategy"]["strategy"]})
+
+def test_stream_endpoint_sends_server_sent_events():
+    """Test the endpoint streams field events and the final strategy in mock mode"""
+    payload = {
+        "team_id": "red",
+        "territory_control": {"red": 45, "blue": 55},
+        "resources": {"red": {"energy": 1, "materials": 2, "data": 3}, "blue": {"energy": 1, "materials": 2, "data": 3}},
+        "agents": {"red": [], "blue": []},
+        "resource_distribution": {"energy": 10}
+    }
+    response = client.post("/api/team-strategy/stream", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: field"] * 4 + ["event: strategy"]
+    final = json.loads(events[-1][1][len("data: "):])
+    assert final["source"] == "mock"
+    assert set(final["strategy"]) == set(STRATEGY)
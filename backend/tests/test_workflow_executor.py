@@ -0,0 +1,116 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.schemas.game_state import GameState, Resource, Agent
+from app.services import strategy_service
+from app.services.workflow_executor import WorkflowExecutor, WorkflowError, set_executor
+from app.stub_llm import create_app
+
+STRATEGY_INPUT = {
+    "team_id": "red",
+    "opponent_id": "blue",
+    "territory_control": {"red": 45, "blue": 55},
+    "agents": {"red": {"count": 1, "types": "collector 1"}, "blue": {"count": 2, "types": "explorer 2"}},
+    "resources": {
+        "red": {"energy": 50, "materials": 30, "data": 20},
+        "blue": {"energy": 40, "materials": 35, "data": 25}
+    },
+    "resource_distribution": "energy 10",
+    "situation": ["The fronts are 3 hexes apart"]
+}
+
+def completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+def test_render_team_strategy_prompt():
+    """Test the workflow YAML prompt renders with the workflow input"""
+    prompt = WorkflowExecutor().render_prompt("team_strategy", STRATEGY_INPUT)
+    assert "Your team controls 45% of the map" in prompt
+    assert "The opponent team has 2 agents: explorer 2" in prompt
+    assert "Energy: 50, Materials: 30, Data: 20" in prompt
+    assert prompt.endswith("- Map resource distribution: energy 10\n- The fronts are 3 hexes apart\n")
+
+@pytest.mark.asyncio
+async def test_run_against_stub_server():
+    """Test a full workflow run against the stub LLM server"""
+    executor = WorkflowExecutor(base_url="http://stub/v1", transport=httpx.ASGITransport(app=create_app()))
+    result = await executor.run("team_strategy", STRATEGY_INPUT)
+    await executor.aclose()
+    assert result["strategy"] in ["aggressive", "defensive", "balanced", "economic"]
+    assert isinstance(result["priorities"], list)
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    """Test the semaphore caps the number of in-flight LLM calls"""
+    in_flight = 0
+    peak = 0
+    
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return completion('{"strategy": "balanced"}')
+    
+    executor = WorkflowExecutor(base_url="http://llm", max_concurrency=3, transport=httpx.MockTransport(handler))
+    await asyncio.gather(*(executor.run("team_strategy", STRATEGY_INPUT) for _ in range(10)))
+    await executor.aclose()
+    assert peak == 3
+
+@pytest.mark.asyncio
+async def test_retries_transient_failures():
+    """Test retryable statuses and malformed completions are retried"""
+    responses = [httpx.Response(503), completion("not json"), completion('```json\n{"strategy": "economic"}\n```')]
+    
+    def handler(request):
+        return responses.pop(0)
+    
+    executor = WorkflowExecutor(base_url="http://llm", max_retries=2, backoff_seconds=0.001,
+                                transport=httpx.MockTransport(handler))
+    assert await executor.run("team_strategy", STRATEGY_INPUT) == {"strategy": "economic"}
+    await executor.aclose()
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    """Test non-retryable statuses fail immediately"""
+    calls = 0
+    
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(401)
+    
+    executor = WorkflowExecutor(base_url="http://llm", max_retries=3, transport=httpx.MockTransport(handler))
+    with pytest.raises(WorkflowError):
+        await executor.run("team_strategy", STRATEGY_INPUT)
+    await executor.aclose()
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_strategy_service_uses_executor(override_settings):
+    """Test the non-mock service path returns the workflow result"""
+    override_settings(use_mock_responses=False, cache_enabled=False)
+    
+    def handler(request):
+        return completion(json.dumps({
+            "strategy": "economic",
+            "focus": "resources",
+            "priorities": ["collect_data"],
+            "description": "From the workflow"
+        }))
+    
+    set_executor(WorkflowExecutor(base_url="http://llm", transport=httpx.MockTransport(handler)))
+    try:
+        game_state = GameState(
+            team_id="team1",
+            territory_control={"red": 45, "blue": 55},
+            resources={"red": Resource(energy=1, materials=2, data=3), "blue": Resource(energy=1, materials=2, data=3)},
+            agents={"red": [Agent(id=1, type="collector", health=100, x=1, y=2)], "blue": []},
+            resource_distribution={"energy": 10}
+        )
+        strategy = await strategy_service.generate_team_strategy(game_state)
+    finally:
+        set_executor(None)
+    assert strategy.description == "From the workflow"
@@ -12,6 +12,12 @@ class BackendAPIClient {
         this.isConnected = false;
         this.connectionCheckInterval = null;
         
+        // Deadline the backend should answer within (matches the strategy timeout)
+        this.requestDeadlineMs = 8000;
+        
+        // WebSocket client ID that late workflow results are pushed to
+        this.clientId = null;
+        
         // Check connection on initialization
         this.checkConnection();
     }
@@ -24,6 +30,29 @@ class BackendAPIClient {
         this.baseUrl = url;
     }
 
+    /**
+     * Set the WebSocket client ID used for pushed result upgrades
+     * @param {string|null} clientId - The WebSocket client ID
+     */
+    setClientId(clientId) {
+        this.clientId = clientId;
+    }
+
+    /**
+     * Build request headers, including the deadline and client ID
+     * @returns {object} - Request headers
+     */
+    getRequestHeaders() {
+        const headers = {
+            'Content-Type': 'application/json',
+            'X-Client-Deadline-Ms': String(this.requestDeadlineMs)
+        };
+        if (this.clientId) {
+            headers['X-Client-Id'] = this.clientId;
+        }
+        return headers;
+    }
+
     /**
      * Check if the backend is available
      * @returns {Promise<boolean>} - True if connected, false otherwise
@@ -78,9 +107,7 @@ class BackendAPIClient {
         try {
             const response = await fetch(`${this.baseUrl}/team-strategy`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
+                headers: this.getRequestHeaders(),
                 body: JSON.stringify({
                     team_id: teamId,
                     territory_control: gameState.territoryControl,
@@ -101,6 +128,68 @@ class BackendAPIClient {
         }
     }
 
+    /**
+     * Stream team strategy from the backend as server-sent events. onField is
+     * called with each field (strategy and focus first) as soon as the backend
+     * has it; the returned promise resolves with the complete strategy.
+     * @param {string} teamId - The team ID
+     * @param {object} gameState - The current game state
+     * @param {function} onField - Called with (name, value) for each field
+     * @returns {Promise<object>} - The team strategy
+     */
+    async streamTeamStrategy(teamId, gameState, onField = () => {}) {
+        if (!this.isConnected) {
+            throw new Error('Backend not connected');
+        }
+
+        try {
+            const response = await fetch(`${this.baseUrl}/team-strategy/stream`, {
+                method: 'POST',
+                headers: this.getRequestHeaders(),
+                body: JSON.stringify({
+                    team_id: teamId,
+                    territory_control: gameState.territoryControl,
+                    resources: gameState.resources,
+                    agents: gameState.agents,
+                    resource_distribution: gameState.resourcesOnMap
+                })
+            });
+            
+            if (!response.ok) {
+                throw new Error(`Backend error: ${response.status}`);
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    const event = block.match(/^event: (.*)$/m)?.[1];
+                    const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? 'null');
+                    if (event === 'field') {
+                        onField(data.name, data.value);
+                    } else if (event === 'strategy') {
+                        return data.strategy;
+                    }
+                }
+            }
+            throw new Error('Strategy stream ended without a strategy');
+        } catch (error) {
+            console.error('Strategy stream API error:', error);
+            throw error;
+        }
+    }
+
     /**
      * Request agent specification from the backend
      * @param {string} teamId - The team ID
@@ -117,9 +206,7 @@ class BackendAPIClient {
         try {
             const response = await fetch(`${this.baseUrl}/agent-specification`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
+                headers: this.getRequestHeaders(),
                 body: JSON.stringify({
                     team_id: teamId,
                     strategy: strategy,
@@ -138,6 +225,46 @@ class BackendAPIClient {
             throw error;
         }
     }
+
+    /**
+     * Request a spawn plan (the next several agent specifications) from the backend.
+     * The first agent is for the current spawn; the backend keeps the rest and
+     * returns them from requestAgentSpecification until the strategy changes.
+     * @param {string} teamId - The team ID
+     * @param {object} strategy - The team strategy
+     * @param {object} resources - Available resources
+     * @param {array} currentAgents - Current agent composition
+     * @param {number} count - Number of agents to plan
+     * @returns {Promise<object>} - The spawn plan ({team_id, agents})
+     */
+    async requestSpawnPlan(teamId, strategy, resources, currentAgents, count = 5) {
+        if (!this.isConnected) {
+            throw new Error('Backend not connected');
+        }
+
+        try {
+            const response = await fetch(`${this.baseUrl}/spawn-plan`, {
+                method: 'POST',
+                headers: this.getRequestHeaders(),
+                body: JSON.stringify({
+                    team_id: teamId,
+                    strategy: strategy,
+                    resources: resources,
+                    current_agents: currentAgents,
+                    count: count
+                })
+            });
+            
+            if (!response.ok) {
+                throw new Error(`Backend error: ${response.status}`);
+            }
+            
+            return await response.json();
+        } catch (error) {
+            console.error('Spawn plan API error:', error);
+            throw error;
+        }
+    }
 }
 
 export default BackendAPIClient;
\ No newline at end of file
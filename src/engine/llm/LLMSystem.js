@@ -199,6 +199,16 @@ class LLMSystem {
         this.updateBackendStatus();
     }
     
+    /**
+     * Set the WebSocket client ID on every backend API client
+     * @param {string|null} clientId - The WebSocket client ID
+     */
+    setBackendClientId(clientId) {
+        for (const service of [this.llmService, this.teamStrategySystem.llmService, this.spawnerSystem.llmService]) {
+            service.backendClient.setClientId(clientId);
+        }
+    }
+    
     /**
      * Toggle WebSocket connection
      */
@@ -208,6 +218,9 @@ class LLMSystem {
         if (this.websocketEnabled) {
             this.websocketClient.connect();
             
+            // Let the backend push late strategy/agent upgrades over this socket
+            this.setBackendClientId(this.websocketClient.clientId);
+            
             // Register handlers for strategic directives
             this.websocketClient.registerHandler('directive', (data) => {
                 console.log('Received strategic directive:', data);
@@ -229,6 +242,7 @@ class LLMSystem {
             });
         } else {
             this.websocketClient.disconnect();
+            this.setBackendClientId(null);
         }
         
         console.log(`WebSocket: ${this.websocketEnabled ? 'Enabled' : 'Disabled'}`);
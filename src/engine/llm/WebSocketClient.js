@@ -14,6 +14,10 @@ class WebSocketClient {
         this.messageHandlers = new Map();
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 5;
+        
+        // Delta encoding state: the last state the server acknowledged implicitly
+        this.lastSentState = null;
+        this.seq = 0;
     }
 
     /**
@@ -39,6 +43,9 @@ class WebSocketClient {
                 console.log('WebSocket connected');
                 this.isConnected = true;
                 this.reconnectAttempts = 0;
+                
+                // A new connection always starts from a full snapshot
+                this.lastSentState = null;
             };
             
             this.socket.onclose = () => {
@@ -91,6 +98,9 @@ class WebSocketClient {
 
     /**
      * Send game state to the server
+     * 
+     * The first message after connecting (or after the server asks for a
+     * resync) is a full snapshot; later messages only carry what changed.
      * @param {object} gameState - The current game state
      */
     sendGameState(gameState) {
@@ -99,17 +109,108 @@ class WebSocketClient {
         }
         
         try {
-            const message = {
-                type: 'gameState',
-                data: gameState
-            };
+            const state = this.normalizeState(gameState);
+            let message;
+            
+            if (!this.lastSentState) {
+                this.seq = 0;
+                message = { type: 'snapshot', seq: this.seq, data: state };
+            } else {
+                const delta = this.diffState(this.lastSentState, state);
+                if (!delta) {
+                    return;
+                }
+                this.seq++;
+                message = { type: 'delta', seq: this.seq, data: delta };
+            }
             
             this.socket.send(JSON.stringify(message));
+            this.lastSentState = state;
         } catch (error) {
             console.error('Error sending game state:', error);
         }
     }
 
+    /**
+     * Reduce the game state to the fields the backend tracks
+     * @param {object} gameState - The current game state
+     * @returns {object} Normalized state
+     */
+    normalizeState(gameState) {
+        const agents = {};
+        for (const [team, teamAgents] of Object.entries(gameState.agents || {})) {
+            agents[team] = (teamAgents || []).map(agent => ({
+                id: agent.id,
+                type: agent.type || agent.role,
+                health: Math.round(agent.health),
+                x: Math.round(agent.x),
+                y: Math.round(agent.y)
+            }));
+        }
+        
+        return {
+            territory_control: { ...(gameState.territoryControl || {}) },
+            resources: JSON.parse(JSON.stringify(gameState.resources || {})),
+            resource_distribution: { ...(gameState.resourcesOnMap || {}) },
+            agents: agents
+        };
+    }
+
+    /**
+     * Compute the changes between two normalized states
+     * @param {object} previous - Last sent state
+     * @param {object} current - Current state
+     * @returns {object|null} Delta payload, or null if nothing changed
+     */
+    diffState(previous, current) {
+        const delta = {};
+        const changedKeys = (before, after) => {
+            const changed = {};
+            for (const [key, value] of Object.entries(after)) {
+                if (JSON.stringify(before[key]) !== JSON.stringify(value)) {
+                    changed[key] = value;
+                }
+            }
+            return Object.keys(changed).length ? changed : null;
+        };
+        
+        for (const field of ['territory_control', 'resources', 'resource_distribution']) {
+            const changed = changedKeys(previous[field] || {}, current[field]);
+            if (changed) {
+                delta[field] = changed;
+            }
+        }
+        
+        const agents = {};
+        for (const [team, teamAgents] of Object.entries(current.agents)) {
+            const before = new Map((previous.agents[team] || []).map(agent => [agent.id, agent]));
+            const upsert = [];
+            
+            for (const agent of teamAgents) {
+                const old = before.get(agent.id);
+                before.delete(agent.id);
+                if (!old) {
+                    upsert.push(agent);
+                    continue;
+                }
+                const changed = changedKeys(old, agent);
+                if (changed) {
+                    upsert.push({ id: agent.id, ...changed });
+                }
+            }
+            
+            const remove = [...before.keys()];
+            if (upsert.length || remove.length) {
+                agents[team] = { upsert, remove };
+            }
+        }
+        if (Object.keys(agents).length) {
+            delta.agents = agents;
+        }
+        
+        return Object.keys(delta).length ? delta : null;
+    }
+
     /**
      * Register a message handler
      * @param {string} type - Message type to handle
@@ -126,6 +227,19 @@ class WebSocketClient {
     handleMessage(data) {
         try {
             const message = JSON.parse(data);
+            
+            // The server lost track of our state; send a full snapshot next
+            if (message.type === 'resync') {
+                this.lastSentState = null;
+                return;
+            }
+
+            // Heartbeat: the server closes connections that stay silent
+            if (message.type === 'ping') {
+                this.socket.send(JSON.stringify({ type: 'pong' }));
+                return;
+            }
+
             const handler = this.messageHandlers.get(message.type);
             
             if (handler) {